@@ -0,0 +1,123 @@
+# analytics.py - admin statistics served from rollup tables (migrations/013)
+#
+#   python analytics.py reconcile [--fix]   (compare the rollups with the base tables; run from cron)
+#
+# application_rollup counts applications per day x status x application_type x
+# sport, and user_rollup counts accounts per role x sport x location. Triggers
+# on the base tables keep both current in the same transaction as every write
+# (submit, review, respond, register, profile edits, deletes, imports), so
+# /admin/stats only reads the rollups: its cost grows with the number of
+# distinct keys, never with the number of applications or users.
+#
+# reconcile() recounts the base tables and compares. Drift should never
+# happen, but a trigger disabled for maintenance or a manual fix-up could
+# cause it. With fix=True the differences are added back as deltas. The
+# "analytics.reconcile" job (POST /admin/stats/reconcile) does the same in
+# the background.
+import os
+import sys
+import json
+import logging
+from datetime import date
+
+import queries
+
+
+# sports and locations listed per breakdown, largest first
+STATS_TOP = int(os.environ.get("STATS_TOP", 20))
+STATS_WEEKS = int(os.environ.get("STATS_WEEKS", 12))
+# drifted keys included in a reconcile report
+RECONCILE_SAMPLE = 20
+# label for rows with no sport / location / type
+UNSPECIFIED = "(unspecified)"
+
+# GROUPING() values in queries.APPLICATION_STATS / USER_STATS
+BY_STATUS, BY_TYPE, BY_SPORT, BY_WEEK, TOTAL = 0b0111, 0b1011, 0b1101, 0b1110, 0b1111
+BY_ROLE, BY_ROLE_SPORT, BY_ROLE_LOCATION = 0b011, 0b001, 0b010
+
+log = logging.getLogger("sporture.analytics")
+
+
+def stats_params(args):
+    """(since, until) days for APPLICATION_STATS from ISO dates in `args`; raises ValueError."""
+    bounds = []
+    for name, default in (("since", date.min), ("until", date.max)):
+        value = args.get(name)
+        try:
+            bounds.append(date.fromisoformat(value) if value else default)
+        except ValueError:
+            raise ValueError(f"{name} must be an ISO date (YYYY-MM-DD)")
+    return tuple(bounds)
+
+
+def _top(counts):
+    return dict(sorted(counts.items(), key=lambda item: -item[1])[:STATS_TOP])
+
+
+def shape(application_rows, user_rows):
+    """The /admin/stats document from APPLICATION_STATS and USER_STATS rows (psycopg2 or asyncpg)."""
+    apps = {"total": 0, "by_status": {}, "by_type": {}, "by_sport": {}, "by_week": []}
+    weeks = []
+    for grouping, status, application_type, sport, week, count in application_rows:
+        if grouping == TOTAL:
+            apps["total"] = count
+        elif grouping == BY_STATUS:
+            apps["by_status"][status or UNSPECIFIED] = count
+        elif grouping == BY_TYPE:
+            apps["by_type"][application_type or UNSPECIFIED] = count
+        elif grouping == BY_SPORT:
+            apps["by_sport"][sport or UNSPECIFIED] = count
+        elif grouping == BY_WEEK:
+            weeks.append((week, count))
+    apps["by_sport"] = _top(apps["by_sport"])
+    apps["by_week"] = [{"week": week.isoformat(), "count": count} for week, count in sorted(weeks)[-STATS_WEEKS:]]
+
+    users = {"total": 0, "by_role": {}, "by_sport": {}, "by_location": {}}
+    for grouping, role, sport, location, count in user_rows:
+        if grouping == BY_ROLE:
+            users["by_role"][role] = count
+            users["total"] += count
+        elif grouping == BY_ROLE_SPORT:
+            users["by_sport"].setdefault(role, {})[sport or UNSPECIFIED] = count
+        elif grouping == BY_ROLE_LOCATION:
+            users["by_location"].setdefault(role, {})[location or UNSPECIFIED] = count
+    for breakdown in ("by_sport", "by_location"):
+        users[breakdown] = {role: _top(counts) for role, counts in users[breakdown].items()}
+
+    return {"applications": apps, "users": users}
+
+
+def reconcile(cur, fix=False):
+    """Compare both rollups with a recount of the base tables; with `fix`, correct them. Returns a report."""
+    report = {}
+    for name, drift_sql, fix_sql in (
+        ("applications", queries.APPLICATION_ROLLUP_DRIFT, queries.FIX_APPLICATION_ROLLUP),
+        ("users", queries.USER_ROLLUP_DRIFT, queries.FIX_USER_ROLLUP),
+    ):
+        cur.execute(drift_sql)
+        columns = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+        report[name] = {"drifted": len(rows),
+                        "sample": [dict(zip(columns, row)) for row in rows[:RECONCILE_SAMPLE]]}
+        if rows:
+            log.warning("%s rollup differs from the base tables on %d keys", name, len(rows))
+            if fix:
+                cur.execute(fix_sql)
+                report[name]["fixed"] = cur.rowcount
+    if fix:
+        for sql in queries.DELETE_EMPTY_ROLLUPS:
+            cur.execute(sql)
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+    if sys.argv[1:2] == ["reconcile"] and sys.argv[2:] in ([], ["--fix"]):
+        from db import get_db
+        with get_db() as conn, conn.cursor() as cur:
+            result = reconcile(cur, fix=sys.argv[2:] == ["--fix"])
+            conn.commit()
+        json.dump(result, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        sys.exit("usage: python analytics.py reconcile [--fix]")
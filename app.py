@@ -1,28 +1,168 @@
 # app.py (updated)
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for, abort
+from flask import (
+    Flask, Response, g, request, jsonify, render_template, session, redirect, url_for, abort, stream_with_context,
+    send_file, send_from_directory, Request,
+)
 import psycopg2
-from psycopg2.extras import RealDictCursor
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
 import os
+import hmac
 import logging
-from datetime import datetime
+from functools import wraps
+
+from db import DB_CONFIG, get_db, pool
+import analytics
+import application_status
+import assets
+import documents
+import exports
+import imports
+import jobs
+import live
+import metrics
+import queries
+import responses
+import sessions
+from queries import ROLE_TABLES, PROFILE_COLUMNS, PENDING_COLUMNS
+from cache import profile_cache, profile_key
+from hashing import hash_password, verify_password, needs_rehash, HashingBusy
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# request payloads carry personal data; only log them (passwords redacted) when asked to
+LOG_PAYLOADS = os.environ.get("LOG_PAYLOADS", "0") == "1"
+# password for the admin pages (templates/adminlogin.html); set your own in production
+ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "098765")
+# bearer token that lets a Prometheus scraper read /metrics without an admin session; unset means admins only
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+logging.basicConfig(level=LOG_LEVEL)
+
+
+class DocumentRequest(Request):
+    # multipart file parts are written straight into the document blob store
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return documents.stream_factory(total_content_length, content_type, filename, content_length)
 
-logging.basicConfig(level=logging.DEBUG)
 
 app = Flask(__name__)
+app.request_class = DocumentRequest
+# room for one document plus the multipart envelope
+app.config["MAX_CONTENT_LENGTH"] = documents.DOCUMENT_MAX_BYTES + 64 * 1024
 CORS(app)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "replace_this_in_prod")
+app.session_interface = sessions.ServerSessionInterface()
+app.jinja_env.globals["asset_url"] = assets.asset_url
 
 
-def get_db_connection():
-    return psycopg2.connect(
-        host="localhost",
-        database="sporture",
-        user="postgres",
-        password="12345",
-        port=5432
-    )
+def redacted(data):
+    return {k: "***" if "password" in k.lower() else v for k, v in data.items()}
+
+
+def admin_password_ok(password):
+    return isinstance(password, str) and hmac.compare_digest(password.encode(), ADMIN_PASSWORD.encode())
+
+
+def is_admin():
+    return session.get("admin") is True
+
+
+ADMIN_REQUIRED = {"success": False, "message": "Admin sign-in required"}
+
+
+def admin_required(view):
+    """Route decorator: 403 unless the session signed in through POST /adminlogin."""
+    @wraps(view)
+    def guarded(*args, **kwargs):
+        if not is_admin():
+            return jsonify(ADMIN_REQUIRED), 403
+        return view(*args, **kwargs)
+    return guarded
+
+
+def metrics_token_ok(authorization):
+    """True for an `Authorization: Bearer <METRICS_TOKEN>` header, when a token is configured."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if not METRICS_TOKEN or scheme.lower() != "bearer":
+        return False
+    return hmac.compare_digest(token.encode(), METRICS_TOKEN.encode())
+
+
+@app.before_request
+def start_request_metrics():
+    metrics.start_request()
+
+
+@app.after_request
+def finish_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    metrics.finish_request(request.method, route, response.status_code)
+    return response
+
+
+@app.after_request
+def json_validators_and_compression(response):
+    # streamed JSON is compressed by its route (see get_pending_applications)
+    if response.status_code != 200 or not responses.is_json(response) or response.is_streamed:
+        return response
+    if request.method in ("GET", "HEAD"):
+        responses.revalidate(response)
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+    encoding = responses.negotiate(request.headers.get("Accept-Encoding"))
+    if encoding and response.content_length >= responses.COMPRESS_MIN_BYTES:
+        response.set_data(responses.compress(response.get_data(), encoding))
+        responses.mark_encoded(response, encoding)
+    return response
+
+
+# Fingerprinted copies built by `python assets.py`; the name changes with the content
+@app.route("/assets/<path:filename>")
+def asset(filename):
+    found = assets.resolve(filename, request.headers.get("Accept-Encoding"))
+    if found is None:
+        abort(404)
+    path, mimetype, encoding = found
+    response = send_from_directory(assets.DIST_DIR, path, mimetype=mimetype, max_age=assets.ASSET_MAX_AGE)
+    return assets.immutable(response, filename, encoding)
+
+
+def forget_user(user_type, email):
+    """Drop everything cached for a user after their profile changed or they were deleted."""
+    profile_cache.delete(profile_key(user_type, email))
+    sessions.forget_identity(user_type, email)
+
+
+def current_user():
+    """Identity record of the signed-in user from the session store; None if signed out or deleted.
+
+    Loaded on first use and kept on `g` for the rest of the request; only routes that need
+    the user call it, so public routes never touch the store or the database.
+    """
+    if "user" not in g:
+        g.user = _load_identity()
+    return g.user
+
+
+def _load_identity():
+    email, user_type = session.get("email"), session.get("user_type")
+    if not email or user_type not in ROLE_TABLES:
+        return None
+
+    # the session is bound to the account id it signed in as, not just the email: an account
+    # deleted and registered again under the same email must not inherit the old sessions
+    user = sessions.get_identity(user_type, email)
+    if user is None or user["id"] != session.get("user_id"):
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute_prepared(queries.identity(user_type), (email,))
+            row = cur.fetchone()
+        if row is None or row[0] != session.get("user_id"):
+            # the account was deleted (or replaced) since sign-in
+            session.clear()
+            return None
+        user = sessions.set_identity(user_type, email, row)
+    return user
 
 
 @app.route("/")
@@ -50,6 +190,16 @@ def adminlogin():
     return render_template('adminlogin.html')
 
 
+@app.route('/adminlogin', methods=['POST'])
+def admin_login():
+    data = request.get_json() or {}
+    if not admin_password_ok(data.get("password")):
+        return jsonify({"success": False, "message": "Incorrect password"}), 401
+    session.regenerate()
+    session["admin"] = True
+    return jsonify({"success": True, "redirect": "/admin"})
+
+
 @app.route("/manage_users")
 def manage_users():
     return render_template("manage_users.html")
@@ -60,6 +210,13 @@ def application_approval():
     return render_template("application_approval.html")
 
 
+ROLE_ALIASES = {
+    "athlete": "athlete", "athletes": "athlete",
+    "coach": "coach", "coaches": "coach",
+    "sponsor": "sponsor", "sponsors": "sponsor",
+}
+
+
 # Register
 @app.route("/register", methods=["POST"])
 def register():
@@ -71,7 +228,8 @@ def register():
         if not data:
             data = request.args.to_dict() or {}
 
-    logging.debug("Register payload received: %s", data)
+    if LOG_PAYLOADS:
+        logging.debug("Register payload received: %s", redacted(data))
 
     email = (data.get("email") or "").strip()
     password = data.get("password")
@@ -81,62 +239,56 @@ def register():
     if not email or not password or not user_type:
         return jsonify({"success": False, "message": "Missing fields (email, password, type)"}), 400
 
-    hashed_password = generate_password_hash(password)
-    ut = user_type.lower().strip()
+    ut = ROLE_ALIASES.get(user_type.lower().strip())
+    if not ut:
+        return jsonify({"success": False, "message": f"Invalid user type: {user_type}"}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        # check existing emails
-        cur.execute("""
-            SELECT email FROM athletes WHERE email=%s
-            UNION
-            SELECT email FROM coaches WHERE email=%s
-            UNION
-            SELECT email FROM sponsors WHERE email=%s
-        """, (email, email, email))
-        if cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({"success": False, "message": "Email already registered!"}), 400
-
-        if ut in ("athlete", "athletes"):
-            logging.debug("Inserting athlete: %s / %s", email, full_name)
-            cur.execute(
-                "INSERT INTO athletes (email, password, full_name) VALUES (%s, %s, %s)",
-                (email, hashed_password, full_name)
-            )
-
-        elif ut in ("coach", "coaches"):
-            logging.debug("Inserting coach: %s / %s", email, full_name)
-            cur.execute(
-                "INSERT INTO coaches (email, password, full_name) VALUES (%s, %s, %s)",
-                (email, hashed_password, full_name)
-            )
-
-        elif ut in ("sponsor", "sponsors"):
-            logging.debug("Inserting sponsor: %s / %s", email, full_name)
-            cur.execute(
-                "INSERT INTO sponsors (email, password, name, contact_person) VALUES (%s, %s, %s, %s)",
-                (email, hashed_password, full_name, full_name)
-            )
-
-        else:
-            conn.rollback()
-            cur.close()
-            conn.close()
-            return jsonify({"success": False, "message": f"Invalid user type: {user_type}"}), 400
+        # check existing emails (users is kept in sync with the role tables by trigger)
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute_prepared(queries.EMAIL_EXISTS, (email,))
+            if cur.fetchone():
+                return jsonify({"success": False, "message": "Email already registered!"}), 400
 
-        conn.commit()
-        cur.close()
-        conn.close()
+        # hash without holding a pooled connection
+        hashed_password = hash_password(password)
+
+        with get_db() as conn, conn.cursor() as cur:
+            if ut == "athlete":
+                cur.execute(queries.INSERT_USER["athlete"], (email, hashed_password, full_name))
+
+            elif ut == "coach":
+                cur.execute(queries.INSERT_USER["coach"], (email, hashed_password, full_name))
+
+            else:
+                cur.execute(queries.INSERT_USER["sponsor"], (email, hashed_password, full_name, full_name))
+
+            conn.commit()
         return jsonify({"success": True, "message": "Registration successful!"})
 
+    except psycopg2.errors.UniqueViolation:
+        # lost a race with a concurrent registration for the same email
+        return jsonify({"success": False, "message": "Email already registered!"}), 400
+
+    except HashingBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
+
     except Exception as e:
         logging.exception("Register error")
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+def rehash_password(user_type, role_id, password):
+    # upgrade a hash made with outdated parameters; a failure here must not fail the login
+    try:
+        new_hash = hash_password(password)
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(queries.update_password(user_type), (new_hash, role_id))
+            conn.commit()
+    except Exception:
+        logging.exception("Password rehash failed for %s %s", user_type, role_id)
+
+
 # Login: store display_name and role in session
 @app.route("/login", methods=["POST"])
 def login():
@@ -148,43 +300,27 @@ def login():
         return jsonify({"success": False, "message": "Missing credentials"}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
         user_type = None
+        role_id = None
         stored_password = None
         display_name = None
 
-        # athletes
-        cur.execute("SELECT password, full_name FROM athletes WHERE email=%s", (email,))
-        row = cur.fetchone()
-        if row:
-            stored_password, display_name = row[0], row[1]
-            user_type = "athlete"
-
-        # coaches
-        if not stored_password:
-            cur.execute("SELECT password, full_name FROM coaches WHERE email=%s", (email,))
+        # single primary-key lookup across all roles
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute_prepared(queries.LOGIN_LOOKUP, (email,))
             row = cur.fetchone()
             if row:
-                stored_password, display_name = row[0], row[1]
-                user_type = "coach"
+                stored_password, user_type, role_id, display_name = row
 
-        # sponsors
-        if not stored_password:
-            cur.execute("SELECT password, name, contact_person FROM sponsors WHERE email=%s", (email,))
-            row = cur.fetchone()
-            if row:
-                stored_password = row[0]
-                display_name = row[1] or row[2]
-                user_type = "sponsor"
-
-        cur.close()
-        conn.close()
+        if stored_password and verify_password(stored_password, password):
+            if needs_rehash(stored_password):
+                rehash_password(user_type, role_id, password)
 
-        if stored_password and check_password_hash(stored_password, password):
             display_name = display_name or email.split("@")[0]
+            session.regenerate()
             session['email'] = email
             session['user_type'] = user_type
+            session['user_id'] = role_id
             session['display_name'] = display_name
 
             return jsonify({
@@ -197,11 +333,18 @@ def login():
 
         return jsonify({"success": False, "message": "Invalid credentials"}), 401
 
+    except HashingBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
+
     except Exception as e:
         logging.exception("Login error")
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+# supporting_docs is a free-text field for links; files go through /documents
+SUPPORTING_DOCS_MAX = 2000
+
+
 @app.route("/submit_application", methods=["POST"])
 def submit_application():
     data = request.get_json() or {}
@@ -218,73 +361,145 @@ def submit_application():
 
     if not athlete_name or not sport or not application_type:
         return jsonify({"success": False, "message": "Missing required fields"}), 400
+    if len(supporting_docs or "") > SUPPORTING_DOCS_MAX:
+        return jsonify({"success": False, "message": "supporting_docs holds links only; upload files to /documents"}), 400
+    document_ids = documents.attachable(data.get("document_ids"), session.get("uploads"))
+
+    # link the application to the signed-in athlete, if any
+    athlete_email = session.get("email") if session.get("user_type") == "athlete" else None
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO applications (
-                athlete_name, age, gender, sport, location,
-                application_type, achievements, motivation, goals,
-                supporting_docs, status
-            ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,'Pending')
-        """, (athlete_name, age, gender, sport, location, application_type,
-              achievements, motivation, goals, supporting_docs))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(queries.INSERT_APPLICATION, (athlete_email, athlete_name, age, gender, sport, location, application_type,
+                  achievements, motivation, goals, supporting_docs))
+            app_id = cur.fetchone()[0]
+            if document_ids:
+                cur.execute(queries.ATTACH_DOCUMENTS, (app_id, document_ids))
+            jobs.enqueue(cur, "application.submitted", {"id": app_id})
+            for statement in live.submitted_deltas(app_id):
+                cur.execute(*statement)
+            conn.commit()
+        if document_ids:
+            session["uploads"] = [i for i in session["uploads"] if i not in document_ids]
         return jsonify({"success": True, "message": "Application submitted successfully"})
     except Exception as e:
         logging.exception("Submit application error")
         return jsonify({"success": False, "message": str(e)}), 500
 
 
-@app.route("/dashboard")
-def dashboard_page():
-    if "email" not in session or "user_type" not in session:
-        return render_template("login.html")
-
-    email = session["email"]
-    user_type = session["user_type"]
-    display_name = session.get("display_name", email.split("@")[0])
+# Upload one supporting document (multipart field "file") before submitting the
+# application; pass the returned id in submit_application's document_ids.
+@app.route("/documents", methods=["POST"])
+def upload_document():
+    file = request.files.get("file")
+    if file is None or not file.filename:
+        return jsonify({"success": False, "message": "No file uploaded"}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        profile = {}
-        role_label = user_type
+        sql, params = documents.record(file, file.mimetype)
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(sql, params)
+            doc_id = cur.fetchone()[0]
+            conn.commit()
+    except Exception as e:
+        logging.exception("Document upload error")
+        return jsonify({"success": False, "message": str(e)}), 500
 
-        if user_type == "athlete":
-            cur.execute("SELECT full_name, sport FROM athletes WHERE email=%s", (email,))
-            row = cur.fetchone()
-            if row:
-                profile = {"full_name": row[0], "sport": row[1]}
-                role_label = f"Athlete ({row[1] or ''})"
+    # only documents this session uploaded can be attached to its application
+    session["uploads"] = [*session.get("uploads", []), doc_id][-documents.DOCUMENTS_PER_APPLICATION:]
+    sha256, size, filename, _ = params
+    return jsonify({"success": True, "document": {"id": doc_id, "filename": filename, "size": size, "sha256": sha256}})
+
+
+# Documents are visible to the owning athlete, admins, and the role the application
+# was forwarded to (documents.readable); anyone else gets a 404, as for a missing id.
+@app.route("/applications/<int:app_id>/documents")
+def application_documents(app_id):
+    user = current_user()
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(queries.APPLICATION_ACCESS, (app_id,))
+            access = cur.fetchone()
+            if access is None or not documents.readable(user, is_admin(), access):
+                abort(404)
+            cur.execute(queries.APPLICATION_DOCUMENTS, (app_id,))
+            return jsonify({"documents": queries.described_dicts(cur, cur.fetchall())})
+
+
+# Streams the blob from disk; Range requests are answered with 206 partial content
+@app.route("/documents/<int:doc_id>")
+def download_document(doc_id):
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute(queries.DOCUMENT, (doc_id,))
+        row = cur.fetchone()
+    if row is None or not documents.readable(current_user(), is_admin(), row[4:], doc_id, session.get("uploads")):
+        abort(404)
+    sha256, filename, content_type = row[:3]
+    path = documents.blob_path(sha256)
+    if not os.path.exists(path):
+        logging.error("Document %s: blob %s is missing", doc_id, sha256)
+        abort(404)
+
+    response = send_file(path, mimetype=content_type, as_attachment=True, download_name=filename,
+                         conditional=True, etag=sha256, max_age=documents.DOCUMENT_MAX_AGE)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+def load_profile(user_type, email):
+    """Role profile row as a dict, read through profile_cache. None if there is no such user."""
+    if user_type not in PROFILE_COLUMNS:
+        return None
+
+    key = profile_key(user_type, email)
+    user = profile_cache.get(key)
+    if user is not None:
+        return user
+
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute_prepared(queries.select_profile(user_type), (email,))
+        row = cur.fetchone()
+    if not row:
+        return None
 
-        elif user_type == "coach":
-            cur.execute("SELECT full_name, specialization FROM coaches WHERE email=%s", (email,))
-            row = cur.fetchone()
-            if row:
-                profile = {"full_name": row[0], "specialization": row[1]}
-                role_label = f"Coach ({row[1] or ''})"
+    user = dict(zip((*PROFILE_COLUMNS[user_type], "profile_completeness"), row))
+    profile_cache.set(key, user)
+    return user
 
-        elif user_type == "sponsor":
-            cur.execute("SELECT name, sport FROM sponsors WHERE email=%s", (email,))
-            row = cur.fetchone()
-            if row:
-                profile = {"name": row[0], "sport": row[1]}
-                role_label = f"Sponsor ({row[1] or ''})"
 
-    finally:
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
-
-    filled = sum(1 for v in profile.values() if v)
-    total = max(len(profile), 1)
-    profile_pct = int((filled / total) * 100) if total else 0
+def dashboard_summary(user_type, user):
+    """(profile, role_label, profile_pct) shown on the dashboard for a cached profile row."""
+    profile = {}
+    role_label = user_type
+
+    if user and user_type == "athlete":
+        profile = {"full_name": user["full_name"], "sport": user["sport"]}
+        role_label = f"Athlete ({user['sport'] or ''})"
+
+    elif user and user_type == "coach":
+        profile = {"full_name": user["full_name"], "specialization": user["specialization"]}
+        role_label = f"Coach ({user['specialization'] or ''})"
+
+    elif user and user_type == "sponsor":
+        profile = {"name": user["name"], "sport": user["sport"]}
+        role_label = f"Sponsor ({user['sport'] or ''})"
+
+    # kept up to date by the profile_completeness triggers (migrations/008)
+    profile_pct = (user or {}).get("profile_completeness") or 0
+    return profile, role_label, profile_pct
+
+
+@app.route("/dashboard")
+def dashboard_page():
+    user = current_user()
+    if user is None:
+        return render_template("login.html")
+
+    email, user_type, display_name = user["email"], user["user_type"], user["display_name"]
+
+    profile, role_label, profile_pct = dashboard_summary(user_type, load_profile(user_type, email))
     avatar_url = session.get("avatar_url") or f"https://avatars.dicebear.com/api/identicon/{display_name}.svg?scale=85"
 
     return render_template(
@@ -300,109 +515,21 @@ def dashboard_page():
 
 @app.route("/profile")
 def profile_page():
-    if "email" not in session or "user_type" not in session:
+    user = current_user()
+    if user is None:
         return redirect(url_for("login_page"))
 
-    email = session["email"]
-    user_type = session["user_type"]
-    display_name = session.get("display_name", email.split("@")[0])
+    email, user_type, display_name = user["email"], user["user_type"], user["display_name"]
     avatar_url = session.get("avatar_url") or f"https://avatars.dicebear.com/api/identicon/{display_name}.svg?scale=85"
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    user = {}
+    user = load_profile(user_type, email) or {}
     applications = []
 
-    try:
-        if user_type == "athlete":
-            cur.execute("""
-                SELECT full_name, age, gender, sport, achievements, ranking, experience_years, contact_number, location
-                FROM athletes
-                WHERE email = %s
-            """, (email,))
-            athlete_row = cur.fetchone()
-            if athlete_row:
-                user = {
-                    "full_name": athlete_row["full_name"],
-                    "age": athlete_row["age"],
-                    "gender": athlete_row["gender"],
-                    "sport": athlete_row["sport"],
-                    "achievements": athlete_row["achievements"],
-                    "ranking": athlete_row["ranking"],
-                    "experience_years": athlete_row["experience_years"],
-                    "contact_number": athlete_row["contact_number"],
-                    "location": athlete_row["location"],
-                }
-            athlete_name = user.get("full_name") or display_name
-
-            cur.execute("""
-                SELECT id, athlete_name, application_type, sport, location, status, submission_date,
-                       achievements, motivation, goals, supporting_docs
-                FROM applications
-                WHERE athlete_name = %s
-                ORDER BY submission_date DESC
-            """, (athlete_name,))
-            applications = cur.fetchall() or []
-
-        elif user_type == "coach":
-            cur.execute("""
-                SELECT full_name, specialization, certifications, experience_years, contact_number, location
-                FROM coaches
-                WHERE email = %s
-            """, (email,))
-            row = cur.fetchone()
-            if row:
-                user = {
-                    "full_name": row["full_name"],
-                    "specialization": row["specialization"],
-                    "certifications": row["certifications"],
-                    "experience_years": row["experience_years"],
-                    "contact_number": row["contact_number"],
-                    "location": row["location"],
-                }
-
-            # show forwarded applications for coaches
-            cur.execute("""
-                SELECT id, athlete_name, application_type, sport, location, status, submission_date,
-                       achievements, motivation, goals, supporting_docs, forwarded_date
-                FROM applications
-                WHERE status = 'Forwarded' AND LOWER(application_type) = 'coach'
-                ORDER BY submission_date DESC
-            """)
-            applications = cur.fetchall() or []
-
-        elif user_type == "sponsor":
-            cur.execute("""
-                SELECT name, contact_person, sport, contact_number, location
-                FROM sponsors
-                WHERE email = %s
-            """, (email,))
-            row = cur.fetchone()
-            if row:
-                user = {
-                    "name": row["name"],
-                    "contact_person": row["contact_person"],
-                    "sport": row["sport"],
-                    "contact_number": row["contact_number"],
-                    "location": row["location"],
-                }
-
-            # show forwarded applications for sponsors
-            cur.execute("""
-                SELECT id, athlete_name, application_type, sport, location, status, submission_date,
-                       achievements, motivation, goals, supporting_docs, forwarded_date
-                FROM applications
-                WHERE status = 'Forwarded' AND LOWER(application_type) = 'sponsor'
-                ORDER BY submission_date DESC
-            """)
-            applications = cur.fetchall() or []
-
-        else:
-            applications = []
-
-    finally:
-        cur.close()
-        conn.close()
+    # coach/sponsor feeds are loaded lazily from /feed by the page itself
+    if user_type == "athlete":
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute_prepared(queries.ATHLETE_APPLICATIONS, (email,))
+            applications = list(map(queries.AthleteApplication._make, cur.fetchall()))
 
     return render_template(
         "profile.html",
@@ -413,77 +540,97 @@ def profile_page():
         applications=applications
     )
 
+FEED_PAGE_SIZE = 20
+FEED_PAGE_MAX = 100
+
+
+# Forwarded applications for the signed-in coach/sponsor, newest first.
+# Keyset-paginated on (submission_date, id); pass next_cursor back as ?cursor=...
+@app.route("/feed")
+def application_feed():
+    user = current_user()
+    if user is None:
+        return jsonify({"success": False, "message": "Not authenticated"}), 401
+
+    user_type = user["user_type"]
+    if user_type not in ('coach', 'sponsor'):
+        return jsonify({"success": False, "message": "Only coaches or sponsors have a feed"}), 403
+
+    limit = min(max(request.args.get("limit", FEED_PAGE_SIZE, type=int), 1), FEED_PAGE_MAX)
+    cursor = request.args.get("cursor")
+
+    try:
+        sql, params = queries.feed_page(user_type, cursor, limit)
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid cursor"}), 400
+
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute_prepared(sql, params)
+        rows = queries.rows_as_dicts(queries.FEED_COLUMNS, cur.fetchall())
+
+    applications = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = queries.feed_cursor(applications[-1])
+
+    return jsonify({"applications": applications, "next_cursor": next_cursor})
+
+
+# Precomputed matches for the signed-in user (see recommendations.py), grouped by role.
+@app.route("/recommendations")
+def recommendations():
+    user = current_user()
+    if user is None:
+        return jsonify({"success": False, "message": "Not authenticated"}), 401
+
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute(queries.USER_RECOMMENDATIONS, (user["user_type"], user["id"]))
+        rows = queries.described_dicts(cur, cur.fetchall())
+
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.pop("target_role"), []).append(row)
+    return jsonify({"recommendations": grouped})
+
+
 # ----- profile update endpoints -----
 
 @app.route("/update_profile/athlete", methods=["POST"])
 def update_profile_athlete():
-    if "email" not in session or session.get("user_type") != "athlete":
+    user = current_user()
+    if user is None or user["user_type"] != "athlete":
         return redirect(url_for("login_page"))
 
-    email = session["email"]
+    email = user["email"]
 
-    # fetch current values
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT full_name, age, gender, sport, achievements, ranking, experience_years, contact_number, location
-        FROM athletes WHERE email=%s
-    """, (email,))
-    row = cur.fetchone()
-    if not row:
-        cur.close(); conn.close()
-        return redirect(url_for("profile_page"))
-
-    current = {
-        "full_name": row[0],
-        "age": row[1],
-        "gender": row[2],
-        "sport": row[3],
-        "achievements": row[4],
-        "ranking": row[5],
-        "experience_years": row[6],
-        "contact_number": row[7],
-        "location": row[8],
-    }
+    with get_db() as conn, conn.cursor() as cur:
+        # fetch current values
+        cur.execute(queries.select_profile("athlete"), (email,))
+        row = cur.fetchone()
+        if not row:
+            return redirect(url_for("profile_page"))
 
-    # merge with form values (keep old if not provided)
-    updated = {
-        "full_name": request.form.get("full_name") or current["full_name"],
-        "age": request.form.get("age") or current["age"],
-        "gender": request.form.get("gender") or current["gender"],
-        "sport": request.form.get("sport") or current["sport"],
-        "achievements": request.form.get("achievements") or current["achievements"],
-        "ranking": request.form.get("ranking") or current["ranking"],
-        "experience_years": request.form.get("experience_years") or current["experience_years"],
-        "contact_number": request.form.get("contact_number") or current["contact_number"],
-        "location": request.form.get("location") or current["location"],
-    }
+        # merge with form values (keep old if not provided)
+        current = dict(zip(PROFILE_COLUMNS["athlete"], row))
+        updated = [request.form.get(col) or current[col] for col in PROFILE_COLUMNS["athlete"]]
 
-    try:
-        cur.execute("""
-            UPDATE athletes
-            SET full_name=%s, age=%s, gender=%s, sport=%s, achievements=%s,
-                ranking=%s, experience_years=%s, contact_number=%s, location=%s
-            WHERE email=%s
-        """, (updated["full_name"], updated["age"], updated["gender"], updated["sport"],
-              updated["achievements"], updated["ranking"], updated["experience_years"],
-              updated["contact_number"], updated["location"], email))
-        conn.commit()
-    except Exception as e:
-        logging.exception("Error updating athlete profile")
-    finally:
-        cur.close()
-        conn.close()
+        try:
+            cur.execute(queries.update_profile("athlete"), (*updated, email))
+            conn.commit()
+            forget_user("athlete", email)
+        except Exception as e:
+            logging.exception("Error updating athlete profile")
 
     return redirect(url_for("profile_page"))
 
 
 @app.route("/update_profile/coach", methods=["POST"])
 def update_profile_coach():
-    if "email" not in session or session.get("user_type") != "coach":
+    user = current_user()
+    if user is None or user["user_type"] != "coach":
         return redirect(url_for("login_page"))
 
-    email = session["email"]
+    email = user["email"]
     full_name = request.form.get("full_name")
     specialization = request.form.get("specialization")
     certifications = request.form.get("certifications")
@@ -492,34 +639,23 @@ def update_profile_coach():
     location = request.form.get("location")
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE coaches
-            SET full_name=%s,
-                specialization=%s,
-                certifications=%s,
-                experience_years=%s,
-                contact_number=%s,
-                location=%s
-            WHERE email=%s
-        """, (full_name, specialization, certifications, experience_years, contact_number, location, email))
-        conn.commit()
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(queries.update_profile("coach"), (full_name, specialization, certifications, experience_years, contact_number, location, email))
+            conn.commit()
+        forget_user("coach", email)
     except Exception as e:
         logging.exception("Error updating coach profile")
-    finally:
-        cur.close()
-        conn.close()
 
     return redirect(url_for("profile_page"))
 
 
 @app.route("/update_profile/sponsor", methods=["POST"])
 def update_profile_sponsor():
-    if "email" not in session or session.get("user_type") != "sponsor":
+    user = current_user()
+    if user is None or user["user_type"] != "sponsor":
         return redirect(url_for("login_page"))
 
-    email = session["email"]
+    email = user["email"]
     name = request.form.get("name")
     contact_person = request.form.get("contact_person")
     sport = request.form.get("sport")
@@ -527,101 +663,422 @@ def update_profile_sponsor():
     location = request.form.get("location")
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE sponsors
-            SET name=%s,
-                contact_person=%s,
-                sport=%s,
-                contact_number=%s,
-                location=%s
-            WHERE email=%s
-        """, (name, contact_person, sport, contact_number, location, email))
-        conn.commit()
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(queries.update_profile("sponsor"), (name, contact_person, sport, contact_number, location, email))
+            conn.commit()
+        forget_user("sponsor", email)
     except Exception as e:
         logging.exception("Error updating sponsor profile")
-    finally:
-        cur.close()
-        conn.close()
 
     return redirect(url_for("profile_page"))
 
 
+USERS_PAGE_SIZE = 50
+USERS_PAGE_MAX = 200
+
+
+# Keyset-paginated user listing: /get_users?type=athlete&after=<last id>&limit=50&q=<prefix>
 @app.route("/get_users")
 def get_users():
     user_type = request.args.get("type")
+    after_id = request.args.get("after", 0, type=int)
+    limit = min(max(request.args.get("limit", USERS_PAGE_SIZE, type=int), 1), USERS_PAGE_MAX)
+    search = (request.args.get("q") or "").strip().lower()
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+    users = []
+    next_cursor = None
 
-    try:
-        if user_type == "athlete":
-            cur.execute("SELECT id, full_name, email FROM athletes")
-            rows = cur.fetchall()
-            users = [{"id": r[0], "name": r[1], "email": r[2]} for r in rows]
+    if user_type in ROLE_TABLES:
+        sql, params = queries.user_page(user_type, after_id, limit, search)
+        try:
+            with get_db() as conn, conn.cursor() as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+            users = [{"id": r[0], "name": r[1], "email": r[2]} for r in rows[:limit]]
+            if len(rows) > limit:
+                next_cursor = users[-1]["id"]
 
-        elif user_type == "coach":
-            cur.execute("SELECT id, full_name, email FROM coaches")
-            rows = cur.fetchall()
-            users = [{"id": r[0], "name": r[1], "email": r[2]} for r in rows]
+        except Exception as e:
+            logging.exception("Error fetching users")
 
-        elif user_type == "sponsor":
-            cur.execute("SELECT id, name, email FROM sponsors")
-            rows = cur.fetchall()
-            users = [{"id": r[0], "name": r[1], "email": r[2]} for r in rows]
+    return jsonify({"users": users, "next_cursor": next_cursor})
 
-        else:
-            users = []
 
-    except Exception as e:
-        logging.exception("Error fetching users")
-        users = []
+INCOMPLETE_PAGE_SIZE = 100
+INCOMPLETE_PAGE_MAX = 1000
 
-    finally:
-        cur.close()
-        conn.close()
 
-    return jsonify(users)
+# Users whose profile is less than `below` percent complete, least complete first:
+#   /admin/incomplete_profiles?type=athlete&below=50&cursor=<next_cursor>&limit=100
+@app.route("/admin/incomplete_profiles")
+@admin_required
+def incomplete_profiles():
+    user_type = request.args.get("type", "athlete")
+    if user_type not in ROLE_TABLES:
+        return jsonify({"success": False, "message": "Invalid user type"}), 400
+
+    below = min(max(request.args.get("below", 50, type=int), 0), 101)
+    limit = min(max(request.args.get("limit", INCOMPLETE_PAGE_SIZE, type=int), 1), INCOMPLETE_PAGE_MAX)
+    try:
+        sql, params = queries.incomplete_profiles(user_type, below, request.args.get("cursor"), limit)
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid cursor"}), 400
+
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        users = queries.described_dicts(cur, rows[:limit])
+
+    next_cursor = queries.incomplete_cursor(users[-1]) if len(rows) > limit else None
+    return jsonify({"users": users, "next_cursor": next_cursor})
 
 
 @app.route("/delete_user/<user_type>/<int:user_id>", methods=["DELETE"])
 def delete_user(user_type, user_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
+    if user_type not in ROLE_TABLES:
+        return jsonify({"success": False, "message": "Invalid user type"}), 400
+
     try:
-        if user_type == "athlete":
-            cur.execute("DELETE FROM athletes WHERE id=%s", (user_id,))
-        elif user_type == "coach":
-            cur.execute("DELETE FROM coaches WHERE id=%s", (user_id,))
-        elif user_type == "sponsor":
-            cur.execute("DELETE FROM sponsors WHERE id=%s", (user_id,))
-        else:
-            return jsonify({"success": False, "message": "Invalid user type"}), 400
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(queries.delete_user(user_type), (user_id,))
+            deleted = cur.fetchone()
+            conn.commit()
 
-        conn.commit()
+        if deleted:
+            forget_user(user_type, deleted[0])
         return jsonify({"success": True})
 
     except Exception as e:
         logging.exception("Delete error")
         return jsonify({"success": False, "message": str(e)}), 500
 
-    finally:
-        cur.close()
-        conn.close()
 
+# Bulk delete: {"type": "athlete", "ids": [...]}, one transaction
+@app.route("/bulk_delete_users", methods=["POST"])
+@admin_required
+def bulk_delete_users():
+    data = request.get_json() or {}
+    user_type = data.get("type")
+    ids = bulk_ids(data)
+
+    if user_type not in ROLE_TABLES:
+        return jsonify({"success": False, "message": "Invalid user type"}), 400
+    if ids is None:
+        return jsonify({"success": False, "message": f"ids must be a list of 1-{BULK_MAX_IDS} integers"}), 400
+
+    try:
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(queries.bulk_delete_users(user_type), (ids,))
+            deleted = cur.fetchall()
+            conn.commit()
+
+        for _, email in deleted:
+            forget_user(user_type, email)
+
+        deleted_ids = {r[0] for r in deleted}
+        results = {i: ("deleted" if i in deleted_ids else "not_found") for i in ids}
+        return jsonify({"success": True, "deleted": len(deleted_ids), "results": results})
 
+    except Exception as e:
+        logging.exception("Bulk delete error")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+PENDING_BATCH_SIZE = 500
+
+
+# Streams pending applications straight from a server-side cursor.
+#   format=json (default) -> chunked JSON array, format=ndjson -> one object per line
+#   after_id / limit      -> keyset paging on id
+# The ETag comes from queries.PENDING_VERSION, so an admin page polling with
+# If-None-Match gets a 304 without the listing being read at all.
 @app.route('/get_pending_applications')
 def get_pending_applications():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM applications WHERE status='Pending'")
-    apps = cur.fetchall()
-    keys = [desc[0] for desc in cur.description]
-    result = [dict(zip(keys, row)) for row in apps]
-    cur.close()
-    conn.close()
-    return jsonify(result)
+    fmt = request.args.get("format", "json")
+    after_id = request.args.get("after_id", 0, type=int)
+    limit = request.args.get("limit", type=int)
+
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute_prepared(queries.PENDING_VERSION)
+        version = cur.fetchone()
+    etag = responses.etag(*version, fmt, after_id, limit)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    sql, params = queries.pending_page(after_id, limit)
+
+    def generate():
+        with get_db() as conn, conn.cursor(name="pending_applications") as cur:
+            cur.itersize = PENDING_BATCH_SIZE
+            cur.execute(sql, params)
+
+            if fmt == "ndjson":
+                for row in cur:
+                    yield app.json.dumps(dict(zip(PENDING_COLUMNS, row))) + "\n"
+                return
+
+            yield "["
+            first = True
+            for row in cur:
+                yield ("" if first else ",") + app.json.dumps(dict(zip(PENDING_COLUMNS, row)))
+                first = False
+            yield "]"
+
+    mimetype = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+    body = stream_with_context(generate())
+    encoding = responses.negotiate(request.headers.get("Accept-Encoding"))
+    response = Response(responses.compress_stream(body, encoding) if encoding else body, mimetype=mimetype)
+    if encoding:
+        responses.mark_encoded(response, encoding)
+    responses.revalidate(response)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+# Server-Sent Events with the ids of applications entering or leaving the
+# pending queue (see live.py). Each open stream holds a worker thread here;
+# serve many subscribers from asgi.py instead.
+@app.route('/live/pending')
+def live_pending():
+    live.ensure_listener(DB_CONFIG)
+    return Response(live.stream(("pending",)), mimetype="text/event-stream", headers=live.SSE_HEADERS)
+
+
+# Same for the signed-in coach/sponsor's forwarded-applications feed
+@app.route('/live/feed')
+def live_feed():
+    user = current_user()
+    if user is None:
+        return jsonify({"success": False, "message": "Not authenticated"}), 401
+
+    user_type = user["user_type"]
+    if user_type not in ('coach', 'sponsor'):
+        return jsonify({"success": False, "message": "Only coaches or sponsors have a feed"}), 403
+
+    live.ensure_listener(DB_CONFIG)
+    return Response(live.stream((f"feed:{user_type}",)), mimetype="text/event-stream", headers=live.SSE_HEADERS)
+
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_PAGE_MAX = 50
+SEARCH_MAX_PAGES = 100
+
+
+def search_args(args):
+    """Parsed /search query string shared by the WSGI and ASGI apps, or None if `type` is unknown."""
+    kind = args.get("type", "athlete")
+    if kind not in queries.SEARCH_TARGETS:
+        return None
+    return {
+        "kind": kind,
+        "text": (args.get("q") or "").strip(),
+        "filters": {col: args.get(col) for col in queries.SEARCH_TARGETS[kind]["facets"]},
+        "max_ranking": args.get("max_ranking", type=int),
+        "page": min(max(args.get("page", 1, type=int), 1), SEARCH_MAX_PAGES),
+        "limit": min(max(args.get("limit", SEARCH_PAGE_SIZE, type=int), 1), SEARCH_PAGE_MAX),
+    }
+
+
+# Ranked full-text search with facet counts:
+#   /search?type=athlete&q=sprint+gold&sport=Athletics&location=Pune&max_ranking=50&page=2
+# Results are ordered by relevance, so paging is by page number rather than keyset.
+@app.route("/search")
+def search():
+    a = search_args(request.args)
+    if a is None:
+        return jsonify({"success": False, "message": "Invalid search type"}), 400
+
+    offset = (a["page"] - 1) * a["limit"]
+    page_sql, page_params = queries.search_page(a["kind"], a["text"], a["filters"], a["limit"], offset,
+                                                a["max_ranking"])
+    facet_sql, facet_params = queries.search_facets(a["kind"], a["text"], a["filters"], a["max_ranking"])
+
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(page_sql, page_params)
+            rows = cur.fetchall()
+            results = queries.described_dicts(cur, rows[:a["limit"]])
+            cur.execute(facet_sql, facet_params)
+            facets = queries.facet_counts(a["kind"], cur.fetchall())
+
+    return jsonify({
+        "results": results,
+        "facets": facets,
+        "page": a["page"],
+        "has_more": len(rows) > a["limit"],
+    })
+
+
+POOL_COUNTERS = ("checkouts", "wait_time_total", "exhausted", "timeouts", "opened", "closed", "recycled",
+                 "failed_health_checks")
+CACHE_COUNTERS = ("hits", "misses", "evictions", "expired")
+
+
+# Prometheus scrape target: request latency, per-request query counts, slow queries, pool and cache counters
+@app.route('/metrics')
+def metrics_endpoint():
+    if not (is_admin() or metrics_token_ok(request.headers.get("Authorization"))):
+        return jsonify(ADMIN_REQUIRED), 403
+    body = metrics.render(
+        metrics.stats_lines("db_pool", pool.stats(), counters=POOL_COUNTERS),
+        metrics.stats_lines("profile_cache", profile_cache.stats(), counters=CACHE_COUNTERS),
+        metrics.stats_lines("live", live.hub.stats(), counters=live.COUNTERS),
+    )
+    return Response(body, content_type=metrics.CONTENT_TYPE)
+
+
+DEAD_JOBS_SHOWN = 100
+
+
+# Background queue health: job counts by status and the most recent dead letters
+@app.route('/admin/jobs')
+@admin_required
+def job_stats():
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute(queries.JOB_COUNTS)
+        counts = {status: {"count": count, "oldest_run_at": oldest_run_at}
+                  for status, count, oldest_run_at in cur.fetchall()}
+        cur.execute(queries.DEAD_JOBS, (DEAD_JOBS_SHOWN,))
+        dead = queries.described_dicts(cur, cur.fetchall())
+    return jsonify({"counts": counts, "dead": dead})
+
+
+# Put dead-lettered jobs back on the queue: {"ids": [...]}
+@app.route('/admin/jobs/requeue', methods=['POST'])
+@admin_required
+def requeue_jobs():
+    ids = bulk_ids(request.get_json() or {})
+    if ids is None:
+        return jsonify({"success": False, "message": f"ids must be a list of 1-{BULK_MAX_IDS} integers"}), 400
+
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute(queries.REQUEUE_DEAD_JOBS, (ids,))
+        requeued = [r[0] for r in cur.fetchall()]
+        conn.commit()
+    return jsonify({"success": True, "requeued": requeued})
+
+
+def import_args(args):
+    """(kind, format, on_conflict) from the query string, or None if any is invalid."""
+    kind = args.get("kind")
+    fmt = args.get("format", "csv")
+    on_conflict = args.get("on_conflict", "skip")
+    if kind not in imports.KINDS or fmt not in imports.FORMATS or on_conflict not in imports.ON_CONFLICT:
+        return None
+    return kind, fmt, on_conflict
+
+
+IMPORT_ARGS_MESSAGE = (f"kind must be one of {', '.join(imports.KINDS)}, format one of {', '.join(imports.FORMATS)}"
+                       f" and on_conflict one of {', '.join(imports.ON_CONFLICT)}")
+IMPORT_CHUNK_BYTES = 64 * 1024
+
+
+# Bulk import: the CSV (with header row) or JSON Lines file is the raw request body.
+#   POST /admin/imports?kind=athletes&format=csv&on_conflict=skip
+# The body is spooled to disk and loaded by an "import.run" job (imports.py);
+# poll /admin/imports/<import_id> for its report.
+@app.route('/admin/imports', methods=['POST'])
+@admin_required
+def start_import():
+    args = import_args(request.args)
+    if args is None:
+        return jsonify({"success": False, "message": IMPORT_ARGS_MESSAGE}), 400
+    kind, fmt, on_conflict = args
+
+    request.max_content_length = imports.IMPORT_MAX_BYTES
+    with imports.Spool(fmt) as spool:
+        for chunk in iter(lambda: request.stream.read(IMPORT_CHUNK_BYTES), b""):
+            spool.write(chunk)
+    if not spool.size:
+        os.unlink(spool.path)
+        return jsonify({"success": False, "message": "Empty import file"}), 400
+
+    try:
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(queries.INSERT_IMPORT, (kind, fmt, on_conflict, spool.path))
+            import_id = cur.fetchone()[0]
+            jobs.enqueue(cur, "import.run", {"id": import_id})
+            conn.commit()
+    except Exception as e:
+        logging.exception("Import error")
+        os.unlink(spool.path)
+        return jsonify({"success": False, "message": str(e)}), 500
+    return jsonify({"success": True, "import_id": import_id, "bytes": spool.size}), 202
+
+
+@app.route('/admin/imports/<int:import_id>')
+@admin_required
+def import_status(import_id):
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute(queries.IMPORT_STATUS, (import_id,))
+        rows = queries.described_dicts(cur, cur.fetchall())
+    if not rows:
+        return jsonify({"success": False, "message": "Import not found"}), 404
+    return jsonify(rows[0])
+
+
+# Application and user counts from the rollup tables (analytics.py):
+#   /admin/stats?since=2024-01-01&until=2024-07-01   (dates bound the application counts)
+@app.route('/admin/stats')
+@admin_required
+def admin_stats():
+    try:
+        since, until = analytics.stats_params(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute(queries.APPLICATION_STATS, (since, until))
+        application_rows = cur.fetchall()
+        cur.execute(queries.USER_STATS)
+        user_rows = cur.fetchall()
+    return jsonify(analytics.shape(application_rows, user_rows))
+
+
+# Recount the base tables in the background and correct any rollup drift
+@app.route('/admin/stats/reconcile', methods=['POST'])
+@admin_required
+def reconcile_stats():
+    with get_db() as conn, conn.cursor() as cur:
+        jobs.enqueue(cur, "analytics.reconcile", {"fix": True})
+        conn.commit()
+    return jsonify({"success": True}), 202
+
+
+# Streaming export for offline reporting (exports.py):
+#   /admin/export/applications?format=csv&status=Pending&sport=football&since=2024-01-01&until=2024-07-01
+# format is csv, ndjson or parquet; status only applies to applications.
+@app.route('/admin/export/<kind>')
+@admin_required
+def export(kind):
+    fmt = request.args.get("format", "csv")
+    try:
+        body = exports.stream(get_db, kind, fmt, **exports.filters(request.args))
+    except exports.ExportUnavailable as e:
+        return jsonify({"success": False, "message": str(e)}), 501
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    encoding = responses.negotiate(request.headers.get("Accept-Encoding")) if fmt in exports.COMPRESSIBLE else None
+    response = Response(responses.compress_stream(body, encoding) if encoding else body,
+                        mimetype=exports.MIMETYPES[fmt], headers=exports.headers(kind, fmt))
+    if encoding:
+        responses.mark_encoded(response, encoding)
+    return response
+
+
+@app.route('/admin/pool_stats')
+@admin_required
+def pool_stats():
+    return jsonify(pool.stats())
+
+
+@app.route('/admin/cache_stats')
+@admin_required
+def cache_stats():
+    return jsonify(profile_cache.stats())
 
 
 # Admin endpoint: forward (makes visible to coaches/sponsors) or deny
@@ -634,39 +1091,72 @@ def update_application_status(app_id):
     if status not in ('Forwarded', 'Denied'):
         return jsonify({"success": False, "message": "Invalid status"}), 400
 
+    if status == 'Forwarded' and not app_type:
+        return jsonify({"success": False, "message": "Missing application type for forwarding"}), 400
+
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        if status == 'Forwarded':
-            if not app_type:
-                cur.close(); conn.close()
-                return jsonify({"success": False, "message": "Missing application type for forwarding"}), 400
-            cur.execute("""
-                UPDATE applications
-                SET status = %s,
-                    forwarded_date = %s
-                WHERE id = %s
-            """, ('Forwarded', datetime.utcnow(), app_id))
-        else:
-            cur.execute("UPDATE applications SET status = %s WHERE id = %s", ('Denied', app_id))
+        with get_db() as conn, conn.cursor() as cur:
+            result = application_status.review(cur, [app_id], status)[app_id]
+            conn.commit()
 
-        conn.commit()
-        cur.close()
-        conn.close()
+        if result == "not_found":
+            return jsonify({"success": False, "message": "Application not found"}), 404
+        if result != "updated":
+            return jsonify({"success": False, "message": f"Application is already {result}"}), 409
         return jsonify({"success": True})
     except Exception as e:
         logging.exception("Error updating application status")
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+BULK_MAX_IDS = 5000
+
+
+def bulk_ids(data):
+    """Validated, de-duplicated list of int ids from a bulk request body, or None."""
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not ids or len(ids) > BULK_MAX_IDS:
+        return None
+    try:
+        return sorted({int(i) for i in ids})
+    except (TypeError, ValueError):
+        return None
+
+
+# Bulk forward/deny: {"ids": [...], "status": "Forwarded" | "Denied"}, one transaction
+@app.route('/bulk_update_application_status', methods=['POST'])
+@admin_required
+def bulk_update_application_status():
+    data = request.get_json() or {}
+    status = data.get('status')
+    ids = bulk_ids(data)
+
+    if status not in ('Forwarded', 'Denied'):
+        return jsonify({"success": False, "message": "Invalid status"}), 400
+    if ids is None:
+        return jsonify({"success": False, "message": f"ids must be a list of 1-{BULK_MAX_IDS} integers"}), 400
+
+    try:
+        with get_db() as conn, conn.cursor() as cur:
+            results = application_status.review(cur, ids, status)
+            conn.commit()
+
+        updated = sum(1 for r in results.values() if r == "updated")
+        return jsonify({"success": True, "updated": updated, "results": results})
+    except Exception as e:
+        logging.exception("Error bulk updating application status")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 # Coach/Sponsor responds to forwarded application
 @app.route('/respond_application/<int:app_id>', methods=['POST'])
 def respond_application(app_id):
-    if "email" not in session or "user_type" not in session:
+    user = current_user()
+    if user is None:
         return jsonify({"success": False, "message": "Not authenticated"}), 401
 
-    user_type = session.get("user_type")  # 'coach' or 'sponsor'
-    user_email = session.get("email")
+    user_type = user["user_type"]  # 'coach' or 'sponsor'
+    user_email = user["email"]
     if user_type not in ('coach', 'sponsor'):
         return jsonify({"success": False, "message": "Only coaches or sponsors can respond"}), 403
 
@@ -678,50 +1168,14 @@ def respond_application(app_id):
         return jsonify({"success": False, "message": "Invalid action"}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT id, status, application_type FROM applications WHERE id=%s", (app_id,))
-        app_row = cur.fetchone()
-        if not app_row:
-            cur.close(); conn.close()
-            return jsonify({"success": False, "message": "Application not found"}), 404
-
-        if app_row['status'] != 'Forwarded':
-            cur.close(); conn.close()
-            return jsonify({"success": False, "message": "Application is not available for response"}), 400
-
-        app_type = (app_row['application_type'] or "").strip().lower()
-        if user_type == 'coach' and app_type != 'coach':
-            cur.close(); conn.close()
-            return jsonify({"success": False, "message": "This application was not forwarded to coaches"}), 403
-        if user_type == 'sponsor' and app_type != 'sponsor':
-            cur.close(); conn.close()
-            return jsonify({"success": False, "message": "This application was not forwarded to sponsors"}), 403
-
-        if action == 'approve':
-            cur.execute("""
-                UPDATE applications
-                SET status = %s,
-                    assigned_to_type = %s,
-                    assigned_to_email = %s,
-                    assigned_date = %s,
-                    approval_notes = %s
-                WHERE id = %s
-            """, ('Approved', user_type, user_email, datetime.utcnow(), notes, app_id))
-            conn.commit()
-            cur.close(); conn.close()
-            return jsonify({"success": True, "message": "Application approved"})
-
-        else:  # deny
-            cur.execute("""
-                UPDATE applications
-                SET status = %s,
-                    approval_notes = %s
-                WHERE id = %s
-            """, ('Denied', notes, app_id))
+        with get_db() as conn, conn.cursor() as cur:
+            application_status.respond(cur, app_id, user_type, user_email, action, notes)
             conn.commit()
-            cur.close(); conn.close()
-            return jsonify({"success": True, "message": "Application denied"})
+        message = "Application approved" if action == 'approve' else "Application denied"
+        return jsonify({"success": True, "message": message})
+
+    except application_status.TransitionError as e:
+        return jsonify({"success": False, "message": e.message}), e.status_code
 
     except Exception as e:
         logging.exception("Error responding to application")
@@ -732,4 +1186,5 @@ def respond_application(app_id):
 
 
 if __name__ == "__main__":
+    pool.warm_up()
     app.run(debug=True)
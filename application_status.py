@@ -0,0 +1,113 @@
+# application_status.py - application status state machine
+#
+#   Pending --admin--> Forwarded --coach/sponsor--> Approved
+#      |                   |
+#      +--admin--> Denied <+--coach/sponsor
+#
+# Every transition is a single conditional UPDATE guarded on the current status,
+# so concurrent requests can't both succeed: the losers match zero rows.
+#
+# review() and respond() drive a psycopg2 cursor; asgi.py drives the same
+# statements through asyncpg using the *_statement / *_results / *_event helpers.
+# A successful transition also enqueues a job (jobs.py) and publishes live
+# deltas (live.py) in the same transaction.
+from datetime import datetime
+
+import jobs
+import live
+import queries
+
+
+PENDING = "Pending"
+FORWARDED = "Forwarded"
+APPROVED = "Approved"
+DENIED = "Denied"
+
+TRANSITIONS = {
+    PENDING: (FORWARDED, DENIED),
+    FORWARDED: (APPROVED, DENIED),
+    APPROVED: (),
+    DENIED: (),
+}
+
+
+class TransitionError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def review_statement(ids, new_status):
+    if new_status not in TRANSITIONS[PENDING]:
+        raise TransitionError("Invalid status", 400)
+    if new_status == FORWARDED:
+        return queries.FORWARD_PENDING, (datetime.utcnow(), ids)
+    return queries.DENY_PENDING, (ids,)
+
+
+def review_results(ids, updated, current):
+    """{id: "updated" | "not_found" | <current status>} for every requested id."""
+    updated = set(updated)
+    return {i: "updated" if i in updated else current.get(i, "not_found") for i in ids}
+
+
+def reviewed_event(updated, new_status):
+    return jobs.event("application.reviewed", {"ids": updated, "status": new_status})
+
+
+def review(cur, ids, new_status):
+    """Admin step: move Pending applications to Forwarded or Denied."""
+    cur.execute(*review_statement(ids, new_status))
+    rows = cur.fetchall()
+    updated = [r[0] for r in rows]
+    if updated:
+        cur.execute(*reviewed_event(updated, new_status))
+        for statement in live.reviewed_deltas(rows, new_status):
+            cur.execute(*statement)
+
+    current = {}
+    missed = sorted(set(ids) - set(updated))
+    if missed:
+        # only the ids that didn't transition pay for this lookup
+        cur.execute(queries.CURRENT_STATUSES, (missed,))
+        current = dict(cur.fetchall())
+    return review_results(ids, updated, current)
+
+
+def respond_statement(app_id, responder_type, responder_email, action, notes):
+    if action == "approve":
+        return queries.APPROVE_FORWARDED, (responder_type, responder_email, datetime.utcnow(), notes,
+                                           app_id, responder_type)
+    if action == "deny":
+        return queries.DENY_FORWARDED, (notes, app_id, responder_type)
+    raise TransitionError("Invalid action", 400)
+
+
+def respond_failure(current, responder_type):
+    """Explain why a guarded respond UPDATE matched nothing, given (status, application_type) or None."""
+    if not current:
+        return TransitionError("Application not found", 404)
+    if current[0] != FORWARDED:
+        return TransitionError("Application is not available for response", 400)
+    plural = "coaches" if responder_type == "coach" else "sponsors"
+    return TransitionError(f"This application was not forwarded to {plural}", 403)
+
+
+def responded_event(app_id, new_status, responder_type):
+    return jobs.event("application.responded", {"id": app_id, "status": new_status,
+                                                "responder_type": responder_type})
+
+
+def respond(cur, app_id, responder_type, responder_email, action, notes):
+    """Coach/sponsor step: Forwarded -> Approved/Denied. Raises TransitionError if it lost."""
+    cur.execute(*respond_statement(app_id, responder_type, responder_email, action, notes))
+    row = cur.fetchone()
+    if row:
+        cur.execute(*responded_event(app_id, row[1], responder_type))
+        for statement in live.responded_deltas(app_id, responder_type):
+            cur.execute(*statement)
+        return row
+
+    cur.execute(queries.APPLICATION_STATE, (app_id,))
+    raise respond_failure(cur.fetchone(), responder_type)
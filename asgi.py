@@ -0,0 +1,1001 @@
+# asgi.py - async serving mode: the same routes as app.py on Quart + asyncpg
+#
+#   hypercorn asgi:app --bind 0.0.0.0:8000
+#
+# SQL comes from queries.py and request helpers from app.py, so the two modes
+# share one definition of every query. Sessions live in the sessions.py store,
+# so with SESSION_URL pointing both modes at one Redis, a cookie issued by
+# either mode is valid in the other.
+import os
+import json
+import asyncio
+import logging
+from functools import lru_cache, wraps
+
+import asyncpg
+from quart import (
+    Quart, Request, Response, g, request, jsonify, render_template, session, redirect, url_for, abort,
+    send_file, send_from_directory,
+)
+from quart.wrappers.response import DataBody
+from quart.sessions import SessionInterface
+from quart_cors import cors
+from werkzeug.exceptions import HTTPException
+
+import analytics
+import application_status
+import assets
+import documents
+import exports
+import imports
+import jobs
+import live
+import metrics
+import queries
+import responses
+import sessions
+from queries import ROLE_TABLES, PROFILE_COLUMNS
+from app import (
+    LOG_PAYLOADS, POOL_COUNTERS, CACHE_COUNTERS, DEAD_JOBS_SHOWN, ROLE_ALIASES, BULK_MAX_IDS,
+    FEED_PAGE_SIZE, FEED_PAGE_MAX, USERS_PAGE_SIZE, USERS_PAGE_MAX, INCOMPLETE_PAGE_SIZE, INCOMPLETE_PAGE_MAX,
+    PENDING_BATCH_SIZE, SUPPORTING_DOCS_MAX, IMPORT_ARGS_MESSAGE, redacted, dashboard_summary, bulk_ids, search_args, forget_user,
+    import_args, admin_password_ok, metrics_token_ok, ADMIN_REQUIRED,
+)
+from cache import profile_cache, profile_key
+from db import DB_CONFIG, POOL_MIN, POOL_MAX, POOL_MAX_USES, POOL_PING_AFTER
+from hashing import hash_password, verify_password, needs_rehash, HashingBusy
+
+class ServerSessionInterface(SessionInterface):
+    # Quart flavour of sessions.ServerSessionInterface; the store and cookie handling are shared
+    async def open_session(self, app, request):
+        return sessions.open_session(request.cookies.get(self.get_cookie_name(app)))
+
+    async def save_session(self, app, session, response):
+        sessions.write_cookie(self, app, session, response, sessions.save_session(session))
+
+
+def body_limit(max_bytes):
+    """Route decorator: accept request bodies up to `max_bytes` instead of MAX_CONTENT_LENGTH."""
+    def decorate(view):
+        view.max_content_length = max_bytes
+        return view
+    return decorate
+
+
+class DocumentRequest(Request):
+    # multipart file parts are written straight into the document blob store
+    def __init__(self, method, scheme, path, *args, **kwargs):
+        # Quart fixes the body's limit here, before the route runs, so app.py's
+        # `request.max_content_length = ...` inside the route would come too late;
+        # look up the route's @body_limit instead
+        if method in ("POST", "PUT", "PATCH"):
+            try:
+                endpoint, _ = app.url_map.bind("", url_scheme=scheme).match(path, method=method)
+            except HTTPException:
+                endpoint = None
+            max_bytes = getattr(app.view_functions.get(endpoint), "max_content_length", None)
+            if max_bytes is not None:
+                kwargs["max_content_length"] = max_bytes
+        super().__init__(method, scheme, path, *args, **kwargs)
+
+    def make_form_data_parser(self):
+        parser = super().make_form_data_parser()
+        parser.stream_factory = documents.stream_factory
+        return parser
+
+
+app = cors(Quart(__name__))
+app.request_class = DocumentRequest
+app.config["MAX_CONTENT_LENGTH"] = documents.DOCUMENT_MAX_BYTES + 64 * 1024
+app.secret_key = os.environ.get("FLASK_SECRET_KEY", "replace_this_in_prod")
+app.session_interface = ServerSessionInterface()
+app.jinja_env.globals["asset_url"] = assets.asset_url
+
+pg = None
+live_listener = None
+
+
+@lru_cache(maxsize=None)
+def q(sql):
+    return queries.to_asyncpg(sql)
+
+
+connection_events = {"opened": 0, "closed": 0}
+
+
+class InstrumentedConnection(asyncpg.Connection):
+    """asyncpg connection that reports every statement to metrics.timed_query()."""
+
+    async def execute(self, query, *args, **kwargs):
+        with metrics.timed_query(query):
+            return await super().execute(query, *args, **kwargs)
+
+    async def executemany(self, command, args, **kwargs):
+        with metrics.timed_query(command):
+            return await super().executemany(command, args, **kwargs)
+
+    async def fetch(self, query, *args, **kwargs):
+        with metrics.timed_query(query):
+            return await super().fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        with metrics.timed_query(query):
+            return await super().fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        with metrics.timed_query(query):
+            return await super().fetchval(query, *args, **kwargs)
+
+
+def _connection_closed(conn):
+    connection_events["closed"] += 1
+
+
+async def _init_connection(conn):
+    # psycopg2 sends every parameter as a literal and lets Postgres coerce it;
+    # mirror that for integer columns so form strings like "21" are accepted
+    for typ in ("int2", "int4", "int8"):
+        await conn.set_type_codec(typ, schema="pg_catalog", encoder=str, decoder=int, format="text")
+    connection_events["opened"] += 1
+    conn.add_termination_listener(_connection_closed)
+
+
+@app.before_serving
+async def open_pool():
+    global pg, live_listener
+    pg = await asyncpg.create_pool(
+        min_size=POOL_MIN,
+        max_size=POOL_MAX,
+        max_queries=POOL_MAX_USES or 50000,
+        max_inactive_connection_lifetime=POOL_PING_AFTER * 10,
+        init=_init_connection,
+        connection_class=InstrumentedConnection,
+        **DB_CONFIG
+    )
+    # this process's one LISTEN connection for /live/*
+    live_listener = asyncio.create_task(live.listen_async(live.hub, lambda: asyncpg.connect(**DB_CONFIG)))
+
+
+@app.after_serving
+async def close_pool():
+    live_listener.cancel()
+    await pg.close()
+
+
+@app.before_request
+async def start_request_metrics():
+    metrics.start_request()
+
+
+@app.after_request
+async def finish_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    metrics.finish_request(request.method, route, response.status_code)
+    return response
+
+
+@app.after_request
+async def json_validators_and_compression(response):
+    if response.status_code != 200 or not responses.is_json(response) or not isinstance(response.response, DataBody):
+        return response
+    if request.method in ("GET", "HEAD"):
+        responses.revalidate(response)
+        await response.add_etag(weak=True)
+        await response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+    encoding = responses.negotiate(request.headers.get("Accept-Encoding"))
+    if encoding and response.content_length >= responses.COMPRESS_MIN_BYTES:
+        response.set_data(responses.compress(await response.get_data(), encoding))
+        responses.mark_encoded(response, encoding)
+    return response
+
+
+@app.route("/assets/<path:filename>")
+async def asset(filename):
+    found = assets.resolve(filename, request.headers.get("Accept-Encoding"))
+    if found is None:
+        abort(404)
+    path, mimetype, encoding = found
+    response = await send_from_directory(assets.DIST_DIR, path, mimetype=mimetype, cache_timeout=assets.ASSET_MAX_AGE)
+    return assets.immutable(response, filename, encoding)
+
+
+async def current_user():
+    # loaded on first use by the routes that need it, then kept on g
+    if "user" not in g:
+        g.user = await _load_identity()
+    return g.user
+
+
+async def _load_identity():
+    email, user_type = session.get("email"), session.get("user_type")
+    if not email or user_type not in ROLE_TABLES:
+        return None
+
+    # bound to the signed-in account id, so a re-registered email doesn't inherit old sessions
+    user = sessions.get_identity(user_type, email)
+    if user is None or user["id"] != session.get("user_id"):
+        row = await pg.fetchrow(q(queries.identity(user_type)), email)
+        if row is None or row[0] != session.get("user_id"):
+            # the account was deleted (or replaced) since sign-in
+            session.clear()
+            return None
+        user = sessions.set_identity(user_type, email, row)
+    return user
+
+
+def is_admin():
+    return session.get("admin") is True
+
+
+def admin_required(view):
+    """Route decorator: 403 unless the session signed in through POST /adminlogin."""
+    @wraps(view)
+    async def guarded(*args, **kwargs):
+        if not is_admin():
+            return jsonify(ADMIN_REQUIRED), 403
+        return await view(*args, **kwargs)
+    return guarded
+
+
+async def load_profile(user_type, email):
+    if user_type not in PROFILE_COLUMNS:
+        return None
+
+    key = profile_key(user_type, email)
+    user = profile_cache.get(key)
+    if user is not None:
+        return user
+
+    row = await pg.fetchrow(q(queries.select_profile(user_type)), email)
+    if not row:
+        return None
+
+    user = dict(row)
+    profile_cache.set(key, user)
+    return user
+
+
+# ----- pages -----
+
+@app.route("/")
+async def home():
+    return await render_template("index.html")
+
+
+@app.route("/login_page")
+async def login_page():
+    return await render_template("login.html")
+
+
+@app.route("/application")
+async def application_page():
+    return await render_template("application.html")
+
+
+@app.route('/admin')
+async def admin():
+    return await render_template('admin.html')
+
+
+@app.route('/adminlogin')
+async def adminlogin():
+    return await render_template('adminlogin.html')
+
+
+@app.route('/adminlogin', methods=['POST'])
+async def admin_login():
+    data = await request.get_json() or {}
+    if not admin_password_ok(data.get("password")):
+        return jsonify({"success": False, "message": "Incorrect password"}), 401
+    session.regenerate()
+    session["admin"] = True
+    return jsonify({"success": True, "redirect": "/admin"})
+
+
+@app.route("/manage_users")
+async def manage_users():
+    return await render_template("manage_users.html")
+
+
+@app.route("/application_approval")
+async def application_approval():
+    return await render_template("application_approval.html")
+
+
+# ----- auth -----
+
+@app.route("/register", methods=["POST"])
+async def register():
+    if request.is_json:
+        data = await request.get_json() or {}
+    else:
+        data = (await request.form).to_dict() or request.args.to_dict() or {}
+
+    if LOG_PAYLOADS:
+        logging.debug("Register payload received: %s", redacted(data))
+
+    email = (data.get("email") or "").strip()
+    password = data.get("password")
+    user_type = (data.get("type") or data.get("user_type") or "").strip()
+    full_name = data.get("full_name") or data.get("name") or data.get("contact_person")
+
+    if not email or not password or not user_type:
+        return jsonify({"success": False, "message": "Missing fields (email, password, type)"}), 400
+
+    role = ROLE_ALIASES.get(user_type.lower())
+    if not role:
+        return jsonify({"success": False, "message": f"Invalid user type: {user_type}"}), 400
+
+    try:
+        if await pg.fetchval(q(queries.EMAIL_EXISTS), email):
+            return jsonify({"success": False, "message": "Email already registered!"}), 400
+
+        hashed_password = await asyncio.to_thread(hash_password, password)
+
+        params = (email, hashed_password, full_name)
+        if role == "sponsor":
+            params += (full_name,)
+        await pg.execute(q(queries.INSERT_USER[role]), *params)
+        return jsonify({"success": True, "message": "Registration successful!"})
+
+    except asyncpg.UniqueViolationError:
+        return jsonify({"success": False, "message": "Email already registered!"}), 400
+
+    except HashingBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
+
+    except Exception as e:
+        logging.exception("Register error")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+async def rehash_password(user_type, role_id, password):
+    try:
+        new_hash = await asyncio.to_thread(hash_password, password)
+        await pg.execute(q(queries.update_password(user_type)), new_hash, role_id)
+    except Exception:
+        logging.exception("Password rehash failed for %s %s", user_type, role_id)
+
+
+@app.route("/login", methods=["POST"])
+async def login():
+    data = await request.get_json() or {}
+    email = data.get("email")
+    password = data.get("password")
+
+    if not email or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 400
+
+    try:
+        row = await pg.fetchrow(q(queries.LOGIN_LOOKUP), email)
+        if row and await asyncio.to_thread(verify_password, row["password"], password):
+            if needs_rehash(row["password"]):
+                await rehash_password(row["role"], row["role_id"], password)
+
+            display_name = row["display_name"] or email.split("@")[0]
+            session.regenerate()
+            session['email'] = email
+            session['user_type'] = row["role"]
+            session['user_id'] = row["role_id"]
+            session['display_name'] = display_name
+
+            return jsonify({
+                "success": True,
+                "message": "Login successful",
+                "type": row["role"],
+                "display_name": display_name,
+                "redirect": "/dashboard"
+            })
+
+        return jsonify({"success": False, "message": "Invalid credentials"}), 401
+
+    except HashingBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
+
+    except Exception as e:
+        logging.exception("Login error")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+# ----- applications -----
+
+@app.route("/submit_application", methods=["POST"])
+async def submit_application():
+    data = await request.get_json() or {}
+    if not data.get("athlete_name") or not data.get("sport") or not data.get("application_type"):
+        return jsonify({"success": False, "message": "Missing required fields"}), 400
+    if len(data.get("supporting_docs") or "") > SUPPORTING_DOCS_MAX:
+        return jsonify({"success": False, "message": "supporting_docs holds links only; upload files to /documents"}), 400
+    document_ids = documents.attachable(data.get("document_ids"), session.get("uploads"))
+
+    athlete_email = session.get("email") if session.get("user_type") == "athlete" else None
+    fields = ("athlete_name", "age", "gender", "sport", "location", "application_type",
+              "achievements", "motivation", "goals", "supporting_docs")
+
+    try:
+        async with pg.acquire() as conn, conn.transaction():
+            app_id = await conn.fetchval(q(queries.INSERT_APPLICATION), athlete_email, *(data.get(f) for f in fields))
+            if document_ids:
+                await conn.execute(q(queries.ATTACH_DOCUMENTS), app_id, document_ids)
+            sql, params = jobs.event("application.submitted", {"id": app_id})
+            await conn.execute(q(sql), *params)
+            for sql, params in live.submitted_deltas(app_id):
+                await conn.execute(q(sql), *params)
+        if document_ids:
+            session["uploads"] = [i for i in session["uploads"] if i not in document_ids]
+        return jsonify({"success": True, "message": "Application submitted successfully"})
+    except Exception as e:
+        logging.exception("Submit application error")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route("/documents", methods=["POST"])
+async def upload_document():
+    file = (await request.files).get("file")
+    if file is None or not file.filename:
+        return jsonify({"success": False, "message": "No file uploaded"}), 400
+
+    try:
+        # commit() fsyncs the blob; keep that off the event loop
+        sql, params = await asyncio.to_thread(documents.record, file, file.mimetype)
+        doc_id = await pg.fetchval(q(sql), *params)
+    except Exception as e:
+        logging.exception("Document upload error")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    session["uploads"] = [*session.get("uploads", []), doc_id][-documents.DOCUMENTS_PER_APPLICATION:]
+    sha256, size, filename, _ = params
+    return jsonify({"success": True, "document": {"id": doc_id, "filename": filename, "size": size, "sha256": sha256}})
+
+
+@app.route("/applications/<int:app_id>/documents")
+async def application_documents(app_id):
+    access = await pg.fetchrow(q(queries.APPLICATION_ACCESS), app_id)
+    if access is None or not documents.readable(await current_user(), is_admin(), tuple(access)):
+        abort(404)
+    rows = await pg.fetch(q(queries.APPLICATION_DOCUMENTS), app_id)
+    return jsonify({"documents": [dict(r) for r in rows]})
+
+
+@app.route("/documents/<int:doc_id>")
+async def download_document(doc_id):
+    row = await pg.fetchrow(q(queries.DOCUMENT), doc_id)
+    if row is None or not documents.readable(await current_user(), is_admin(), tuple(row)[4:], doc_id,
+                                             session.get("uploads")):
+        abort(404)
+    path = documents.blob_path(row["sha256"])
+    if not os.path.exists(path):
+        logging.error("Document %s: blob %s is missing", doc_id, row["sha256"])
+        abort(404)
+
+    response = await send_file(path, mimetype=row["content_type"], as_attachment=True,
+                               attachment_filename=row["filename"], conditional=True,
+                               cache_timeout=documents.DOCUMENT_MAX_AGE)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+@app.route("/dashboard")
+async def dashboard_page():
+    user = await current_user()
+    if user is None:
+        return await render_template("login.html")
+
+    email, user_type, display_name = user["email"], user["user_type"], user["display_name"]
+
+    profile, role_label, profile_pct = dashboard_summary(user_type, await load_profile(user_type, email))
+    avatar_url = session.get("avatar_url") or f"https://avatars.dicebear.com/api/identicon/{display_name}.svg?scale=85"
+
+    return await render_template(
+        "dashboard.html",
+        profile=profile,
+        user_type=user_type,
+        display_name=display_name,
+        avatar_url=avatar_url,
+        role_label=role_label,
+        profile_pct=profile_pct
+    )
+
+
+@app.route("/profile")
+async def profile_page():
+    user = await current_user()
+    if user is None:
+        return redirect(url_for("login_page"))
+
+    email, user_type, display_name = user["email"], user["user_type"], user["display_name"]
+    avatar_url = session.get("avatar_url") or f"https://avatars.dicebear.com/api/identicon/{display_name}.svg?scale=85"
+
+    user = await load_profile(user_type, email) or {}
+    applications = []
+    if user_type == "athlete":
+        rows = await pg.fetch(q(queries.ATHLETE_APPLICATIONS), email)
+        applications = list(map(queries.AthleteApplication._make, rows))
+
+    return await render_template(
+        "profile.html",
+        user=user,
+        user_role=user_type,
+        display_name=display_name,
+        avatar_url=avatar_url,
+        applications=applications
+    )
+
+
+@app.route("/feed")
+async def application_feed():
+    user = await current_user()
+    if user is None:
+        return jsonify({"success": False, "message": "Not authenticated"}), 401
+
+    user_type = user["user_type"]
+    if user_type not in ('coach', 'sponsor'):
+        return jsonify({"success": False, "message": "Only coaches or sponsors have a feed"}), 403
+
+    limit = min(max(request.args.get("limit", FEED_PAGE_SIZE, type=int), 1), FEED_PAGE_MAX)
+    try:
+        sql, params = queries.feed_page(user_type, request.args.get("cursor"), limit)
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid cursor"}), 400
+
+    rows = await pg.fetch(q(sql), *params)
+    applications = queries.rows_as_dicts(queries.FEED_COLUMNS, rows[:limit])
+    next_cursor = queries.feed_cursor(applications[-1]) if len(rows) > limit else None
+    return jsonify({"applications": applications, "next_cursor": next_cursor})
+
+
+@app.route("/recommendations")
+async def recommendations():
+    user = await current_user()
+    if user is None:
+        return jsonify({"success": False, "message": "Not authenticated"}), 401
+
+    grouped = {}
+    for row in await pg.fetch(q(queries.USER_RECOMMENDATIONS), user["user_type"], user["id"]):
+        row = dict(row)
+        grouped.setdefault(row.pop("target_role"), []).append(row)
+    return jsonify({"recommendations": grouped})
+
+
+# ----- profile update endpoints -----
+
+@app.route("/update_profile/<user_type>", methods=["POST"])
+async def update_profile(user_type):
+    user = await current_user()
+    if user is None or user["user_type"] != user_type:
+        return redirect(url_for("login_page"))
+
+    email = user["email"]
+    form = await request.form
+    columns = PROFILE_COLUMNS[user_type]
+
+    try:
+        if user_type == "athlete":
+            # athletes keep their old value for any field left blank
+            current = await pg.fetchrow(q(queries.select_profile("athlete")), email)
+            if not current:
+                return redirect(url_for("profile_page"))
+            values = [form.get(col) or current[col] for col in columns]
+        else:
+            values = [form.get(col) for col in columns]
+
+        await pg.execute(q(queries.update_profile(user_type)), *values, email)
+        forget_user(user_type, email)
+    except Exception:
+        logging.exception("Error updating %s profile", user_type)
+
+    return redirect(url_for("profile_page"))
+
+
+# ----- admin -----
+
+@app.route("/get_users")
+async def get_users():
+    user_type = request.args.get("type")
+    after_id = request.args.get("after", 0, type=int)
+    limit = min(max(request.args.get("limit", USERS_PAGE_SIZE, type=int), 1), USERS_PAGE_MAX)
+    search = (request.args.get("q") or "").strip().lower()
+
+    users = []
+    next_cursor = None
+
+    if user_type in ROLE_TABLES:
+        sql, params = queries.user_page(user_type, after_id, limit, search)
+        try:
+            rows = await pg.fetch(q(sql), *params)
+            users = [{"id": r[0], "name": r[1], "email": r[2]} for r in rows[:limit]]
+            if len(rows) > limit:
+                next_cursor = users[-1]["id"]
+        except Exception:
+            logging.exception("Error fetching users")
+
+    return jsonify({"users": users, "next_cursor": next_cursor})
+
+
+@app.route("/admin/incomplete_profiles")
+@admin_required
+async def incomplete_profiles():
+    user_type = request.args.get("type", "athlete")
+    if user_type not in ROLE_TABLES:
+        return jsonify({"success": False, "message": "Invalid user type"}), 400
+
+    below = min(max(request.args.get("below", 50, type=int), 0), 101)
+    limit = min(max(request.args.get("limit", INCOMPLETE_PAGE_SIZE, type=int), 1), INCOMPLETE_PAGE_MAX)
+    try:
+        sql, params = queries.incomplete_profiles(user_type, below, request.args.get("cursor"), limit)
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid cursor"}), 400
+
+    rows = await pg.fetch(q(sql), *params)
+    users = [dict(r) for r in rows[:limit]]
+    next_cursor = queries.incomplete_cursor(users[-1]) if len(rows) > limit else None
+    return jsonify({"users": users, "next_cursor": next_cursor})
+
+
+@app.route("/delete_user/<user_type>/<int:user_id>", methods=["DELETE"])
+async def delete_user(user_type, user_id):
+    if user_type not in ROLE_TABLES:
+        return jsonify({"success": False, "message": "Invalid user type"}), 400
+
+    try:
+        email = await pg.fetchval(q(queries.delete_user(user_type)), user_id)
+        if email:
+            forget_user(user_type, email)
+        return jsonify({"success": True})
+    except Exception as e:
+        logging.exception("Delete error")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route("/bulk_delete_users", methods=["POST"])
+@admin_required
+async def bulk_delete_users():
+    data = await request.get_json() or {}
+    user_type = data.get("type")
+    ids = bulk_ids(data)
+
+    if user_type not in ROLE_TABLES:
+        return jsonify({"success": False, "message": "Invalid user type"}), 400
+    if ids is None:
+        return jsonify({"success": False, "message": f"ids must be a list of 1-{BULK_MAX_IDS} integers"}), 400
+
+    try:
+        deleted = await pg.fetch(q(queries.bulk_delete_users(user_type)), ids)
+        for row in deleted:
+            forget_user(user_type, row["email"])
+
+        deleted_ids = {r["id"] for r in deleted}
+        results = {i: ("deleted" if i in deleted_ids else "not_found") for i in ids}
+        return jsonify({"success": True, "deleted": len(deleted_ids), "results": results})
+    except Exception as e:
+        logging.exception("Bulk delete error")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route('/get_pending_applications')
+async def get_pending_applications():
+    fmt = request.args.get("format", "json")
+    after_id = request.args.get("after_id", 0, type=int)
+    limit = request.args.get("limit", type=int)
+
+    version = await pg.fetchrow(q(queries.PENDING_VERSION))
+    etag = responses.etag(*version, fmt, after_id, limit)
+    if request.if_none_match.contains_weak(etag):
+        response = Response("", status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    sql, params = queries.pending_page(after_id, limit)
+
+    async def generate():
+        async with pg.acquire() as conn, conn.transaction():
+            rows = conn.cursor(q(sql), *params, prefetch=PENDING_BATCH_SIZE)
+
+            if fmt == "ndjson":
+                async for row in rows:
+                    yield app.json.dumps(dict(row)) + "\n"
+                return
+
+            yield "["
+            first = True
+            async for row in rows:
+                yield ("" if first else ",") + app.json.dumps(dict(row))
+                first = False
+            yield "]"
+
+    mimetype = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+    encoding = responses.negotiate(request.headers.get("Accept-Encoding"))
+    body = responses.compress_stream_async(generate(), encoding) if encoding else generate()
+    response = Response(body, mimetype=mimetype)
+    if encoding:
+        responses.mark_encoded(response, encoding)
+    responses.revalidate(response)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def event_stream(topics):
+    response = Response(live.stream_async(topics), mimetype="text/event-stream", headers=live.SSE_HEADERS)
+    # streams stay open indefinitely; don't apply RESPONSE_TIMEOUT
+    response.timeout = None
+    return response
+
+
+@app.route('/live/pending')
+async def live_pending():
+    return event_stream(("pending",))
+
+
+@app.route('/live/feed')
+async def live_feed():
+    user = await current_user()
+    if user is None:
+        return jsonify({"success": False, "message": "Not authenticated"}), 401
+
+    user_type = user["user_type"]
+    if user_type not in ('coach', 'sponsor'):
+        return jsonify({"success": False, "message": "Only coaches or sponsors have a feed"}), 403
+    return event_stream((f"feed:{user_type}",))
+
+
+async def review(ids, status):
+    sql, params = application_status.review_statement(ids, status)
+    async with pg.acquire() as conn, conn.transaction():
+        rows = await conn.fetch(q(sql), *params)
+        updated = [r["id"] for r in rows]
+        if updated:
+            event_sql, event_params = application_status.reviewed_event(updated, status)
+            await conn.execute(q(event_sql), *event_params)
+            for event_sql, event_params in live.reviewed_deltas(rows, status):
+                await conn.execute(q(event_sql), *event_params)
+        current = {}
+        missed = sorted(set(ids) - set(updated))
+        if missed:
+            current = {r["id"]: r["status"] for r in await conn.fetch(q(queries.CURRENT_STATUSES), missed)}
+    return application_status.review_results(ids, updated, current)
+
+
+@app.route('/update_application_status/<int:app_id>', methods=['POST'])
+async def update_application_status(app_id):
+    data = await request.get_json() or {}
+    status = data.get('status')
+
+    if status not in ('Forwarded', 'Denied'):
+        return jsonify({"success": False, "message": "Invalid status"}), 400
+    if status == 'Forwarded' and not data.get('type'):
+        return jsonify({"success": False, "message": "Missing application type for forwarding"}), 400
+
+    try:
+        result = (await review([app_id], status))[app_id]
+        if result == "not_found":
+            return jsonify({"success": False, "message": "Application not found"}), 404
+        if result != "updated":
+            return jsonify({"success": False, "message": f"Application is already {result}"}), 409
+        return jsonify({"success": True})
+    except Exception as e:
+        logging.exception("Error updating application status")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route('/bulk_update_application_status', methods=['POST'])
+@admin_required
+async def bulk_update_application_status():
+    data = await request.get_json() or {}
+    status = data.get('status')
+    ids = bulk_ids(data)
+
+    if status not in ('Forwarded', 'Denied'):
+        return jsonify({"success": False, "message": "Invalid status"}), 400
+    if ids is None:
+        return jsonify({"success": False, "message": f"ids must be a list of 1-{BULK_MAX_IDS} integers"}), 400
+
+    try:
+        results = await review(ids, status)
+        updated = sum(1 for r in results.values() if r == "updated")
+        return jsonify({"success": True, "updated": updated, "results": results})
+    except Exception as e:
+        logging.exception("Error bulk updating application status")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route('/respond_application/<int:app_id>', methods=['POST'])
+async def respond_application(app_id):
+    user = await current_user()
+    if user is None:
+        return jsonify({"success": False, "message": "Not authenticated"}), 401
+
+    user_type = user["user_type"]
+    if user_type not in ('coach', 'sponsor'):
+        return jsonify({"success": False, "message": "Only coaches or sponsors can respond"}), 403
+
+    data = await request.get_json() or {}
+    action = (data.get("action") or "").lower()
+
+    try:
+        sql, params = application_status.respond_statement(
+            app_id, user_type, user["email"], action, data.get("notes"))
+        async with pg.acquire() as conn, conn.transaction():
+            row = await conn.fetchrow(q(sql), *params)
+            if not row:
+                current = await conn.fetchrow(q(queries.APPLICATION_STATE), app_id)
+                raise application_status.respond_failure(current, user_type)
+            event_sql, event_params = application_status.responded_event(app_id, row["status"], user_type)
+            await conn.execute(q(event_sql), *event_params)
+            for event_sql, event_params in live.responded_deltas(app_id, user_type):
+                await conn.execute(q(event_sql), *event_params)
+
+        message = "Application approved" if action == 'approve' else "Application denied"
+        return jsonify({"success": True, "message": message})
+
+    except application_status.TransitionError as e:
+        return jsonify({"success": False, "message": e.message}), e.status_code
+
+    except Exception as e:
+        logging.exception("Error responding to application")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route("/search")
+async def search():
+    a = search_args(request.args)
+    if a is None:
+        return jsonify({"success": False, "message": "Invalid search type"}), 400
+
+    offset = (a["page"] - 1) * a["limit"]
+    page_sql, page_params = queries.search_page(a["kind"], a["text"], a["filters"], a["limit"], offset,
+                                                a["max_ranking"])
+    facet_sql, facet_params = queries.search_facets(a["kind"], a["text"], a["filters"], a["max_ranking"])
+
+    # the two queries are independent; run them on separate connections concurrently
+    rows, facet_rows = await asyncio.gather(
+        pg.fetch(q(page_sql), *page_params),
+        pg.fetch(q(facet_sql), *facet_params),
+    )
+
+    return jsonify({
+        "results": [dict(r) for r in rows[:a["limit"]]],
+        "facets": queries.facet_counts(a["kind"], [tuple(r) for r in facet_rows]),
+        "page": a["page"],
+        "has_more": len(rows) > a["limit"],
+    })
+
+
+def asyncpg_pool_stats():
+    return {
+        "size": pg.get_size(),
+        "idle": pg.get_idle_size(),
+        "min": pg.get_min_size(),
+        "max": pg.get_max_size(),
+        **connection_events,
+    }
+
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    if not (is_admin() or metrics_token_ok(request.headers.get("Authorization"))):
+        return jsonify(ADMIN_REQUIRED), 403
+    body = metrics.render(
+        metrics.stats_lines("db_pool", asyncpg_pool_stats(), counters=POOL_COUNTERS),
+        metrics.stats_lines("profile_cache", profile_cache.stats(), counters=CACHE_COUNTERS),
+        metrics.stats_lines("live", live.hub.stats(), counters=live.COUNTERS),
+    )
+    return Response(body, content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/admin/jobs')
+@admin_required
+async def job_stats():
+    counts = {r["status"]: {"count": r["count"], "oldest_run_at": r["oldest_run_at"]}
+              for r in await pg.fetch(q(queries.JOB_COUNTS))}
+    dead = [dict(r) for r in await pg.fetch(q(queries.DEAD_JOBS), DEAD_JOBS_SHOWN)]
+    return jsonify({"counts": counts, "dead": dead})
+
+
+@app.route('/admin/jobs/requeue', methods=['POST'])
+@admin_required
+async def requeue_jobs():
+    ids = bulk_ids(await request.get_json() or {})
+    if ids is None:
+        return jsonify({"success": False, "message": f"ids must be a list of 1-{BULK_MAX_IDS} integers"}), 400
+
+    requeued = [r["id"] for r in await pg.fetch(q(queries.REQUEUE_DEAD_JOBS), ids)]
+    return jsonify({"success": True, "requeued": requeued})
+
+
+@app.route('/admin/imports', methods=['POST'])
+@admin_required
+@body_limit(imports.IMPORT_MAX_BYTES)
+async def start_import():
+    args = import_args(request.args)
+    if args is None:
+        return jsonify({"success": False, "message": IMPORT_ARGS_MESSAGE}), 400
+    kind, fmt, on_conflict = args
+
+    with imports.Spool(fmt) as spool:
+        async for chunk in request.body:
+            spool.write(chunk)
+    if not spool.size:
+        os.unlink(spool.path)
+        return jsonify({"success": False, "message": "Empty import file"}), 400
+
+    try:
+        async with pg.acquire() as conn, conn.transaction():
+            import_id = await conn.fetchval(q(queries.INSERT_IMPORT), kind, fmt, on_conflict, spool.path)
+            sql, params = jobs.event("import.run", {"id": import_id})
+            await conn.execute(q(sql), *params)
+    except Exception as e:
+        logging.exception("Import error")
+        os.unlink(spool.path)
+        return jsonify({"success": False, "message": str(e)}), 500
+    return jsonify({"success": True, "import_id": import_id, "bytes": spool.size}), 202
+
+
+@app.route('/admin/imports/<int:import_id>')
+@admin_required
+async def import_status(import_id):
+    row = await pg.fetchrow(q(queries.IMPORT_STATUS), import_id)
+    if row is None:
+        return jsonify({"success": False, "message": "Import not found"}), 404
+    row = dict(row)
+    # asyncpg hands jsonb back as text
+    if row["report"] is not None:
+        row["report"] = json.loads(row["report"])
+    return jsonify(row)
+
+
+@app.route('/admin/stats')
+@admin_required
+async def admin_stats():
+    try:
+        since, until = analytics.stats_params(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    application_rows = await pg.fetch(q(queries.APPLICATION_STATS), since, until)
+    user_rows = await pg.fetch(q(queries.USER_STATS))
+    return jsonify(analytics.shape(application_rows, user_rows))
+
+
+@app.route('/admin/stats/reconcile', methods=['POST'])
+@admin_required
+async def reconcile_stats():
+    sql, params = jobs.event("analytics.reconcile", {"fix": True})
+    await pg.execute(q(sql), *params)
+    return jsonify({"success": True}), 202
+
+
+@app.route('/admin/export/<kind>')
+@admin_required
+async def export(kind):
+    fmt = request.args.get("format", "csv")
+    try:
+        body = exports.stream_async(pg, kind, fmt, **exports.filters(request.args))
+    except exports.ExportUnavailable as e:
+        return jsonify({"success": False, "message": str(e)}), 501
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    encoding = responses.negotiate(request.headers.get("Accept-Encoding")) if fmt in exports.COMPRESSIBLE else None
+    response = Response(responses.compress_stream_async(body, encoding) if encoding else body,
+                        mimetype=exports.MIMETYPES[fmt], headers=exports.headers(kind, fmt))
+    if encoding:
+        responses.mark_encoded(response, encoding)
+    # a multi-million-row export can outlast RESPONSE_TIMEOUT
+    response.timeout = None
+    return response
+
+
+@app.route('/admin/pool_stats')
+@admin_required
+async def pool_stats():
+    return jsonify(asyncpg_pool_stats())
+
+
+@app.route('/admin/cache_stats')
+@admin_required
+async def cache_stats():
+    return jsonify(profile_cache.stats())
@@ -0,0 +1,197 @@
+# assets.py - fingerprinted static assets: the build step and the lookups templates use
+#
+#   python assets.py        (rebuild static/dist/ and its manifest; run on every deploy)
+#
+# Every file in static/ is copied to static/dist/<name>.<hash>.<ext>. The URL
+# changes whenever the content does, so /assets/ responses are marked immutable
+# and cached for a year. Files that compress well also get pre-built .gz (and
+# .br with the optional brotli package) siblings, served as-is to clients that
+# accept them. Images get downscaled copies at ASSET_WIDTHS; this needs Pillow
+# and is skipped with a warning without it. Older fingerprinted files are left
+# in place, so pages rendered before a deploy keep working.
+#
+# Templates call asset_url("loginbg.jpg") or asset_url("p1.jpg", 240). Without a
+# manifest (a checkout that never ran the build) they fall back to /static/.
+import os
+import sys
+import json
+import hashlib
+import logging
+import mimetypes
+from urllib.parse import quote
+
+import responses
+
+try:
+    from PIL import Image
+except ImportError:          # optional: no resized variants
+    Image = None
+
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+# widths (px) of the downscaled image variants; only widths below the original are built
+ASSET_WIDTHS = tuple(int(w) for w in os.environ.get("ASSET_WIDTHS", "240,640,1280").split(",") if w.strip())
+IMAGE_TYPES = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+# already-compressed formats that gzip/brotli won't shrink
+PRECOMPRESSED = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".woff", ".woff2", ".gz", ".br", ".zip"}
+# keep a .gz/.br sibling only if it saves at least this fraction of the file
+MIN_SAVING = 0.1
+SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+log = logging.getLogger("sporture.assets")
+
+
+# ----- build -----
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def dist_name(name, digest, width=None):
+    stem, ext = os.path.splitext(name.replace(" ", "-"))
+    return f"{stem}.{digest}.{width}w{ext}" if width else f"{stem}.{digest}{ext}"
+
+
+def _write(name, data):
+    path = os.path.join(DIST_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+
+def _encoded(name, data):
+    """Write pre-compressed siblings of dist file `name`; returns the encodings written."""
+    if os.path.splitext(name)[1].lower() in PRECOMPRESSED:
+        return []
+    written = []
+    for encoding in responses.ENCODINGS:
+        packed = responses.compress(data, encoding, level=11 if encoding == "br" else 9)
+        if len(packed) <= len(data) * (1 - MIN_SAVING):
+            _write(name + SUFFIXES[encoding], packed)
+            written.append(encoding)
+    return written
+
+
+def _resized(path, name, digest):
+    """{width: dist name} of the downscaled variants of an image."""
+    fmt = IMAGE_TYPES.get(os.path.splitext(name)[1].lower())
+    if fmt is None or Image is None:
+        return {}
+    variants = {}
+    with Image.open(path) as img:
+        for width in sorted(ASSET_WIDTHS):
+            if width >= img.width:
+                break
+            out = dist_name(name, digest, width)
+            if not os.path.exists(os.path.join(DIST_DIR, out)):
+                small = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+                if fmt == "JPEG" and small.mode != "RGB":
+                    small = small.convert("RGB")
+                small.save(os.path.join(DIST_DIR, out), fmt, quality=82, optimize=True)
+            variants[str(width)] = out
+    return variants
+
+
+def build():
+    """Fingerprint everything under static/ into static/dist/ and write the manifest."""
+    if Image is None:
+        log.warning("Pillow is not installed; building without resized image variants")
+    os.makedirs(DIST_DIR, exist_ok=True)
+    manifest = {"assets": {}, "encodings": {}}
+
+    for root, dirs, files in os.walk(STATIC_DIR):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != DIST_DIR and not d.startswith("."))
+        for filename in sorted(files):
+            if filename.startswith("."):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, STATIC_DIR).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+
+            digest = fingerprint(data)
+            out = dist_name(name, digest)
+            _write(out, data)
+            entry = {"file": out}
+            encodings = _encoded(out, data)
+            if encodings:
+                manifest["encodings"][out] = encodings
+            widths = _resized(path, name, digest)
+            if widths:
+                entry["widths"] = widths
+            manifest["assets"][name] = entry
+            log.info("%s -> %s%s", name, out, f" ({len(widths)} sizes)" if widths else "")
+
+    with open(MANIFEST_PATH + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(MANIFEST_PATH + ".tmp", MANIFEST_PATH)
+    load_manifest()
+    return manifest
+
+
+# ----- lookups -----
+
+_manifest = {"assets": {}, "encodings": {}}
+_served = set()
+
+
+def load_manifest():
+    global _manifest, _served
+    try:
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {"assets": {}, "encodings": {}}
+    served = set()
+    for entry in manifest["assets"].values():
+        served.add(entry["file"])
+        served.update(entry.get("widths", {}).values())
+    _manifest, _served = manifest, served
+
+
+def asset_url(name, width=None):
+    """URL of static file `name`, optionally its smallest variant at least `width` px wide."""
+    entry = _manifest["assets"].get(name)
+    if entry is None:
+        return "/static/" + quote(name)
+    if width:
+        for w, file in sorted(entry.get("widths", {}).items(), key=lambda item: int(item[0])):
+            if int(w) >= width:
+                return "/assets/" + quote(file)
+    return "/assets/" + quote(entry["file"])
+
+
+def resolve(filename, accept_encoding):
+    """(file to send, mimetype, Content-Encoding or None) for /assets/<filename>; None if unknown."""
+    if filename not in _served:
+        return None
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    encoding = responses.negotiate(accept_encoding, _manifest["encodings"].get(filename, ()))
+    if encoding:
+        return filename + SUFFIXES[encoding], mimetype, encoding
+    return filename, mimetype, None
+
+
+def immutable(response, filename, encoding):
+    """Long-lived cache headers for /assets/<filename>, sent as `encoding`."""
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    if encoding:
+        responses.mark_encoded(response, encoding)
+    elif filename in _manifest["encodings"]:
+        response.vary.add("Accept-Encoding")
+    return response
+
+
+load_manifest()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+    result = build()
+    print(f"{len(result['assets'])} assets -> {os.path.relpath(DIST_DIR)}", file=sys.stderr)
@@ -0,0 +1,104 @@
+# cache.py - read-through cache for role profile data (and the backends sessions.py stores in)
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+# redis://host:port/db to share the cache between processes; unset = in-process LRU
+CACHE_URL = os.environ.get("CACHE_URL")
+CACHE_TTL = float(os.environ.get("CACHE_TTL", 300))
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 10000))
+
+
+class LRUCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.metrics["misses"] += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.metrics["expired"] += 1
+                self.metrics["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self.metrics["hits"] += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.metrics["evictions"] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+            stats["entries"] = len(self._data)
+        stats["backend"] = "memory"
+        return stats
+
+
+class RedisCache:
+    # works with redis.Redis or anything exposing get/set(ex=)/delete, e.g. fakeredis.FakeRedis
+    def __init__(self, client, ttl, prefix="sporture:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.metrics[name] += 1
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value, default=str), ex=int(self.ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+        stats["backend"] = "redis"
+        return stats
+
+
+def make_cache(url=CACHE_URL, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+    if url:
+        import redis
+        return RedisCache(redis.Redis.from_url(url), ttl)
+    return LRUCache(max_entries, ttl)
+
+
+profile_cache = make_cache()
+
+
+def profile_key(user_type, email):
+    return f"profile:{user_type}:{email}"
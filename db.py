@@ -0,0 +1,331 @@
+# db.py - pooled Postgres connections shared by every route
+#
+#   python db.py --bench 100000        (row-materialization benchmark, no database)
+#   python db.py --bench 20000 --db    (also time LOGIN_LOOKUP plain vs prepared)
+import os
+import sys
+import time
+import threading
+from functools import lru_cache
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+import queries
+from metrics import timed_query
+
+
+DB_CONFIG = {
+    "host": os.environ.get("DB_HOST", "localhost"),
+    "database": os.environ.get("DB_NAME", "sporture"),
+    "user": os.environ.get("DB_USER", "postgres"),
+    "password": os.environ.get("DB_PASSWORD", "12345"),
+    "port": int(os.environ.get("DB_PORT", 5432)),
+}
+
+POOL_MIN = int(os.environ.get("DB_POOL_MIN", 2))
+POOL_MAX = int(os.environ.get("DB_POOL_MAX", 20))
+# connections are closed and replaced after this many checkouts (0 = never)
+POOL_MAX_USES = int(os.environ.get("DB_POOL_MAX_USES", 1000))
+# seconds a request waits for a free connection before giving up
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 5))
+# idle connections older than this are pinged before being handed out
+POOL_PING_AFTER = float(os.environ.get("DB_POOL_PING_AFTER", 30))
+# server-side prepared statements for cursor.execute_prepared(); turn off behind
+# a transaction-pooling pgbouncer, where the next statement may land elsewhere
+DB_PREPARE = os.environ.get("DB_PREPARE", "1") == "1"
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class _TimedCursor:
+    # mixed in ahead of whatever cursor class a route asks for (RealDictCursor, ...)
+    def execute(self, query, vars=None):
+        with timed_query(query):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with timed_query(query):
+            return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        with timed_query(sql):
+            return super().copy_expert(sql, file, size)
+
+    def execute_prepared(self, query, vars=None):
+        """execute() through a server-side prepared statement, PREPAREd once per connection."""
+        if not DB_PREPARE:
+            return self.execute(query, vars)
+        stmt = queries.prepared(query)
+        prepared = self.connection.prepared
+        if stmt.name not in prepared:
+            with timed_query(query):
+                super().execute(stmt.prepare)
+            prepared.add(stmt.name)
+        with timed_query(query):
+            return super().execute(stmt.execute, vars)
+
+
+@lru_cache(maxsize=None)
+def _timed(cursor_class):
+    return type(f"Timed{cursor_class.__name__}", (_TimedCursor, cursor_class), {})
+
+
+class InstrumentedConnection(extensions.connection):
+    """psycopg2 connection whose cursors report every statement to metrics.timed_query()."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()    # names of statements PREPAREd on this session
+
+    def cursor(self, *args, cursor_factory=None, **kwargs):
+        base = cursor_factory or self.cursor_factory or extensions.cursor
+        return super().cursor(*args, cursor_factory=_timed(base), **kwargs)
+
+
+class ConnectionPool:
+    def __init__(self, minconn, maxconn, max_uses=0, timeout=5, ping_after=30, **dsn):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_uses = max_uses
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.dsn = dsn
+
+        self._idle = []          # [(conn, last_returned_at)]
+        self._uses = {}          # id(conn) -> checkout count
+        self._size = 0           # open connections, idle + in use
+        self._cond = threading.Condition()
+
+        self.metrics = {
+            "checkouts": 0,
+            "wait_time_total": 0.0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "opened": 0,
+            "closed": 0,
+            "recycled": 0,
+            "failed_health_checks": 0,
+        }
+
+    # -- internal helpers (callers hold self._cond unless noted) --
+
+    def _open(self):
+        # called without the lock held; the slot is reserved by the caller
+        conn = psycopg2.connect(connection_factory=InstrumentedConnection, **self.dsn)
+        with self._cond:
+            self._uses[id(conn)] = 0
+            self.metrics["opened"] += 1
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._uses.pop(id(conn), None)
+            self._size -= 1
+            self.metrics["closed"] += 1
+            self._cond.notify()
+
+    def _healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # -- public API --
+
+    def warm_up(self):
+        while True:
+            with self._cond:
+                if self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.maxconn:
+                    if not waited:
+                        waited = True
+                        self.metrics["exhausted"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.metrics["timeouts"] += 1
+                        raise PoolExhausted(
+                            f"No database connection available after {self.timeout}s"
+                        )
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                else:
+                    conn, idle_since = None, None
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._healthy(conn, idle_since):
+                with self._cond:
+                    self.metrics["failed_health_checks"] += 1
+                self._close(conn)
+                continue
+
+            with self._cond:
+                self._uses[id(conn)] = self._uses.get(id(conn), 0) + 1
+                self.metrics["checkouts"] += 1
+                self.metrics["wait_time_total"] += time.monotonic() - start
+            return conn
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                # a route bailed out without committing; never leak its transaction
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+
+        with self._cond:
+            worn_out = self.max_uses and self._uses.get(id(conn), 0) >= self.max_uses
+            if worn_out:
+                self.metrics["recycled"] += 1
+
+        if discard or conn.closed or worn_out:
+            self._close(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.metrics)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["min"] = self.minconn
+            stats["max"] = self.maxconn
+        checkouts = stats["checkouts"] or 1
+        stats["wait_time_avg"] = stats["wait_time_total"] / checkouts
+        return stats
+
+
+pool = ConnectionPool(
+    POOL_MIN,
+    POOL_MAX,
+    max_uses=POOL_MAX_USES,
+    timeout=POOL_TIMEOUT,
+    ping_after=POOL_PING_AFTER,
+    **DB_CONFIG
+)
+
+
+def get_db():
+    """Check a connection out of the shared pool: `with get_db() as conn: ...`"""
+    return pool.connection()
+
+
+def bench(rows, db=False):
+    """Per-row cost of RealDictCursor rows vs plain tuples + records, and of text vs prepared lookups."""
+    from datetime import datetime
+    from psycopg2.extras import RealDictRow
+
+    now = datetime.now()
+    data = [(i, f"Athlete {i}", "Coach", "football", "Chennai", "Forwarded", now,
+             "x" * 80, "y" * 120, "z" * 60, None, now) for i in range(rows)]
+    mapping = list(queries.FEED_COLUMNS)
+
+    def real_dict_rows():
+        # what RealDictCursor does per fetched row
+        out = []
+        for values in data:
+            row = RealDictRow()
+            dict.__setitem__(row, RealDictRow, mapping)
+            for i, value in enumerate(values):
+                row[i] = value
+            out.append(row)
+        return out
+
+    cases = [
+        ("RealDictRow", real_dict_rows),
+        ("rows_as_dicts", lambda: queries.rows_as_dicts(queries.FEED_COLUMNS, data)),
+        ("namedtuple records", lambda: list(map(queries.AthleteApplication._make, (r[:11] for r in data)))),
+    ]
+    for label, build in cases:
+        start = time.process_time()
+        built = build()
+        elapsed = time.process_time() - start
+        assert len(built) == rows
+        print(f"{label:<20} {rows} rows  {elapsed:.3f}s CPU  {elapsed / rows * 1e6:.2f}us/row")
+
+    if db:
+        with get_db() as conn, conn.cursor() as cur:
+            for label, run in (("plain execute", cur.execute), ("execute_prepared", cur.execute_prepared)):
+                start = time.perf_counter()
+                for i in range(rows):
+                    run(queries.LOGIN_LOOKUP, (f"bench-{i}@example.com",))
+                    cur.fetchone()
+                elapsed = time.perf_counter() - start
+                print(f"{label:<20} {rows} lookups  {elapsed:.3f}s  {elapsed / rows * 1e6:.1f}us/lookup")
+            conn.rollback()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] != ["--bench"] or len(args) > 3 or args[2:] not in ([], ["--db"]):
+        sys.exit("usage: python db.py --bench [ROWS] [--db]")
+    bench(int(args[1]) if len(args) > 1 and args[1] != "--db" else 100_000, db="--db" in args)
@@ -0,0 +1,185 @@
+# documents.py - supporting documents: content-addressed blob store for uploads (migrations/010)
+#
+#   python documents.py gc      (drop never-attached uploads and unreferenced blobs; run from cron)
+#
+# Both serving modes parse multipart uploads with stream_factory(), so each
+# file part is written straight into DOCUMENT_DIR/tmp and hashed as it
+# arrives; nothing is held in memory. commit() then renames the temp file to
+# blobs/<aa>/<bb>/<sha256>, or drops it when that blob already exists, so
+# identical files are stored once. Metadata (name, type, size, hash, owning
+# application) lives in the documents table, keeping applications rows and
+# the pending listing small. Downloads are served from the blob file with
+# Range support, to the requesters readable() allows.
+import os
+import sys
+import time
+import hashlib
+import logging
+import tempfile
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import queries
+
+
+DOCUMENT_DIR = os.environ.get("DOCUMENT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "documents"))
+DOCUMENT_MAX_BYTES = int(os.environ.get("DOCUMENT_MAX_BYTES", 25 * 1024 * 1024))
+DOCUMENTS_PER_APPLICATION = int(os.environ.get("DOCUMENTS_PER_APPLICATION", 10))
+# uploads never attached to an application are removed by gc after this long
+DOCUMENT_ORPHAN_HOURS = float(os.environ.get("DOCUMENT_ORPHAN_HOURS", 24))
+# browsers may reuse a download this long without asking; a blob never changes
+DOCUMENT_MAX_AGE = 3600
+
+TMP_DIR = os.path.join(DOCUMENT_DIR, "tmp")
+BLOB_DIR = os.path.join(DOCUMENT_DIR, "blobs")
+
+log = logging.getLogger("sporture.documents")
+
+
+def blob_path(sha256):
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+
+class BlobWriter:
+    """Temp file that hashes what is written to it; commit() moves it into the blob store."""
+
+    def __init__(self, max_bytes=DOCUMENT_MAX_BYTES):
+        os.makedirs(TMP_DIR, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=TMP_DIR)
+        self._file = os.fdopen(fd, "w+b")
+        self._hash = hashlib.sha256()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.sha256 = None
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f"documents are limited to {self.max_bytes} bytes")
+        self._hash.update(data)
+        return self._file.write(data)
+
+    # the multipart parsers rewind the stream when a part ends; reads are never needed
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def commit(self):
+        """Store the upload under its hash and return (sha256, size). Duplicates are stored once."""
+        if self.sha256 is not None:
+            return self.sha256, self.size
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        sha256 = self._hash.hexdigest()
+        target = blob_path(sha256)
+        if os.path.exists(target):
+            os.unlink(self.tmp_path)
+            # refresh mtime so gc doesn't treat a re-uploaded blob as stale
+            os.utime(target)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(self.tmp_path, target)
+        self.sha256 = sha256
+        return sha256, self.size
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if self.sha256 is None and os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+
+
+def stream_factory(total_content_length, content_type, filename=None, content_length=None):
+    """Multipart stream_factory for werkzeug's and Quart's form parsers."""
+    return BlobWriter()
+
+
+def record(file, content_type):
+    """(sql, params) that inserts the metadata row for an uploaded FileStorage backed by a BlobWriter."""
+    sha256, size = file.stream.commit()
+    name = os.path.basename((file.filename or "document").replace("\\", "/"))[:255] or "document"
+    return queries.INSERT_DOCUMENT, (sha256, size, name, content_type or "application/octet-stream")
+
+
+def attachable(requested, uploaded):
+    """Ids from a submission that this session uploaded itself, capped at DOCUMENTS_PER_APPLICATION."""
+    uploaded = set(uploaded or ())
+    ids = []
+    for value in requested or ():
+        try:
+            doc_id = int(value)
+        except (TypeError, ValueError):
+            continue
+        if doc_id in uploaded and doc_id not in ids:
+            ids.append(doc_id)
+    return ids[:DOCUMENTS_PER_APPLICATION]
+
+
+def readable(user, admin, access, doc_id=None, uploads=None):
+    """May this requester see a document, or an application's documents?
+
+    `access` is (application_id, athlete_id, application_type, forwarded) from
+    queries.DOCUMENT / APPLICATION_ACCESS. Admins see everything, the owning athlete
+    sees their own, and coaches/sponsors see applications forwarded to their role.
+    An upload not yet attached to an application is visible to the session that sent it.
+    """
+    if admin:
+        return True
+    application_id, athlete_id, application_type, forwarded = access
+    if application_id is None:
+        return doc_id is not None and doc_id in (uploads or ())
+    if user is None:
+        return False
+    if user["user_type"] == "athlete":
+        return athlete_id == user["id"]
+    return bool(forwarded) and queries.application_type_key(application_type) == user["user_type"]
+
+
+# ----- maintenance -----
+
+def gc(conn, orphan_hours=DOCUMENT_ORPHAN_HOURS):
+    """Delete stale unattached uploads, then blob files no document row points at."""
+    with conn.cursor() as cur:
+        cur.execute(queries.DELETE_ORPHAN_DOCUMENTS, (orphan_hours * 3600,))
+        orphans = cur.rowcount
+        conn.commit()
+
+    # blobs younger than the orphan window may belong to an upload whose row isn't committed yet
+    cutoff = time.time() - orphan_hours * 3600
+    removed = 0
+    with conn.cursor() as cur:
+        for root, _, files in os.walk(BLOB_DIR):
+            for sha256 in files:
+                path = os.path.join(root, sha256)
+                if os.path.getmtime(path) > cutoff:
+                    continue
+                cur.execute(queries.DOCUMENT_BLOB_USED, (sha256,))
+                if cur.fetchone() is None:
+                    os.unlink(path)
+                    removed += 1
+        conn.rollback()
+
+    for name in os.listdir(TMP_DIR) if os.path.isdir(TMP_DIR) else ():
+        path = os.path.join(TMP_DIR, name)
+        if os.path.getmtime(path) < cutoff:
+            os.unlink(path)
+
+    log.info("removed %d unattached documents and %d unreferenced blobs", orphans, removed)
+    return orphans, removed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+    if sys.argv[1:] == ["gc"]:
+        from db import get_db
+        with get_db() as conn:
+            gc(conn)
+    else:
+        sys.exit("usage: python documents.py gc")
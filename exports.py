@@ -0,0 +1,422 @@
+# exports.py - streaming export of athletes, coaches, sponsors and applications
+#
+#   python exports.py applications --format csv --status Pending --sport football --since 2024-01-01 -o apps.csv
+#   python exports.py --bench 5000000 [--format parquet]   (throughput and peak memory of the export path)
+#
+# Rows never pass through Python for CSV and NDJSON: Postgres renders them
+# (NDJSON with row_to_json) and COPY ... TO STDOUT hands over ready-made
+# chunks, which go straight into the response or the output file. Under
+# app.py the COPY runs on a helper thread feeding a small bounded Pipe, so a
+# slow client pauses the COPY instead of buffering the table; asgi.py does the
+# same with an asyncio.Queue and asyncpg's copy_from_query(). Parquet needs the
+# optional pyarrow package and is encoded from a server-side cursor one row
+# group (EXPORT_BATCH_SIZE rows) at a time.
+#
+# The admin endpoint is GET /admin/export/<kind>?format=csv&status=&sport=&since=&until=
+import os
+import sys
+import time
+import queue
+import asyncio
+import logging
+import resource
+import threading
+from datetime import date, datetime
+
+import application_status
+import queries
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:          # optional: no Parquet exports
+    pa = pq = None
+
+
+# rows per Parquet row group and per server-side cursor fetch
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 20000))
+# COPY output buffered between the database and a slow client: chunks of PIPE_CHUNK_BYTES
+EXPORT_QUEUE_CHUNKS = int(os.environ.get("EXPORT_QUEUE_CHUNKS", 16))
+PIPE_CHUNK_BYTES = 64 * 1024
+PARQUET_COMPRESSION = os.environ.get("PARQUET_COMPRESSION", "zstd")
+
+KINDS = tuple(queries.EXPORT_COLUMNS)
+FORMATS = ("csv", "ndjson", "parquet")
+STATUSES = tuple(application_status.TRANSITIONS)
+MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+# Parquet is already compressed; the others are worth gzipping on the way out
+COMPRESSIBLE = ("csv", "ndjson")
+
+# COPY options per format. NDJSON rows are single JSON values, emitted verbatim by using
+# quote and delimiter characters that JSON text never contains unescaped.
+COPY_OPTIONS = {
+    "csv": {"format": "csv", "header": True},
+    "ndjson": {"format": "csv", "quote": "\x01", "delimiter": "\x02"},
+}
+
+INTEGER_COLUMNS = {"id", "athlete_id", "age", "ranking", "experience_years", "profile_completeness"}
+TIMESTAMP_COLUMNS = {"created_at", "submission_date"}
+
+log = logging.getLogger("sporture.exports")
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+def filters(args):
+    """Validated export filters from a query string / argparse namespace dict; raises ValueError."""
+    status = args.get("status") or None
+    if status is not None and status not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+    result = {"status": status, "sport": (args.get("sport") or "").strip() or None}
+    for name in ("since", "until"):
+        value = args.get(name) or None
+        if value is not None and not isinstance(value, (date, datetime)):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"{name} must be an ISO 8601 date")
+        result[name] = value
+    return result
+
+
+def statement(kind, fmt, status=None, **rest):
+    """(sql, params) for one export; status only applies to applications."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if fmt == "parquet" and pa is None:
+        raise ExportUnavailable("Parquet export needs the pyarrow package")
+    sql, params = queries.export(kind, status if kind == "applications" else None, **rest)
+    return (queries.export_ndjson(sql) if fmt == "ndjson" else sql), params
+
+
+def headers(kind, fmt):
+    """Download headers for an export response; the data is personal, so nothing may cache it."""
+    return {"Content-Disposition": f'attachment; filename="{kind}-{date.today().isoformat()}.{fmt}"',
+            "Cache-Control": "no-store"}
+
+
+def copy_sql(query, fmt):
+    """COPY ... TO STDOUT for psycopg2; `query` has its parameters already bound."""
+    options = COPY_OPTIONS[fmt]
+    parts = [f"FORMAT {options['format']}"]
+    if options.get("header"):
+        parts.append("HEADER")
+    for name in ("quote", "delimiter"):
+        if name in options:
+            parts.append(f"{name.upper()} E'\\x{ord(options[name]):02x}'")
+    return f"COPY ({query}) TO STDOUT WITH ({', '.join(parts)})"
+
+
+# ----- Parquet -----
+
+def _schema(kind):
+    def field(column):
+        if column in INTEGER_COLUMNS:
+            return pa.field(column, pa.int64())
+        if column in TIMESTAMP_COLUMNS:
+            return pa.field(column, pa.timestamp("us"))
+        return pa.field(column, pa.string())
+    return pa.schema([field(c) for c in queries.EXPORT_COLUMNS[kind]])
+
+
+class _Sink:
+    """Write-only file for ParquetWriter; take() hands back what was written since the last call."""
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._size
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    """Turns batches of row tuples into Parquet bytes, one row group per batch."""
+
+    def __init__(self, kind):
+        self.schema = _schema(kind)
+        self._sink = _Sink()
+        self._writer = pq.ParquetWriter(self._sink, self.schema, compression=PARQUET_COMPRESSION)
+
+    def encode(self, rows):
+        columns = list(zip(*rows))
+        self._writer.write_batch(pa.record_batch(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)], schema=self.schema))
+        return self._sink.take()
+
+    def finish(self):
+        self._writer.close()
+        return self._sink.take()
+
+
+def parquet_chunks(conn, kind, sql, params):
+    """Parquet bytes for a psycopg2 connection, read through a server-side cursor."""
+    encoder = ParquetEncoder(kind)
+    with conn.cursor(name=f"export_{kind}") as cur:
+        cur.itersize = EXPORT_BATCH_SIZE
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield encoder.encode(rows)
+    yield encoder.finish()
+
+
+async def parquet_chunks_async(conn, kind, sql, params):
+    """Same for asyncpg; call inside a transaction. Encoding runs off the event loop."""
+    encoder = ParquetEncoder(kind)
+    cursor = await conn.cursor(sql, *params)
+    while True:
+        rows = await cursor.fetch(EXPORT_BATCH_SIZE)
+        if not rows:
+            break
+        yield await asyncio.to_thread(encoder.encode, [tuple(r) for r in rows])
+    yield encoder.finish()
+
+
+# ----- CSV / NDJSON through COPY -----
+
+class ExportCancelled(Exception):
+    pass
+
+
+class Pipe:
+    """Bounded file-like that a producer thread writes into and a generator drains."""
+
+    _DONE = object()
+
+    def __init__(self, maxsize=EXPORT_QUEUE_CHUNKS):
+        self._queue = queue.Queue(maxsize)
+        self._buffer = bytearray()
+        self.cancelled = False
+        self.error = None
+
+    def write(self, data):
+        # psycopg2 writes one row at a time; hand them over in PIPE_CHUNK_BYTES pieces
+        self._buffer += data
+        if len(self._buffer) >= PIPE_CHUNK_BYTES:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def _put(self, item):
+        # wait for the client, but notice if it went away
+        while True:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self.cancelled:
+                    raise ExportCancelled()
+
+    def run(self, produce):
+        """Call produce(self) on a helper thread and yield what it writes."""
+        def target():
+            try:
+                produce(self)
+            except ExportCancelled:
+                pass
+            except Exception as e:
+                self.error = e
+            finally:
+                try:
+                    if self._buffer:
+                        self._put(bytes(self._buffer))
+                    self._put(self._DONE)
+                except ExportCancelled:
+                    pass
+
+        thread = threading.Thread(target=target, name="export", daemon=True)
+        thread.start()
+        try:
+            while True:
+                chunk = self._queue.get()
+                if chunk is self._DONE:
+                    break
+                yield chunk
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.cancelled = True
+            thread.join()
+
+
+def copy_to(cur, kind, fmt, out, **filters):
+    """COPY one export straight into the file-like `out` (psycopg2)."""
+    sql, params = statement(kind, fmt, **filters)
+    cur.copy_expert(copy_sql(cur.mogrify(sql, params).decode(), fmt), out)
+
+
+def stream(get_db, kind, fmt, **filters):
+    """Response body for the WSGI app. Arguments are validated before the first chunk is produced."""
+    sql, params = statement(kind, fmt, **filters)
+
+    if fmt == "parquet":
+        def parquet():
+            with get_db() as conn:
+                yield from parquet_chunks(conn, kind, sql, params)
+                conn.rollback()
+        return parquet()
+
+    def produce(out):
+        with get_db() as conn:
+            try:
+                with conn.cursor() as cur:
+                    copy_to(cur, kind, fmt, out, **filters)
+            except ExportCancelled:
+                # the client left mid-COPY; the connection is unusable, so the pool drops it
+                conn.close()
+                raise
+            conn.rollback()
+    return Pipe().run(produce)
+
+
+def stream_async(pool, kind, fmt, **filters):
+    """Response body for the ASGI app; `pool` is the asyncpg pool."""
+    sql, params = statement(kind, fmt, **filters)
+    sql = queries.to_asyncpg(sql)
+
+    if fmt == "parquet":
+        async def parquet():
+            async with pool.acquire() as conn, conn.transaction():
+                async for chunk in parquet_chunks_async(conn, kind, sql, params):
+                    yield chunk
+        return parquet()
+
+    async def copy():
+        chunks = asyncio.Queue(EXPORT_QUEUE_CHUNKS)
+        error = None
+
+        async def output(chunk):
+            await chunks.put(bytes(chunk))
+
+        async def produce():
+            nonlocal error
+            try:
+                async with pool.acquire() as conn:
+                    await conn.copy_from_query(sql, *params, output=output, **COPY_OPTIONS[fmt])
+            except Exception as e:
+                error = e
+            await chunks.put(None)
+
+        task = asyncio.create_task(produce())
+        try:
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+            if error is not None:
+                raise error
+        finally:
+            task.cancel()
+    return copy()
+
+
+# ----- benchmark -----
+
+def _fake_copy(rows):
+    """Stands in for COPY: one write per CSV row of `rows` generated athletes, as psycopg2 delivers them."""
+    def produce(out):
+        out.write((",".join(queries.EXPORT_COLUMNS["athletes"]) + "\n").encode())
+        for i in range(rows):
+            out.write(f"{i},athlete{i}@example.com,Athlete {i},{14 + i % 30},Male,Football,,{i + 1},"
+                      f"{i % 15},+1 555 {i % 10_000:04d},City {i % 500},80,2024-01-01 00:00:00\n".encode())
+    return produce
+
+
+def _fake_rows(rows):
+    for i in range(0, rows, EXPORT_BATCH_SIZE):
+        yield [(n, f"athlete{n}@example.com", f"Athlete {n}", 14 + n % 30, "Male", "Football", None, n + 1,
+                n % 15, f"+1 555 {n % 10_000:04d}", f"City {n % 500}", 80, datetime(2024, 1, 1))
+               for n in range(i, min(i + EXPORT_BATCH_SIZE, rows))]
+
+
+def bench(rows, fmt="csv", db=False):
+    """Drain an export to nowhere. Without `db`, generated rows stand in for the athletes table."""
+    started = time.perf_counter()
+    size = 0
+    if db:
+        from db import get_db
+        for chunk in stream(get_db, "athletes", fmt, **filters({})):
+            size += len(chunk)
+    elif fmt == "parquet":
+        if pa is None:
+            sys.exit("Parquet export needs the pyarrow package")
+        encoder = ParquetEncoder("athletes")
+        for batch in _fake_rows(rows):
+            size += len(encoder.encode(batch))
+        size += len(encoder.finish())
+    else:
+        for chunk in Pipe().run(_fake_copy(rows)):
+            size += len(chunk)
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    source = "athletes table" if db else f"{rows} generated rows"
+    print(f"{fmt} export of {source}: {size / 1e6:.0f} MB in {elapsed:.1f}s "
+          f"({size / 1e6 / elapsed:.0f} MB/s), peak RSS {peak_mb:.0f} MB")
+
+
+def main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python exports.py")
+    parser.add_argument("kind", nargs="?", choices=KINDS)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--status", choices=STATUSES)
+    parser.add_argument("--sport")
+    parser.add_argument("--since", help="ISO date, inclusive")
+    parser.add_argument("--until", help="ISO date, exclusive")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    parser.add_argument("--bench", type=int, metavar="ROWS")
+    parser.add_argument("--db", action="store_true", help="with --bench: export the real athletes table")
+    args = parser.parse_args(argv)
+
+    if args.bench or args.db:
+        return bench(args.bench or 0, args.format, args.db)
+    if not args.kind:
+        parser.error("kind is required")
+    try:
+        selected = filters(vars(args))
+        statement(args.kind, args.format, **selected)
+    except (ValueError, ExportUnavailable) as e:
+        parser.error(str(e))
+
+    from db import get_db
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        with get_db() as conn:
+            if args.format == "parquet":
+                sql, params = statement(args.kind, args.format, **selected)
+                for chunk in parquet_chunks(conn, args.kind, sql, params):
+                    out.write(chunk)
+            else:
+                with conn.cursor() as cur:
+                    copy_to(cur, args.kind, args.format, out, **selected)
+            conn.rollback()
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+    main(sys.argv[1:])
@@ -0,0 +1,117 @@
+# hashing.py - password hashing on a bounded process pool, off the request thread
+import os
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+# werkzeug method string: "scrypt", "pbkdf2", or with parameters ("scrypt:N:r:p", "pbkdf2:sha256:iterations")
+HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+# hashes allowed in flight (running + queued) before new requests are turned away
+HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", HASH_WORKERS * 4))
+# seconds a request waits for a free slot before giving up
+HASH_QUEUE_WAIT = float(os.environ.get("PASSWORD_HASH_QUEUE_WAIT", 0.5))
+# bulk imports hash on a pool of their own in the job worker or CLI process, which usually shares
+# the machine with the web server; keep it well below the core count so sign-ins keep theirs
+IMPORT_HASH_WORKERS = int(os.environ.get("IMPORT_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 4)))
+# niceness of the import pool's processes, so the scheduler favours request hashing
+IMPORT_HASH_NICE = int(os.environ.get("IMPORT_HASH_NICE", 10))
+
+
+class HashingBusy(Exception):
+    pass
+
+
+# HASH_METHOD with werkzeug's defaults filled in, as it appears before the first "$" of a hash;
+# stored hashes whose method field differs were made with outdated parameters
+HASH_PARAMS = generate_password_hash("", HASH_METHOD).split("$", 1)[0]
+
+_executors = {}
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_MAX_PENDING)
+# hashes an import keeps queued on its pool; bounds memory for huge files
+_import_slots = threading.BoundedSemaphore(IMPORT_HASH_WORKERS * 4)
+
+
+def _get_executor(kind="requests"):
+    # created lazily so importing app.py (or the Flask reloader) doesn't fork workers
+    if kind not in _executors:
+        with _executor_lock:
+            if kind not in _executors:
+                if kind == "imports":
+                    _executors[kind] = ProcessPoolExecutor(max_workers=IMPORT_HASH_WORKERS, initializer=os.nice,
+                                                           initargs=(IMPORT_HASH_NICE,))
+                else:
+                    _executors[kind] = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+    return _executors[kind]
+
+
+def _run(fn, *args):
+    if not _slots.acquire(timeout=HASH_QUEUE_WAIT):
+        raise HashingBusy("Too many password operations in flight, try again shortly")
+    try:
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, HASH_METHOD)
+
+
+def hash_many(passwords, method=HASH_METHOD):
+    """Hash a batch for bulk imports on the import pool (IMPORT_HASH_WORKERS processes, niced).
+
+    Imports run in the job worker or the CLI, never in the web process, so they can't share its
+    request slots; the small, low-priority pool is what leaves CPU for sign-ins. Each hash waits
+    for one of the pool's own slots, so a huge file never queues more than a few hashes at once.
+    """
+    futures = []
+    try:
+        for password in passwords:
+            _import_slots.acquire()
+            try:
+                future = _get_executor("imports").submit(generate_password_hash, password, method)
+            except BaseException:
+                _import_slots.release()
+                raise
+            future.add_done_callback(lambda _: _import_slots.release())
+            futures.append(future)
+        return [f.result() for f in futures]
+    finally:
+        # a failed batch still frees the slots of hashes that are queued but not started
+        for f in futures:
+            f.cancel()
+
+
+def verify_password(stored_hash, password):
+    return _run(check_password_hash, stored_hash, password)
+
+
+def needs_rehash(stored_hash):
+    return stored_hash.split("$", 1)[0] != HASH_PARAMS
+
+
+if __name__ == "__main__":
+    # microbenchmark: hashes per second, single core and across the pool
+    rounds = int(os.environ.get("BENCH_ROUNDS", 50))
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        generate_password_hash("benchmark-password", HASH_METHOD)
+    single = rounds / (time.perf_counter() - start)
+
+    total = rounds * HASH_WORKERS
+    start = time.perf_counter()
+    futures = [_get_executor().submit(generate_password_hash, "benchmark-password", HASH_METHOD)
+               for _ in range(total)]
+    for f in futures:
+        f.result()
+    pooled = total / (time.perf_counter() - start)
+
+    print(f"method:        {HASH_METHOD}")
+    print(f"single core:   {single:.1f} hashes/s")
+    print(f"pool ({HASH_WORKERS} procs): {pooled:.1f} hashes/s ({pooled / HASH_WORKERS:.1f}/s per core)")
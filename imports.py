@@ -0,0 +1,577 @@
+# imports.py - bulk import of athletes, coaches, sponsors and applications (migrations/011)
+#
+#   python imports.py athletes people.csv [--format jsonl] [--on-conflict update]
+#   python imports.py --bench 1000000 [--load]   (pipeline throughput and memory; --load also COPYs, then rolls back)
+#   python imports.py --bench 2000 --passwords   (plaintext passwords, so the rows go through the hashing pool)
+#
+# The input (CSV with a header row, or JSON Lines) is read as a stream and
+# handled IMPORT_BATCH_SIZE rows at a time, so memory stays flat however big
+# the file is:
+#
+#   1. every field is validated and normalized; bad rows are reported by line
+#      number and skipped
+#   2. "password" columns are hashed on hashing.py's import pool
+#      ("password_hash" columns holding werkzeug hashes are taken as-is; rows
+#      with neither get an unusable password, so the account needs a reset)
+#   3. the batch is written to a temporary staging table with COPY
+#
+# Once the file is staged, one set-based merge keeps the first row per email,
+# reports repeated emails and emails already registered (in any role), and
+# inserts the rest. With on_conflict=update, existing accounts of the same
+# role are updated instead of reported; blank fields keep their stored value
+# and passwords are never changed, so a file can't take over an account.
+# Applications are matched to athletes by athlete_email and enter the
+# approval queue as Pending. It all happens in the caller's transaction.
+#
+# The admin endpoint (POST /admin/imports) only spools the upload to
+# IMPORT_DIR and enqueues an "import.run" job; the job worker does the rest.
+import io
+import os
+import re
+import csv
+import sys
+import json
+import time
+import logging
+import resource
+from datetime import datetime
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.security import generate_password_hash
+
+import queries
+import hashing
+
+
+IMPORT_DIR = os.environ.get("IMPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "imports"))
+IMPORT_MAX_BYTES = int(os.environ.get("IMPORT_MAX_BYTES", 1024 * 1024 * 1024))
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 5000))
+# rows are still processed after this, but only this many errors are kept for the report
+IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", 1000))
+# imported accounts are rehashed with HASH_METHOD at their first login (hashing.needs_rehash),
+# so a cheaper method here trades strength for import speed until then
+IMPORT_PASSWORD_HASH_METHOD = os.environ.get("IMPORT_PASSWORD_HASH_METHOD", hashing.HASH_METHOD)
+
+FORMATS = ("csv", "jsonl")
+ON_CONFLICT = ("skip", "update")
+# the password a row gets when the file supplies none; check_password_hash never accepts it
+UNUSABLE_PASSWORD = "!"
+
+log = logging.getLogger("sporture.imports")
+
+
+class RowError(ValueError):
+    pass
+
+
+# ----- fields -----
+
+EMAIL = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+PHONE = re.compile(r"\+?[0-9 ()./-]{5,30}")
+PASSWORD_HASH = re.compile(r"(scrypt|pbkdf2):[^$]+\$[^$]+\$[0-9a-f]+")
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def text(max_len, required=False):
+    def parse(value):
+        if _blank(value):
+            if required:
+                raise RowError("is required")
+            return None
+        value = str(value).strip()
+        if len(value) > max_len:
+            raise RowError(f"is longer than {max_len} characters")
+        return value
+    return parse
+
+
+def integer(lo, hi):
+    def parse(value):
+        if _blank(value):
+            return None
+        try:
+            number = int(str(value).strip())
+        except ValueError:
+            raise RowError("is not a whole number")
+        if not lo <= number <= hi:
+            raise RowError(f"must be between {lo} and {hi}")
+        return number
+    return parse
+
+
+def choice(*options, required=False):
+    by_key = {o.lower(): o for o in options}
+
+    def parse(value):
+        if _blank(value):
+            if required:
+                raise RowError("is required")
+            return None
+        try:
+            return by_key[str(value).strip().lower()]
+        except KeyError:
+            raise RowError(f"must be one of {', '.join(options)}")
+    return parse
+
+
+def email(value):
+    value = text(254, required=True)(value)
+    if not EMAIL.fullmatch(value):
+        raise RowError("is not an email address")
+    return value
+
+
+def phone(value):
+    value = text(30)(value)
+    if value is not None and not PHONE.fullmatch(value):
+        raise RowError("is not a phone number")
+    return value
+
+
+def timestamp(value):
+    if _blank(value):
+        return None
+    try:
+        return datetime.fromisoformat(str(value).strip().replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        raise RowError("is not an ISO 8601 date")
+
+
+def password(value):
+    if _blank(value):
+        return None
+    value = str(value)
+    if len(value) > 1024:
+        raise RowError("is longer than 1024 characters")
+    return value
+
+
+def password_hash(value):
+    if _blank(value):
+        return None
+    value = str(value).strip()
+    if not PASSWORD_HASH.fullmatch(value):
+        raise RowError("is not a werkzeug password hash")
+    return value
+
+
+# column -> (parser, staging type); the role columns mirror queries.PROFILE_COLUMNS
+ACCOUNT = {"email": (email, "TEXT"), "password": (password, "TEXT")}
+SCHEMAS = {
+    "athlete": {
+        **ACCOUNT,
+        "full_name": (text(200, required=True), "TEXT"),
+        "age": (integer(5, 100), "INTEGER"),
+        "gender": (choice("Male", "Female", "Other"), "TEXT"),
+        "sport": (text(100), "TEXT"),
+        "achievements": (text(5000), "TEXT"),
+        "ranking": (integer(1, 10_000_000), "INTEGER"),
+        "experience_years": (integer(0, 80), "INTEGER"),
+        "contact_number": (phone, "TEXT"),
+        "location": (text(200), "TEXT"),
+    },
+    "coach": {
+        **ACCOUNT,
+        "full_name": (text(200, required=True), "TEXT"),
+        "specialization": (text(200), "TEXT"),
+        "certifications": (text(2000), "TEXT"),
+        "experience_years": (integer(0, 80), "INTEGER"),
+        "contact_number": (phone, "TEXT"),
+        "location": (text(200), "TEXT"),
+    },
+    "sponsor": {
+        **ACCOUNT,
+        "name": (text(200, required=True), "TEXT"),
+        "contact_person": (text(200), "TEXT"),
+        "sport": (text(100), "TEXT"),
+        "contact_number": (phone, "TEXT"),
+        "location": (text(200), "TEXT"),
+    },
+    "application": {
+        "athlete_email": (email, "TEXT"),
+        "athlete_name": (text(200), "TEXT"),
+        "age": (integer(5, 100), "INTEGER"),
+        "gender": (choice("Male", "Female", "Other"), "TEXT"),
+        "sport": (text(100, required=True), "TEXT"),
+        "location": (text(200), "TEXT"),
+        "application_type": (choice("Coach", "Sponsor", required=True), "TEXT"),
+        "achievements": (text(5000), "TEXT"),
+        "motivation": (text(5000), "TEXT"),
+        "goals": (text(5000), "TEXT"),
+        # links only, like submit_application; files go through /documents
+        "supporting_docs": (text(2000), "TEXT"),
+        "submission_date": (timestamp, "TIMESTAMP"),
+    },
+}
+# URL / CLI name -> schema
+KINDS = {"athletes": "athlete", "coaches": "coach", "sponsors": "sponsor", "applications": "application"}
+
+
+# ----- reading and validating -----
+
+def read_rows(stream, fmt):
+    """Yield (line number, dict) from a binary stream; malformed lines come back as (line, RowError)."""
+    reader = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    if fmt == "csv":
+        rows = csv.DictReader(reader)
+        if rows.fieldnames is None:
+            return
+        for row in rows:
+            if None in row:
+                yield rows.line_num, RowError("row has more fields than the header")
+            else:
+                yield rows.line_num, row
+    elif fmt == "jsonl":
+        for line, raw in enumerate(reader, 1):
+            if not raw.strip():
+                continue
+            try:
+                row = json.loads(raw)
+            except ValueError as e:
+                yield line, RowError(f"row is not valid JSON ({e.msg})")
+                continue
+            yield line, row if isinstance(row, dict) else RowError("row is not a JSON object")
+    else:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+
+def normalize(schema, row):
+    """Validated values in schema order (password last, as the pre-hash plaintext or a given hash)."""
+    values = []
+    for column, (parse, _) in schema.items():
+        if column == "password":
+            continue
+        try:
+            values.append(parse(row.get(column)))
+        except RowError as e:
+            raise RowError(f"{column} {e}")
+    if "password" in schema:
+        try:
+            given_hash = password_hash(row.get("password_hash"))
+            values.append(("hash", given_hash) if given_hash else password(row.get("password")))
+        except RowError as e:
+            raise RowError(f"password {e}")
+    return values
+
+
+def hash_passwords(rows, method=IMPORT_PASSWORD_HASH_METHOD):
+    """Replace the trailing password of each row with its hash, hashing the plaintexts in parallel."""
+    todo = [i for i, (_, values) in enumerate(rows) if isinstance(values[-1], str)]
+    hashes = hashing.hash_many([rows[i][1][-1] for i in todo], method)
+    for i, hashed in zip(todo, hashes):
+        rows[i][1][-1] = hashed
+    for _, values in rows:
+        last = values[-1]
+        if last is None:
+            values[-1] = UNUSABLE_PASSWORD
+        elif isinstance(last, tuple):
+            values[-1] = last[1]
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if not isinstance(value, str):
+        return str(value)
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_buffer(rows):
+    """COPY text-format body for [(line, values)]."""
+    buf = io.StringIO()
+    for line, values in rows:
+        buf.write(str(line))
+        for value in values:
+            buf.write("\t")
+            buf.write(_copy_value(value))
+        buf.write("\n")
+    buf.seek(0)
+    return buf
+
+
+def staging_columns(schema):
+    """(name, type) in the order normalize() produces values."""
+    columns = [(c, t) for c, (_, t) in schema.items() if c != "password"]
+    if "password" in schema:
+        columns.append(("password", "TEXT"))
+    return columns
+
+
+class Report:
+    def __init__(self, kind, fmt, on_conflict):
+        self.data = {"kind": kind, "format": fmt, "on_conflict": on_conflict, "rows": 0, "valid": 0,
+                     "invalid": 0, "duplicates": 0, "conflicts": 0, "inserted": 0, "updated": 0,
+                     "unmatched": 0, "seconds": 0, "errors": []}
+
+    def error(self, line, message, **extra):
+        if len(self.data["errors"]) < IMPORT_MAX_ERRORS:
+            self.data["errors"].append({"line": line, "error": message, **extra})
+
+    def rows_error(self, rows, message, key):
+        """Record (line, value) rows from a report query."""
+        for line, value, *rest in rows:
+            self.error(line, message, **{key: value}, **({"role": rest[0]} if rest else {}))
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+
+def stage(cur, schema, stream, fmt, report, batch_size=IMPORT_BATCH_SIZE, hash_method=IMPORT_PASSWORD_HASH_METHOD):
+    """Validate, hash and COPY every row of `stream` into import_stage, one batch at a time."""
+    columns = staging_columns(schema)
+    cur.execute(queries.DROP_IMPORT_STAGE)
+    cur.execute(queries.import_stage(columns))
+    copy_sql = queries.import_copy(columns)
+
+    def flush(batch):
+        if "password" in schema:
+            hash_passwords(batch, hash_method)
+        cur.copy_expert(copy_sql, copy_buffer(batch))
+        report["valid"] += len(batch)
+
+    batch = []
+    for line, row in read_rows(stream, fmt):
+        report["rows"] += 1
+        try:
+            if isinstance(row, RowError):
+                raise row
+            batch.append((line, normalize(schema, row)))
+        except RowError as e:
+            report["invalid"] += 1
+            report.error(line, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+
+# ----- merging -----
+
+def merge_accounts(cur, user_type, on_conflict, report):
+    columns = [c for c, _ in staging_columns(SCHEMAS[user_type])]
+    cur.execute(queries.IMPORT_DEDUPLICATE)
+    report["duplicates"] = report["valid"] - cur.rowcount
+    cur.execute(queries.IMPORT_DUPLICATES, (IMPORT_MAX_ERRORS,))
+    report.rows_error(cur.fetchall(), "repeats an earlier row's email", "email")
+
+    cur.execute(queries.IMPORT_CONFLICT_COUNTS, (user_type,))
+    counts = dict(cur.fetchall())
+    same_role, other_role = counts.get(True, 0), counts.get(False, 0)
+    report["conflicts"] = other_role + (same_role if on_conflict == "skip" else 0)
+    if report["conflicts"]:
+        cur.execute(queries.IMPORT_CONFLICTS, (IMPORT_MAX_ERRORS,))
+        report.rows_error([r for r in cur.fetchall() if on_conflict == "skip" or r[2] != user_type],
+                          "email is already registered", "email")
+
+    if on_conflict == "update" and same_role:
+        cur.execute(queries.import_update(user_type, columns))
+        report["updated"] = cur.rowcount
+    cur.execute(queries.import_insert(user_type, columns))
+    report["inserted"] = cur.rowcount
+
+
+def merge_applications(cur, report):
+    cur.execute(queries.IMPORT_UNMATCHED_ATHLETES, (IMPORT_MAX_ERRORS,))
+    report.rows_error(cur.fetchall(), "athlete_email has no athlete account", "athlete_email")
+    cur.execute(queries.IMPORT_APPLICATIONS)
+    report["inserted"] = cur.rowcount
+    report["unmatched"] = report["valid"] - cur.rowcount
+
+
+def run(cur, kind, stream, fmt="csv", on_conflict="skip", hash_method=IMPORT_PASSWORD_HASH_METHOD):
+    """Import `stream` in the cursor's transaction and return the report; the caller commits."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if on_conflict not in ON_CONFLICT:
+        raise ValueError(f"on_conflict must be one of {', '.join(ON_CONFLICT)}")
+
+    started = time.perf_counter()
+    report = Report(kind, fmt, on_conflict)
+    user_type = KINDS[kind]
+    stage(cur, SCHEMAS[user_type], stream, fmt, report, hash_method=hash_method)
+    cur.execute(queries.ANALYZE_IMPORT_STAGE)
+    if user_type == "application":
+        merge_applications(cur, report)
+    else:
+        merge_accounts(cur, user_type, on_conflict, report)
+    # ON COMMIT DROP alone would leave them for the next job in the same worker transaction
+    cur.execute(queries.DROP_IMPORT_STAGE)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    log.info("imported %s: %d rows, %d inserted, %d updated, %d invalid, %d duplicates, %d conflicts",
+             kind, report["rows"], report["inserted"], report["updated"], report["invalid"],
+             report["duplicates"], report["conflicts"])
+    return report.data
+
+
+class Spool:
+    """File in IMPORT_DIR that an uploaded body is copied into, chunk by chunk."""
+
+    def __init__(self, fmt):
+        os.makedirs(IMPORT_DIR, exist_ok=True)
+        self.path = os.path.join(IMPORT_DIR, f"{time.strftime('%Y%m%d%H%M%S', time.gmtime())}-{os.urandom(6).hex()}.{fmt}")
+        self._file = open(self.path, "wb")
+        self.size = 0
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > IMPORT_MAX_BYTES:
+            raise RequestEntityTooLarge(f"imports are limited to {IMPORT_MAX_BYTES} bytes")
+        self._file.write(chunk)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self._file.close()
+        if exc_type is not None:
+            os.unlink(self.path)
+
+
+def run_job(cur, import_id):
+    """Job handler body: run a spooled import under a savepoint and record its outcome."""
+    cur.execute(queries.IMPORT, (import_id,))
+    row = cur.fetchone()
+    if row is None:
+        return
+    kind, fmt, on_conflict, path = row
+    cur.execute("SAVEPOINT import")
+    try:
+        with open(path, "rb") as f:
+            report = run(cur, kind, f, fmt, on_conflict)
+        cur.execute("RELEASE SAVEPOINT import")
+        status = "done"
+    except Exception as e:
+        # a bad file won't improve on retry: record the failure instead of raising
+        cur.execute("ROLLBACK TO SAVEPOINT import")
+        log.exception("import %s failed", import_id)
+        report, status = {"error": f"{type(e).__name__}: {e}"}, "failed"
+    cur.execute(queries.FINISH_IMPORT, (status, json.dumps(report, default=str), import_id))
+    if status == "done" and os.path.exists(path):
+        os.unlink(path)
+
+
+# ----- benchmark -----
+
+def _sample(n, passwords=False):
+    """CSV bytes for n athletes, one line in 200 invalid and one in 100 repeating an email.
+
+    Rows carry a ready-made password_hash, or with `passwords` a plaintext password to hash.
+    """
+    header = (f"email,{'password' if passwords else 'password_hash'},full_name,age,gender,sport,ranking,"
+              "experience_years,contact_number,location\n")
+    yield header.encode()
+    given = "benchmark-password" if passwords else generate_password_hash("benchmark-password", "pbkdf2:sha256:1000")
+    for i in range(n):
+        age = "abc" if i % 200 == 7 else 14 + i % 30
+        who = i - 1 if i % 100 == 99 else i
+        yield (f"athlete{who}@example.com,{given},Athlete {i},{age},{('Male', 'Female')[i % 2]},Football,"
+               f"{i + 1},{i % 15},+1 555 {i % 10_000:04d},City {i % 500}\n").encode()
+
+
+class _Chunks(io.RawIOBase):
+    """Binary stream over a generator, so the benchmark never holds the whole file."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._rest = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._rest:
+            try:
+                self._rest = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._rest))
+        b[:n], self._rest = self._rest[:n], self._rest[n:]
+        return n
+
+
+class _NullCursor:
+    """Stands in for the database in the pipeline-only benchmark: COPY buffers are built and discarded."""
+
+    def __init__(self):
+        self.copied = 0
+
+    def execute(self, sql, params=None):
+        pass
+
+    def copy_expert(self, sql, buf):
+        self.copied += len(buf.getvalue())
+
+
+def hash_rate(method=IMPORT_PASSWORD_HASH_METHOD, count=None):
+    """Hashes per second of hashing.hash_many on the import pool."""
+    count = count or hashing.IMPORT_HASH_WORKERS * 8
+    hashing.hash_many(["warm-up"] * hashing.IMPORT_HASH_WORKERS, method)
+    started = time.perf_counter()
+    hashing.hash_many(["benchmark-password"] * count, method)
+    return count / (time.perf_counter() - started)
+
+
+def bench(n, load=False, passwords=False):
+    stream = io.BufferedReader(_Chunks(_sample(n, passwords)), 1024 * 1024)
+    report = Report("athletes", "csv", "skip")
+    started = time.perf_counter()
+    if load:
+        from db import get_db
+        with get_db() as conn, conn.cursor() as cur:
+            result = run(cur, "athletes", stream)
+            conn.rollback()
+        report.data = result
+    else:
+        cur = _NullCursor()
+        stage(cur, SCHEMAS["athlete"], stream, "csv", report)
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{n} rows in {elapsed:.1f}s ({n / elapsed:.0f} rows/s), {report['valid']} valid, "
+          f"{report['invalid']} invalid, peak RSS {peak_mb:.0f} MB"
+          + ("" if load else f", {cur.copied / 1e6:.0f} MB of COPY data (database not touched)"))
+    if not passwords:
+        # the sample's rows carry hashes; plaintext rows add this on top
+        rate = hash_rate()
+        print(f"plaintext passwords: {rate:.1f} hashes/s with {IMPORT_PASSWORD_HASH_METHOD} on "
+              f"{hashing.IMPORT_HASH_WORKERS} import processes, so {n} rows would add {n / rate / 3600:.1f} h")
+
+
+def main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python imports.py")
+    parser.add_argument("kind", nargs="?", choices=KINDS)
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--on-conflict", choices=ON_CONFLICT, default="skip")
+    parser.add_argument("--bench", type=int, metavar="ROWS")
+    parser.add_argument("--load", action="store_true", help="with --bench: COPY and merge too, then roll back")
+    parser.add_argument("--passwords", action="store_true", help="with --bench: plaintext passwords, hashed on import")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        return bench(args.bench, args.load, args.passwords)
+    if not args.kind or not args.path:
+        parser.error("kind and path are required")
+    fmt = args.format or ("jsonl" if args.path.endswith((".jsonl", ".ndjson")) else "csv")
+
+    from db import get_db
+    with get_db() as conn, conn.cursor() as cur, open(args.path, "rb") as f:
+        report = run(cur, args.kind, f, fmt, args.on_conflict)
+        conn.commit()
+    json.dump(report, sys.stdout, indent=2, default=str)
+    print()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+    main(sys.argv[1:])
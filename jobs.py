@@ -0,0 +1,214 @@
+# jobs.py - Postgres-backed background jobs (migrations/009) and the worker that runs them
+#
+#   python jobs.py                     (worker, JOB_WORKERS threads)
+#   python jobs.py --bench 10000       (enqueue N no-op jobs and time how fast the worker drains them)
+#
+# Routes enqueue an event on the same cursor/connection as their write, so a
+# job exists exactly when the write committed. Workers claim batches with
+# SELECT ... FOR UPDATE SKIP LOCKED and hold the row locks while handlers run,
+# so a crashed worker's jobs become claimable again when its connection drops.
+# Long-running kinds (imports, rollup reconciles) are claimed one at a time and
+# each gets a transaction of its own, so they don't hold a batch's locks open.
+# Each job runs under its own savepoint: success deletes the row, failure
+# reschedules it with exponential backoff, and after JOB_MAX_ATTEMPTS tries the
+# row is dead-lettered (status 'dead') and listed at /admin/jobs.
+import os
+import sys
+import json
+import time
+import random
+import logging
+import threading
+
+import queries
+from db import get_db
+
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+JOB_BATCH_SIZE = int(os.environ.get("JOB_BATCH_SIZE", 20))
+# seconds an idle worker thread sleeps before polling again
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 5))
+# retry n waits about JOB_BACKOFF_BASE * 2^(n-1) seconds, capped at JOB_BACKOFF_MAX
+JOB_BACKOFF_BASE = float(os.environ.get("JOB_BACKOFF_BASE", 5))
+JOB_BACKOFF_MAX = float(os.environ.get("JOB_BACKOFF_MAX", 3600))
+
+log = logging.getLogger("sporture.jobs")
+
+
+# ----- enqueueing -----
+
+def event(kind, payload):
+    """(sql, params) that enqueues a job; run it in the transaction that made the change."""
+    return queries.ENQUEUE_JOB, (kind, json.dumps(payload, default=str))
+
+
+def enqueue(cur, kind, payload):
+    cur.execute(*event(kind, payload))
+
+
+# ----- handlers -----
+
+HANDLERS = {}
+# kinds claimed singly and committed on their own instead of inside a batch
+LONG_RUNNING = set()
+
+
+def handler(kind, long_running=False):
+    """Register fn(cur, payload) for a job kind. It runs inside the worker's transaction."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        if long_running:
+            LONG_RUNNING.add(kind)
+        return fn
+    return register
+
+
+@handler("noop")
+def noop(cur, payload):
+    pass
+
+
+@handler("application.submitted")
+def application_submitted(cur, payload):
+    log.info("application %s submitted", payload["id"])
+
+
+@handler("application.reviewed")
+def application_reviewed(cur, payload):
+    log.info("applications %s -> %s", payload["ids"], payload["status"])
+
+
+@handler("application.responded")
+def application_responded(cur, payload):
+    log.info("application %s %s by %s", payload["id"], payload["status"], payload["responder_type"])
+
+
+@handler("import.run", long_running=True)
+def import_run(cur, payload):
+    import imports
+    imports.run_job(cur, payload["id"])
+
+
+@handler("analytics.reconcile", long_running=True)
+def analytics_reconcile(cur, payload):
+    import analytics
+    report = analytics.reconcile(cur, fix=payload.get("fix", True))
+    log.info("rollup reconcile: %s", {name: part["drifted"] for name, part in report.items()})
+
+
+# ----- worker -----
+
+def backoff(attempts):
+    delay = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+    # jitter so jobs that failed together don't all retry together
+    return delay * random.uniform(0.5, 1.0)
+
+
+def run_job(cur, job_id, kind, payload, attempts):
+    """Run one claimed job under a savepoint. Returns "done", "retry" or "dead"."""
+    cur.execute("SAVEPOINT job")
+    try:
+        HANDLERS[kind](cur, payload)
+        cur.execute(queries.COMPLETE_JOB, (job_id,))
+        cur.execute("RELEASE SAVEPOINT job")
+        return "done"
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT job")
+        error = f"{type(e).__name__}: {e}"
+        if attempts + 1 >= JOB_MAX_ATTEMPTS:
+            log.error("job %s (%s) dead after %d attempts: %s", job_id, kind, attempts + 1, error)
+            cur.execute(queries.BURY_JOB, (error, job_id))
+            return "dead"
+        log.warning("job %s (%s) failed, retrying: %s", job_id, kind, error)
+        cur.execute(queries.RETRY_JOB, (backoff(attempts + 1), error, job_id))
+        return "retry"
+
+
+class Worker:
+    def __init__(self, threads=JOB_WORKERS, batch_size=JOB_BATCH_SIZE, poll_interval=JOB_POLL_INTERVAL):
+        self.threads = threads
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stop = threading.Event()
+        self._lock = threading.Lock()
+        self.metrics = {"done": 0, "retry": 0, "dead": 0, "batches": 0}
+
+    def run_batch(self):
+        outcomes = []
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(queries.CLAIM_JOBS, (sorted(LONG_RUNNING), self.batch_size))
+            for job_id, kind, payload, attempts in cur.fetchall():
+                outcomes.append(run_job(cur, job_id, kind, payload, attempts))
+            conn.commit()
+
+        with self._lock:
+            self.metrics["batches"] += 1
+            for outcome in outcomes:
+                self.metrics[outcome] += 1
+        return len(outcomes)
+
+    def run_long(self):
+        """Claim and run one long-running job in a transaction of its own. Returns 1 if one ran."""
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute(queries.CLAIM_LONG_JOB, (sorted(LONG_RUNNING),))
+            row = cur.fetchone()
+            if row is None:
+                conn.rollback()
+                return 0
+            outcome = run_job(cur, *row)
+            conn.commit()
+
+        with self._lock:
+            self.metrics[outcome] += 1
+        return 1
+
+    def loop(self):
+        while not self.stop.is_set():
+            try:
+                claimed = self.run_batch()
+                long_ran = self.run_long()
+            except Exception:
+                log.exception("job batch failed")
+                claimed = long_ran = 0
+            if claimed < self.batch_size and not long_ran:
+                self.stop.wait(self.poll_interval)
+
+    def start(self):
+        threads = [threading.Thread(target=self.loop, name=f"jobs-{i}", daemon=True) for i in range(self.threads)]
+        for t in threads:
+            t.start()
+        return threads
+
+    def stats(self):
+        with self._lock:
+            return dict(self.metrics)
+
+
+def bench(n, threads=JOB_WORKERS):
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute(queries.ENQUEUE_NOOP_JOBS, (n,))
+        conn.commit()
+
+    worker = Worker(threads, poll_interval=0.05)
+    started = time.perf_counter()
+    running = worker.start()
+    while worker.stats()["done"] < n and all(t.is_alive() for t in running):
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    worker.stop.set()
+
+    done = worker.stats()["done"]
+    print(f"{done} jobs, {threads} threads, batch {worker.batch_size}: {elapsed:.2f}s"
+          f" ({done / elapsed:.0f} jobs/s, {done / elapsed / threads:.0f} jobs/s per thread)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+    if len(sys.argv) == 3 and sys.argv[1] == "--bench":
+        bench(int(sys.argv[2]))
+    else:
+        worker = Worker()
+        log.info("job worker: %d threads, batch %d", worker.threads, worker.batch_size)
+        for t in worker.start():
+            t.join()
@@ -0,0 +1,365 @@
+# live.py - push updates for the admin approval queue and coach/sponsor feeds
+#
+#   python live.py --bench 5000        (fan 100 events, 10ms apart, out to N subscribers; no database)
+#   python loadtest.py check live      (the same fan-out as a pass/fail check)
+#
+# Writes that change what those pages show run a pg_notify() in their own
+# transaction (see the *_deltas helpers), so a delta is delivered exactly when
+# the change commits. Each process holds ONE listening connection and hands
+# every notification to the Hub, which fans it out to the Server-Sent Events
+# streams at /live/pending and /live/feed:
+#
+#   topic "pending"       {"event": "added"|"removed", "ids": [...]}
+#   topic "feed:coach"    {"event": "added"|"removed", "ids": [...]}   (and feed:sponsor)
+#
+# Deltas only carry ids; pages fetch the rows they don't have yet. A subscriber
+# that falls LIVE_QUEUE_SIZE events behind is disconnected, and the browser's
+# EventSource reconnects and reloads the list.
+import os
+import sys
+import json
+import time
+import queue
+import select
+import asyncio
+import logging
+import threading
+
+import queries
+
+
+CHANNEL = "sporture_live"
+# events buffered per subscriber before it is considered too slow and dropped
+LIVE_QUEUE_SIZE = int(os.environ.get("LIVE_QUEUE_SIZE", 256))
+# seconds between keep-alive comments, sent on a fixed cadence however busy the stream is;
+# they also reveal disconnected clients
+LIVE_HEARTBEAT = float(os.environ.get("LIVE_HEARTBEAT", 15))
+# NOTIFY payloads are capped at 8000 bytes; split id lists well below that
+IDS_PER_DELTA = 500
+
+HEARTBEAT = b": ping\n\n"
+# EventSource waits this long (ms) before reconnecting
+RETRY = b"retry: 3000\n\n"
+
+log = logging.getLogger("sporture.live")
+
+
+# ----- deltas -----
+
+def delta(topic, event, ids):
+    """(sql, params) statements that publish `event` for `ids` on `topic`; run them in the write's transaction."""
+    return [
+        (queries.NOTIFY, (CHANNEL, json.dumps({"topic": topic, "event": event, "ids": ids[i:i + IDS_PER_DELTA]},
+                                              separators=(",", ":"))))
+        for i in range(0, len(ids), IDS_PER_DELTA)
+    ]
+
+
+def submitted_deltas(app_id):
+    return delta("pending", "added", [app_id])
+
+
+def reviewed_deltas(rows, new_status):
+    """rows: (id, application_type) of the applications that left Pending."""
+    statements = delta("pending", "removed", [r[0] for r in rows])
+    if new_status == "Forwarded":
+        by_type = {}
+        for app_id, application_type in rows:
+            by_type.setdefault(queries.application_type_key(application_type), []).append(app_id)
+        for application_type, ids in by_type.items():
+            statements += delta(f"feed:{application_type}", "added", ids)
+    return statements
+
+
+def responded_deltas(app_id, responder_type):
+    return delta(f"feed:{responder_type}", "removed", [app_id])
+
+
+def frame(payload):
+    """Server-Sent Events frame for a notification payload (topic is dropped: the stream implies it)."""
+    data = json.loads(payload)
+    topic, event = data.pop("topic"), data["event"]
+    return topic, f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+# ----- fan-out -----
+
+class Closed(Exception):
+    pass
+
+
+class Subscription:
+    """One stream's queue of encoded frames. Thread-safe; AsyncSubscription is the asyncio flavour."""
+
+    def __init__(self, hub, topics, maxsize=LIVE_QUEUE_SIZE):
+        self.hub = hub
+        self.topics = topics
+        self.queue = self.make_queue(maxsize)
+        self.closed = False
+
+    def make_queue(self, maxsize):
+        return queue.Queue(maxsize)
+
+    def put(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except (queue.Full, asyncio.QueueFull):
+            # too slow: drop it rather than buffer without bound
+            self.closed = True
+            self.hub.unsubscribe(self)
+            self._wake()
+
+    def _wake(self):
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.queue.put_nowait(None)
+
+    def get(self):
+        """Next frame to send; raises Closed once the hub has dropped this subscriber."""
+        data = self.queue.get()
+        if data is None or self.closed:
+            raise Closed()
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.hub.unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    # put() runs on the event loop (asyncpg listener callbacks do), so asyncio.Queue is safe here
+    def make_queue(self, maxsize):
+        return asyncio.Queue(maxsize)
+
+    def _wake(self):
+        try:
+            self.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        self.queue.put_nowait(None)
+
+    async def get(self):
+        data = await self.queue.get()
+        if data is None or self.closed:
+            raise Closed()
+        return data
+
+
+class Hub:
+    def __init__(self):
+        self._topics = {}          # topic -> set of subscriptions
+        self._lock = threading.Lock()
+        self.metrics = {"subscribers": 0, "events": 0, "delivered": 0, "dropped": 0}
+
+    def subscribe(self, topics, cls=Subscription):
+        sub = cls(self, topics)
+        with self._lock:
+            for topic in topics:
+                self._topics.setdefault(topic, set()).add(sub)
+            self.metrics["subscribers"] += 1
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            removed = False
+            for topic in sub.topics:
+                subs = self._topics.get(topic)
+                if subs and sub in subs:
+                    subs.discard(sub)
+                    removed = True
+                    if not subs:
+                        del self._topics[topic]
+            if removed:
+                self.metrics["subscribers"] -= 1
+                if sub.closed:
+                    self.metrics["dropped"] += 1
+
+    def publish(self, payload):
+        """Fan a raw notification payload out to the topic's subscribers; encoded once for all of them."""
+        try:
+            topic, data = frame(payload)
+        except (ValueError, KeyError):
+            log.warning("ignoring malformed live payload: %r", payload[:200])
+            return
+        with self._lock:
+            subs = list(self._topics.get(topic, ()))
+            self.metrics["events"] += 1
+            self.metrics["delivered"] += len(subs)
+        for sub in subs:
+            sub.put(data)
+
+    def heartbeat(self):
+        """Send a keep-alive comment to every subscriber; listeners call this every LIVE_HEARTBEAT seconds."""
+        with self._lock:
+            subs = {sub for subs in self._topics.values() for sub in subs}
+        for sub in subs:
+            sub.put(HEARTBEAT)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.metrics)
+
+
+hub = Hub()
+
+
+# ----- listeners (one connection per process) -----
+
+class Listener(threading.Thread):
+    """psycopg2 LISTEN loop for the WSGI app; reconnects with backoff when the connection drops."""
+
+    def __init__(self, hub, dsn):
+        super().__init__(name="live-listener", daemon=True)
+        self.hub = hub
+        self.dsn = dsn
+
+    def run(self):
+        import psycopg2
+        from psycopg2 import extensions
+
+        delay = 1
+        while True:
+            try:
+                conn = psycopg2.connect(**self.dsn)
+                conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                delay = 1
+                next_beat = time.monotonic() + LIVE_HEARTBEAT
+                while True:
+                    # wait no longer than the next heartbeat, so steady traffic can't postpone it
+                    if select.select([conn], [], [], max(next_beat - time.monotonic(), 0)) != ([], [], []):
+                        conn.poll()
+                        while conn.notifies:
+                            self.hub.publish(conn.notifies.pop(0).payload)
+                    if time.monotonic() >= next_beat:
+                        self.hub.heartbeat()
+                        next_beat = time.monotonic() + LIVE_HEARTBEAT
+            except Exception:
+                log.exception("live listener lost its connection; reconnecting in %ss", delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def ensure_listener(dsn):
+    """Start this process's listener thread on first use."""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = Listener(hub, dsn)
+            _listener.start()
+
+
+async def listen_async(hub, connect):
+    """asyncpg LISTEN loop for the ASGI app; `connect` returns a new connection. Runs until cancelled."""
+    delay = 1
+    while True:
+        try:
+            conn = await connect()
+            lost = asyncio.Event()
+            conn.add_termination_listener(lambda c: lost.set())
+            await conn.add_listener(CHANNEL, lambda c, pid, channel, payload: hub.publish(payload))
+            delay = 1
+            try:
+                # notifications arrive through the listener callback, so this loop only
+                # wakes for heartbeats (or a lost connection) and keeps a fixed cadence
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), LIVE_HEARTBEAT)
+                    except asyncio.TimeoutError:
+                        hub.heartbeat()
+            finally:
+                if not conn.is_closed():
+                    await conn.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("live listener lost its connection; reconnecting in %ss", delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 30)
+
+
+def stream(topics):
+    """SSE body for the WSGI app: one subscription for as long as the client stays connected."""
+    with hub.subscribe(topics) as sub:
+        yield RETRY
+        try:
+            while True:
+                yield sub.get()
+        except Closed:
+            return
+
+
+async def stream_async(topics):
+    """SSE body for the ASGI app."""
+    with hub.subscribe(topics, AsyncSubscription) as sub:
+        yield RETRY
+        try:
+            while True:
+                yield await sub.get()
+        except Closed:
+            return
+
+
+# keep proxies from buffering the stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+COUNTERS = ("events", "delivered", "dropped")
+
+
+# ----- benchmark -----
+
+async def fanout(n, events, interval):
+    """Publish `events` deltas to n in-process subscribers, `interval` seconds apart.
+
+    Returns (deliveries, seconds, sorted last-subscriber latencies, hub stats).
+    """
+    hub = Hub()
+    subs = [hub.subscribe(("pending",), AsyncSubscription) for _ in range(n)]
+    received = [0] * n
+    latencies = []
+    sent_at = {}
+
+    async def consume(i, sub):
+        try:
+            while received[i] < events:
+                data = await sub.get()
+                received[i] += 1
+                if i == n - 1:
+                    latencies.append(time.perf_counter() - sent_at[json.loads(data.split(b"data: ", 1)[1])["ids"][0]])
+        except Closed:
+            pass
+
+    consumers = [asyncio.create_task(consume(i, s)) for i, s in enumerate(subs)]
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    for event_id in range(events):
+        sent_at[event_id] = time.perf_counter()
+        hub.publish(json.dumps({"topic": "pending", "event": "added", "ids": [event_id]}))
+        await asyncio.sleep(interval)
+    await asyncio.gather(*consumers)
+    elapsed = time.perf_counter() - started
+    return sum(received), elapsed, sorted(latencies), hub.stats()
+
+
+def bench(n, events=100, interval=0.01):
+    delivered, elapsed, latencies, stats = asyncio.run(fanout(n, events, interval))
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0
+    print(f"{n} subscribers x {events} events: {delivered} deliveries in {elapsed:.2f}s"
+          f" ({delivered / elapsed:.0f}/s), last-subscriber p99 latency {p99 * 1000:.1f} ms,"
+          f" {stats['dropped']} dropped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+    if len(sys.argv) in (3, 4) and sys.argv[1] == "--bench":
+        bench(*map(int, sys.argv[2:]))
+    else:
+        sys.exit("usage: python live.py --bench SUBSCRIBERS [EVENTS]")
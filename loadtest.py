@@ -0,0 +1,1037 @@
+# loadtest.py - seed a local Postgres and replay a realistic route mix against a running server
+#
+#   python loadtest.py seed --athletes 20000 --coaches 1000 --sponsors 500 --applications 100000
+#   python loadtest.py run --url http://127.0.0.1:5000 --duration 60 --concurrency 32
+#   python loadtest.py compare loadtest-results/<before>.json loadtest-results/<after>.json
+#   python loadtest.py check pool --concurrency 64 --iterations 200
+#   python loadtest.py check stream --rows 500000 --max-mb 64
+#   python loadtest.py check feed-index
+#   python loadtest.py check respond-race --concurrency 32
+#   python loadtest.py check search --iterations 500
+#   python loadtest.py check live --subscribers 5000 --iterations 100
+#   python loadtest.py check bulk --rows 5000
+#   python loadtest.py check login-lookup --rows 1000000 --concurrency 16
+#   python loadtest.py check serving --concurrency 1000   (app.py at --wsgi-url vs asgi.py at --asgi-url)
+#
+# `seed` writes rows whose emails end in @loadtest.invalid (`--reset` removes
+# them first), all sharing the password "loadtest". `run` drives the WSGI or
+# ASGI app over keep-alive HTTP connections, one persona (athlete, coach,
+# sponsor, admin) per worker, and writes per-route throughput and
+# p50/p95/p99 latency as JSON. `compare` diffs two result files and exits
+# non-zero if a route regressed beyond --threshold. `check` runs one targeted
+# verification in-process against the database and exits non-zero on failure.
+import io
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from db import get_db
+
+
+PASSWORD = "loadtest"
+EMAIL_DOMAIN = "loadtest.invalid"
+RESULTS_DIR = "loadtest-results"
+
+SPORTS = ("Athletics", "Football", "Cricket", "Hockey", "Badminton", "Tennis", "Swimming", "Boxing",
+          "Wrestling", "Kabaddi", "Basketball", "Volleyball")
+LOCATIONS = ("Mumbai", "Delhi", "Pune", "Bengaluru", "Chennai", "Kolkata", "Hyderabad", "Jaipur",
+             "Lucknow", "Kochi", "Chandigarh", "Bhopal")
+GENDERS = ("Male", "Female")
+
+# share of workers per persona, and each persona's route weights
+PERSONAS = {"athlete": 0.55, "coach": 0.15, "sponsor": 0.10, "admin": 0.20}
+MIX = {
+    "athlete": {"login": 5, "dashboard": 40, "profile": 40, "submit_application": 15},
+    "coach": {"login": 5, "dashboard": 30, "profile": 40, "respond_application": 25},
+    "sponsor": {"login": 5, "dashboard": 30, "profile": 40, "respond_application": 25},
+    "admin": {"get_users": 70, "get_pending_applications": 30},
+}
+
+
+def email(role, i):
+    return f"lt-{role}-{i}@{EMAIL_DOMAIN}"
+
+
+# ----- seeding -----
+
+def _copy(cur, table, columns, rows):
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join("\\N" if v is None else str(v) for v in row) + "\n")
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
+
+def reset(cur):
+    like = f"%@{EMAIL_DOMAIN}"
+    cur.execute("DELETE FROM applications WHERE athlete_id IN (SELECT id FROM athletes WHERE email LIKE %s)",
+                (like,))
+    for table in ("athletes", "coaches", "sponsors"):
+        cur.execute(f"DELETE FROM {table} WHERE email LIKE %s", (like,))
+
+
+def seed(athletes, coaches, sponsors, applications, rng_seed=0, do_reset=False):
+    from hashing import hash_password
+
+    rng = random.Random(rng_seed)
+    password = hash_password(PASSWORD)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+
+    with get_db() as conn, conn.cursor() as cur:
+        if do_reset:
+            reset(cur)
+
+        _copy(cur, "athletes",
+              ("email", "password", "full_name", "age", "gender", "sport", "achievements", "ranking",
+               "experience_years", "contact_number", "location"),
+              ((email("athlete", i), password, f"Athlete {i}", rng.randint(14, 35), rng.choice(GENDERS),
+                rng.choice(SPORTS), f"State medal {rng.randint(1, 5)}", rng.randint(1, 500),
+                rng.randint(0, 15), f"9{rng.randint(100000000, 999999999)}", rng.choice(LOCATIONS))
+               for i in range(athletes)))
+        _copy(cur, "coaches",
+              ("email", "password", "full_name", "specialization", "certifications", "experience_years",
+               "contact_number", "location"),
+              ((email("coach", i), password, f"Coach {i}", rng.choice(SPORTS), "NIS Level 2",
+                rng.randint(1, 30), f"8{rng.randint(100000000, 999999999)}", rng.choice(LOCATIONS))
+               for i in range(coaches)))
+        _copy(cur, "sponsors",
+              ("email", "password", "name", "contact_person", "sport", "contact_number", "location"),
+              ((email("sponsor", i), password, f"Sponsor {i} Ltd", f"Contact {i}", rng.choice(SPORTS),
+                f"7{rng.randint(100000000, 999999999)}", rng.choice(LOCATIONS))
+               for i in range(sponsors)))
+
+        cur.execute("SELECT id, full_name, age, gender, sport, location FROM athletes WHERE email LIKE %s",
+                    (f"%@{EMAIL_DOMAIN}",))
+        owners = cur.fetchall()
+
+        def application_rows():
+            for _ in range(applications if owners else 0):
+                athlete_id, name, age, gender, sport, location = rng.choice(owners)
+                submitted = now - timedelta(minutes=rng.randint(0, 180 * 24 * 60))
+                status = rng.choices(("Pending", "Forwarded", "Approved", "Denied"), (50, 35, 10, 5))[0]
+                forwarded = submitted + timedelta(days=1) if status != "Pending" else None
+                yield (athlete_id, name, age, gender, sport, location, rng.choice(("coach", "sponsor")),
+                       "District champion", "Train at a higher level", "Nationals", None, status,
+                       submitted.isoformat(), forwarded and forwarded.isoformat())
+
+        _copy(cur, "applications",
+              ("athlete_id", "athlete_name", "age", "gender", "sport", "location", "application_type",
+               "achievements", "motivation", "goals", "supporting_docs", "status", "submission_date",
+               "forwarded_date"),
+              application_rows())
+        conn.commit()
+        cur.execute("ANALYZE athletes; ANALYZE coaches; ANALYZE sponsors; ANALYZE applications")
+        conn.commit()
+
+    print(f"seeded {athletes} athletes, {coaches} coaches, {sponsors} sponsors, {applications} applications"
+          f" in {time.perf_counter() - started:.1f}s")
+
+
+# ----- replay -----
+
+class Client:
+    """One keep-alive HTTP connection with its own session cookie."""
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        conn_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.conn = conn_class(parts.hostname, parts.port, timeout=timeout)
+        self.prefix = parts.path.rstrip("/")
+        self.cookies = {}
+
+    def request(self, method, path, body=None):
+        headers = {}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        try:
+            self.conn.request(method, self.prefix + path, body=body, headers=headers)
+            resp = self.conn.getresponse()
+            data = resp.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            raise
+        for cookie in resp.headers.get_all("Set-Cookie") or ():
+            name, _, value = cookie.split(";", 1)[0].partition("=")
+            self.cookies[name.strip()] = value
+        return resp.status, data
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}     # route -> [(status, seconds)]
+        self._lock = threading.Lock()
+
+    def add(self, route, status, seconds):
+        with self._lock:
+            self.samples.setdefault(route, []).append((status, seconds))
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # nearest-rank
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples, elapsed):
+    def stats(entries):
+        latencies = sorted(s for _, s in entries)
+        status = {}
+        for code, _ in entries:
+            status[str(code)] = status.get(str(code), 0) + 1
+        errors = sum(n for code, n in status.items() if code == "error" or code.startswith("5"))
+        return {
+            "requests": len(entries),
+            "errors": errors,
+            "rps": round(len(entries) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 3) if latencies else None,
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 3) if latencies else None,
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 3) if latencies else None,
+            "max_ms": round(latencies[-1] * 1000, 3) if latencies else None,
+            "status": status,
+        }
+
+    routes = {route: stats(entries) for route, entries in sorted(samples.items())}
+    everything = [e for entries in samples.values() for e in entries]
+    return routes, stats(everything)
+
+
+class Worker(threading.Thread):
+    def __init__(self, persona, index, args, fixtures, recorder, stop, measure_from, seed):
+        super().__init__(daemon=True)
+        self.persona = persona
+        self.index = index
+        self.args = args
+        self.fixtures = fixtures
+        self.recorder = recorder
+        self.stop = stop
+        self.measure_from = measure_from
+        self.rng = random.Random(seed)
+        self.client = Client(args.url, args.timeout)
+        routes = MIX[persona]
+        self.routes, self.weights = list(routes), list(routes.values())
+
+    def user_email(self):
+        count = self.fixtures["counts"][self.persona]
+        return email(self.persona, self.rng.randrange(count))
+
+    def call(self, route, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, _ = self.client.request(method, path, body)
+        except (OSError, http.client.HTTPException):
+            status = "error"
+        finished = time.perf_counter()
+        if started >= self.measure_from:
+            self.recorder.add(route, status, finished - started)
+        return status
+
+    def login(self):
+        return self.call("login", "POST", "/login", {"email": self.user_email(), "password": PASSWORD})
+
+    def run(self):
+        if self.persona != "admin":
+            self.login()
+        while not self.stop.is_set():
+            route = self.rng.choices(self.routes, self.weights)[0]
+            getattr(self, f"do_{route}")()
+            if self.args.think_ms:
+                time.sleep(self.rng.expovariate(1000 / self.args.think_ms))
+
+    def do_login(self):
+        self.login()
+
+    def do_dashboard(self):
+        self.call("dashboard", "GET", "/dashboard")
+
+    def do_profile(self):
+        self.call("profile", "GET", "/profile")
+
+    def do_submit_application(self):
+        self.call("submit_application", "POST", "/submit_application", {
+            "athlete_name": f"Athlete {self.index}", "age": self.rng.randint(14, 35),
+            "gender": self.rng.choice(GENDERS), "sport": self.rng.choice(SPORTS),
+            "location": self.rng.choice(LOCATIONS), "application_type": self.rng.choice(("coach", "sponsor")),
+            "achievements": "District champion", "motivation": "Train at a higher level", "goals": "Nationals",
+        })
+
+    def do_respond_application(self):
+        ids = self.fixtures["forwarded"][self.persona]
+        if not ids:
+            return
+        app_id = self.rng.choice(ids)
+        self.call("respond_application", "POST", f"/respond_application/{app_id}",
+                  {"action": self.rng.choice(("approve", "deny")), "notes": "load test"})
+
+    def do_get_users(self):
+        role = self.rng.choice(("athlete", "coach", "sponsor"))
+        if self.rng.random() < 0.3:
+            self.call("get_users", "GET", f"/get_users?type={role}&q={role[0]}")
+        else:
+            after = self.rng.randrange(max(self.fixtures["counts"][role], 1))
+            self.call("get_users", "GET", f"/get_users?type={role}&after={after}")
+
+    def do_get_pending_applications(self):
+        self.call("get_pending_applications", "GET", "/get_pending_applications?format=ndjson&limit=100")
+
+
+def load_fixtures():
+    """Seeded user counts and Forwarded application ids, so workers can pick valid targets."""
+    like = f"%@{EMAIL_DOMAIN}"
+    counts, forwarded = {}, {}
+    with get_db() as conn, conn.cursor() as cur:
+        for role, table in (("athlete", "athletes"), ("coach", "coaches"), ("sponsor", "sponsors")):
+            cur.execute(f"SELECT COUNT(*) FROM {table} WHERE email LIKE %s", (like,))
+            counts[role] = cur.fetchone()[0]
+        for role in ("coach", "sponsor"):
+            cur.execute("SELECT id FROM applications WHERE status = 'Forwarded' AND LOWER(TRIM(application_type)) = %s"
+                        " ORDER BY random() LIMIT 100000", (role,))
+            forwarded[role] = [r[0] for r in cur.fetchall()]
+    return {"counts": counts, "forwarded": forwarded}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def drive(args, fixtures, personas):
+    """Run args.concurrency persona workers against args.url; (per-route stats, total stats, workers)."""
+    rng = random.Random(args.seed)
+    recorder, stop = Recorder(), threading.Event()
+    measure_from = time.perf_counter() + args.warmup
+    workers = [
+        Worker(rng.choices(personas, [PERSONAS[p] for p in personas])[0], i, args, fixtures, recorder, stop,
+               measure_from, rng.random())
+        for i in range(args.concurrency)
+    ]
+    for w in workers:
+        w.start()
+    time.sleep(args.warmup + args.duration)
+    stop.set()
+    for w in workers:
+        w.join(args.timeout + 1)
+    return (*summarize(recorder.samples, args.duration), workers)
+
+
+def replay(args):
+    if args.mix:
+        with open(args.mix) as f:
+            MIX.update(json.load(f))
+
+    fixtures = load_fixtures()
+    personas = [p for p in PERSONAS if p == "admin" or fixtures["counts"][p]]
+    if not any(fixtures["counts"].values()):
+        sys.exit("no seeded users found; run `python loadtest.py seed` first")
+
+    routes, total, workers = drive(args, fixtures, personas)
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "url": args.url,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "concurrency": args.concurrency,
+            "think_ms": args.think_ms,
+            "seed": args.seed,
+            "workers": {p: sum(1 for w in workers if w.persona == p) for p in PERSONAS},
+            "seeded": fixtures["counts"],
+            "mix": MIX,
+        },
+        "routes": routes,
+        "total": total,
+    }
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"{datetime.utcnow():%Y%m%dT%H%M%S}-{result['meta']['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+
+    print(f"{'route':<26}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for route, s in [*routes.items(), ("TOTAL", total)]:
+        print(f"{route:<26}{s['requests']:>8}{s['errors']:>6}{s['rps']:>9.1f}"
+              f"{s['p50_ms'] or 0:>9.1f}{s['p95_ms'] or 0:>9.1f}{s['p99_ms'] or 0:>9.1f}")
+    print(f"results written to {out}")
+
+
+# ----- comparison -----
+
+def compare(before_path, after_path, threshold):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    regressed = []
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    print(f"{'route':<26}{'rps':>16}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}")
+    for route in sorted(set(before["routes"]) | set(after["routes"])):
+        b, a = before["routes"].get(route), after["routes"].get(route)
+        if not b or not a:
+            print(f"{route:<26}  only in {'after' if a else 'before'}")
+            continue
+        cells = []
+        for key, higher_is_better in (("rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False)):
+            old, new = b[key] or 0, a[key] or 0
+            change = (new - old) / old * 100 if old else 0.0
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressed.append(f"{route} {key} {old} -> {new} ({change:+.1f}%)")
+            cells.append(f"{new:>9.1f} {change:+6.1f}%")
+        print(f"{route:<26}" + "".join(f"{c:>18}" for c in cells))
+
+    for line in regressed:
+        print(f"REGRESSION: {line}")
+    return 1 if regressed else 0
+
+
+# ----- checks -----
+
+CHECKS = {}
+
+
+def check(name):
+    """Register fn(args) -> [failure messages] as `python loadtest.py check <name>`."""
+    def register(fn):
+        CHECKS[name] = fn
+        return fn
+    return register
+
+
+def hammer(fn, concurrency, iterations):
+    """Call fn() `iterations` times from each of `concurrency` threads; (sorted latencies, errors)."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(concurrency)
+
+    def loop():
+        mine = []
+        start.wait()
+        for _ in range(iterations):
+            began = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                continue
+            mine.append(time.perf_counter() - began)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sorted(latencies), errors
+
+
+def _latency_line(label, latencies, errors, elapsed):
+    return (f"{label:<22}{len(latencies):>8}{len(errors):>6}{len(latencies) / elapsed:>9.0f}"
+            f"{(_percentile(latencies, 50) or 0) * 1000:>9.2f}{(_percentile(latencies, 99) or 0) * 1000:>9.2f}")
+
+
+@check("pool")
+def check_pool(args):
+    """One-query requests on a fresh connection each vs through the pool; the pool must win on p99."""
+    import psycopg2
+    from db import DB_CONFIG, POOL_MIN, POOL_MAX, ConnectionPool
+
+    def direct():
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+        finally:
+            conn.close()
+
+    pool = ConnectionPool(POOL_MIN, POOL_MAX, max_uses=max(args.iterations // 4, 1), **DB_CONFIG)
+    pool.warm_up()
+
+    def pooled():
+        with pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            conn.rollback()
+
+    results = {}
+    print(f"{'mode':<22}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p99':>9}  (ms)")
+    for label, fn in (("connect per request", direct), ("pool", pooled)):
+        started = time.perf_counter()
+        latencies, errors = hammer(fn, args.concurrency, args.iterations)
+        results[label] = (latencies, errors)
+        print(_latency_line(label, latencies, errors, time.perf_counter() - started))
+    stats = pool.stats()
+    pool.closeall()
+    print(json.dumps(stats, indent=2))
+
+    failures = [f"{label}: {len(errors)} errors, first: {errors[0]!r}"
+                for label, (_, errors) in results.items() if errors]
+    direct_p99 = _percentile(results["connect per request"][0], 99)
+    pooled_p99 = _percentile(results["pool"][0], 99)
+    if direct_p99 is not None and pooled_p99 is not None and pooled_p99 >= direct_p99:
+        failures.append(f"pool p99 {pooled_p99 * 1000:.2f}ms is not below connect-per-request"
+                        f" p99 {direct_p99 * 1000:.2f}ms")
+    if stats["in_use"]:
+        failures.append(f"{stats['in_use']} connections still checked out after the run")
+    if stats["size"] > POOL_MAX:
+        failures.append(f"pool grew to {stats['size']} connections, above DB_POOL_MAX={POOL_MAX}")
+    if stats["opened"] - stats["closed"] != stats["size"]:
+        failures.append(f"opened {stats['opened']} - closed {stats['closed']} != size {stats['size']}")
+    if not stats["recycled"]:
+        failures.append("no connection was recycled; max_uses is not being applied")
+    return failures
+
+
+def _rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+# synthetic rows added by checks are tagged with this athlete_name and removed afterwards
+CHECK_TAG = "loadtest check"
+
+
+@check("stream")
+def check_stream(args):
+    """Stream /get_pending_applications over --rows pending rows; RSS growth must stay under --max-mb."""
+    from app import app
+
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM applications WHERE status = 'Pending'")
+        missing = args.rows - cur.fetchone()[0]
+        if missing > 0:
+            cur.execute("""
+                INSERT INTO applications (athlete_name, age, gender, sport, location, application_type,
+                                          achievements, motivation, goals, status, submission_date)
+                SELECT %s, 20, 'Male', 'Football', 'Pune', 'coach', repeat('x', 200),
+                       'Train at a higher level', 'Nationals', 'Pending', now() - g * interval '1 second'
+                FROM generate_series(1, %s) g
+            """, (CHECK_TAG, missing))
+        conn.commit()
+        cur.execute("SELECT COUNT(*) FROM applications WHERE status = 'Pending'")
+        pending = cur.fetchone()[0]
+
+    failures = []
+    client = app.test_client()
+    try:
+        for fmt in ("ndjson", "json"):
+            baseline = peak = _rss_bytes()
+            rows = size = 0
+            started = time.perf_counter()
+            response = client.get(f"/get_pending_applications?format={fmt}", buffered=False)
+            for i, chunk in enumerate(response.iter_encoded()):
+                size += len(chunk)
+                # the route yields one row per chunk
+                rows += chunk.count(b"\n") if fmt == "ndjson" else chunk.lstrip(b",").startswith(b"{")
+                if i % 1000 == 0:
+                    peak = max(peak, _rss_bytes())
+            response.close()
+            elapsed = time.perf_counter() - started
+            growth = (max(peak, _rss_bytes()) - baseline) / 2 ** 20
+            print(f"{fmt:<8}{rows:>10} rows{size / 2 ** 20:>9.1f} MB{elapsed:>8.1f}s  RSS +{growth:.1f} MB")
+            if rows != pending:
+                failures.append(f"{fmt}: streamed {rows} rows, {pending} are pending")
+            if growth > args.max_mb:
+                failures.append(f"{fmt}: RSS grew {growth:.1f} MB while streaming, ceiling is {args.max_mb} MB")
+    finally:
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM applications WHERE athlete_name = %s", (CHECK_TAG,))
+            conn.commit()
+    return failures
+
+
+FEED_INDEX = "applications_forwarded_feed_key_idx"    # migrations/014
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _plan_nodes(child)
+
+
+@check("feed-index")
+def check_feed_index(args):
+    """EXPLAIN every /feed query shape; each must be a range scan of the feed index with no sort."""
+    import queries
+
+    failures = []
+    now = datetime.utcnow().isoformat()
+    with get_db() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM applications")
+        print(f"applications: {cur.fetchone()[0]} rows")
+        for user_type in ("coach", "sponsor"):
+            for cursor in (None, f"{now}|{2 ** 31 - 1}"):
+                sql, params = queries.feed_page(user_type, cursor, 20)
+                cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                nodes = list(_plan_nodes(cur.fetchone()[0][0]["Plan"]))
+                label = f"{user_type} {'next page' if cursor else 'first page'}"
+                print(f"{label:<20}" + " -> ".join(
+                    n["Node Type"] + (f" ({n['Index Name']})" if "Index Name" in n else "") for n in nodes))
+                if not any(n.get("Index Name") == FEED_INDEX for n in nodes):
+                    failures.append(f"{label}: plan does not use {FEED_INDEX}")
+                if any(n["Node Type"] in ("Seq Scan", "Sort") for n in nodes):
+                    failures.append(f"{label}: plan scans or sorts applications")
+        conn.rollback()
+    if failures:
+        print("(the planner prefers a sequential scan on small tables; seed one with `python loadtest.py seed`)")
+    return failures
+
+
+@check("respond-race")
+def check_respond_race(args):
+    """--concurrency threads respond to one Forwarded application at once; exactly one may win, every round."""
+    import application_status
+
+    rounds = max(args.iterations // 20, 1)
+    failures = []
+    outcomes = {"won": 0, "rejected": 0, "errors": 0}
+    try:
+        for n in range(rounds):
+            with get_db() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO applications (athlete_name, sport, application_type, status, submission_date,
+                                              forwarded_date)
+                    VALUES (%s, 'Football', 'coach', 'Forwarded', now(), now())
+                    RETURNING id
+                """, (CHECK_TAG,))
+                app_id = cur.fetchone()[0]
+                conn.commit()
+
+            results = []
+            lock = threading.Lock()
+            start = threading.Barrier(args.concurrency)
+
+            def respond(i):
+                action = "approve" if i % 2 else "deny"
+                start.wait()
+                try:
+                    with get_db() as conn, conn.cursor() as cur:
+                        row = application_status.respond(cur, app_id, "coach", email("coach", i), action, "race")
+                        conn.commit()
+                    result = ("won", row[1])
+                except application_status.TransitionError as e:
+                    result = ("rejected", e.status_code)
+                except Exception as e:
+                    result = ("errors", repr(e))
+                with lock:
+                    results.append(result)
+
+            threads = [threading.Thread(target=respond, args=(i,), daemon=True) for i in range(args.concurrency)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            with get_db() as conn, conn.cursor() as cur:
+                cur.execute("SELECT status FROM applications WHERE id = %s", (app_id,))
+                final = cur.fetchone()[0]
+                conn.rollback()
+
+            winners = [detail for outcome, detail in results if outcome == "won"]
+            for outcome, _ in results:
+                outcomes[outcome] += 1
+            if len(winners) != 1:
+                failures.append(f"application {app_id}: {len(winners)} responses won")
+            elif winners[0] != final:
+                failures.append(f"application {app_id}: winner set {winners[0]}, row is {final}")
+            failures += [f"application {app_id}: {outcome} {detail}" for outcome, detail in results
+                         if outcome == "errors" or (outcome == "rejected" and detail != 400)]
+    finally:
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM applications WHERE athlete_name = %s", (CHECK_TAG,))
+            conn.commit()
+
+    print(f"{rounds} applications x {args.concurrency} concurrent responses: {outcomes}")
+    return failures
+
+
+@check("serving")
+def check_serving(args):
+    """Replay the route mix at --concurrency against the WSGI and the ASGI server in turn; ASGI must serve more.
+
+    Both servers must already be running on the seeded database (see `seed` and `run`).
+    """
+    fixtures = load_fixtures()
+    personas = [p for p in PERSONAS if p == "admin" or fixtures["counts"][p]]
+    if not any(fixtures["counts"].values()):
+        return ["no seeded users found; run `python loadtest.py seed` first"]
+
+    totals = {}
+    print(f"{'mode':<8}{'reqs':>9}{'err':>7}{'rps':>10}{'p50':>9}{'p95':>9}{'p99':>9}"
+          f"  (ms, {args.concurrency} workers)")
+    for mode, url in (("wsgi", args.wsgi_url), ("asgi", args.asgi_url)):
+        run_args = argparse.Namespace(**{**vars(args), "url": url, "think_ms": 0, "seed": 0})
+        _, total, _ = drive(run_args, fixtures, personas)
+        totals[mode] = total
+        print(f"{mode:<8}{total['requests']:>9}{total['errors']:>7}{total['rps']:>10.1f}"
+              f"{total['p50_ms'] or 0:>9.1f}{total['p95_ms'] or 0:>9.1f}{total['p99_ms'] or 0:>9.1f}")
+
+    failures = []
+    wsgi, asgi = totals["wsgi"], totals["asgi"]
+    for mode, total in totals.items():
+        if not total["requests"]:
+            failures.append(f"{mode}: no requests completed at {getattr(args, mode + '_url')}")
+    if asgi["rps"] <= wsgi["rps"]:
+        failures.append(f"asgi served {asgi['rps']:.1f} req/s, not more than wsgi's {wsgi['rps']:.1f}")
+    if asgi["errors"] / max(asgi["requests"], 1) > wsgi["errors"] / max(wsgi["requests"], 1):
+        failures.append(f"asgi error rate {asgi['errors']}/{asgi['requests']} is above wsgi's "
+                        f"{wsgi['errors']}/{wsgi['requests']}")
+    return failures
+
+
+# the login's role lookup before migrations/001: probe each role table in turn until one has the email
+SEQUENTIAL_LOOKUPS = (
+    "SELECT password, full_name FROM athletes WHERE email=%s",
+    "SELECT password, full_name FROM coaches WHERE email=%s",
+    "SELECT password, name, contact_person FROM sponsors WHERE email=%s",
+)
+LOOKUP_TABLES = {"athlete": ("athletes", ("full_name",)), "coach": ("coaches", ("full_name",)),
+                 "sponsor": ("sponsors", ("name", "contact_person"))}
+
+
+def _lookup_email(role, i):
+    return f"lt-lookup-{role}-{i}@{EMAIL_DOMAIN}"
+
+
+@check("login-lookup")
+def check_login_lookup(args):
+    """Resolve emails by probing each role table in turn vs one users lookup, with --rows accounts per table.
+
+    Emails are spread evenly over the three roles and unknown addresses. The users lookup must win on p50 and p99.
+    """
+    import queries
+
+    n = args.rows
+    like = f"lt-lookup-%@{EMAIL_DOMAIN}"
+    try:
+        with get_db() as conn, conn.cursor() as cur:
+            for role, (table, name_columns) in LOOKUP_TABLES.items():
+                # the users triggers (migrations/001) add every inserted account to users as well
+                cur.execute(f"""
+                    INSERT INTO {table} (email, password, {", ".join(name_columns)})
+                    SELECT %s || g || %s, '!', {", ".join(["%s"] * len(name_columns))}
+                    FROM generate_series(0, %s - 1) g
+                """, (f"lt-lookup-{role}-", f"@{EMAIL_DOMAIN}", *[CHECK_TAG] * len(name_columns), n))
+                conn.commit()
+                print(f"{table}: {n} lookup accounts added")
+            cur.execute("ANALYZE athletes; ANALYZE coaches; ANALYZE sponsors; ANALYZE users")
+            conn.commit()
+
+        def target():
+            # a quarter of the lookups are for unknown addresses, which probe all three tables
+            return _lookup_email(random.choice(("athlete", "coach", "sponsor", "missing")), random.randrange(n))
+
+        def sequential():
+            address = target()
+            with get_db() as conn, conn.cursor() as cur:
+                for sql in SEQUENTIAL_LOOKUPS:
+                    cur.execute(sql, (address,))
+                    if cur.fetchone():
+                        break
+                conn.rollback()
+
+        def unified():
+            address = target()
+            with get_db() as conn, conn.cursor() as cur:
+                cur.execute_prepared(queries.LOGIN_LOOKUP, (address,))
+                cur.fetchone()
+                conn.rollback()
+
+        print(f"{'lookup':<22}{'ok':>8}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        results = {}
+        for label, fn in (("per-table probing", sequential), ("users table", unified)):
+            started = time.perf_counter()
+            latencies, errors = hammer(fn, args.concurrency, args.iterations)
+            print(_latency_line(label, latencies, errors, time.perf_counter() - started))
+            results[label] = (_percentile(latencies, 50), _percentile(latencies, 99), errors)
+    finally:
+        with get_db() as conn, conn.cursor() as cur:
+            for table, _ in LOOKUP_TABLES.values():
+                cur.execute(f"DELETE FROM {table} WHERE email LIKE %s", (like,))
+            conn.commit()
+
+    failures = [f"{label}: {len(errors)} errors, first {errors[0]!r}"
+                for label, (_, _, errors) in results.items() if errors]
+    (seq_p50, seq_p99, _), (users_p50, users_p99, _) = results["per-table probing"], results["users table"]
+    if None in (seq_p50, users_p50):
+        return failures + ["no successful lookups to compare"]
+    if users_p50 >= seq_p50 or users_p99 >= seq_p99:
+        failures.append(f"users lookup p50/p99 {users_p50 * 1000:.2f}/{users_p99 * 1000:.2f} ms is not below "
+                        f"per-table probing {seq_p50 * 1000:.2f}/{seq_p99 * 1000:.2f} ms")
+    return failures
+
+
+def _timed_batches(ids, batch, apply):
+    """Run apply(cur, chunk) for `batch`-sized chunks of ids, one transaction each; (seconds, results)."""
+    results = []
+    started = time.perf_counter()
+    for i in range(0, len(ids), batch):
+        with get_db() as conn, conn.cursor() as cur:
+            results += apply(cur, ids[i:i + batch])
+            conn.commit()
+    return time.perf_counter() - started, results
+
+
+@check("bulk")
+def check_bulk(args):
+    """Review and delete --rows (up to BULK_MAX_IDS) rows one request at a time, then in one bulk call each.
+
+    Each pass does what the route does: one transaction per request. Bulk must touch every row and win.
+    """
+    import queries
+    import application_status
+    from app import BULK_MAX_IDS
+
+    n = min(args.rows, BULK_MAX_IDS)
+    failures = []
+    like = f"lt-bulk-%@{EMAIL_DOMAIN}"
+    try:
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO applications (athlete_name, sport, application_type, status, submission_date)
+                SELECT %s, 'Football', 'coach', 'Pending', now() FROM generate_series(1, %s)
+                RETURNING id
+            """, (CHECK_TAG, 2 * n))
+            app_ids = sorted(r[0] for r in cur.fetchall())
+            cur.execute("""
+                INSERT INTO athletes (email, password, full_name)
+                SELECT 'lt-bulk-' || g || %s, '!', %s FROM generate_series(1, %s) g
+                RETURNING id
+            """, (f"@{EMAIL_DOMAIN}", CHECK_TAG, 2 * n))
+            user_ids = sorted(r[0] for r in cur.fetchall())
+            conn.commit()
+
+        def review(cur, ids):
+            return list(application_status.review(cur, ids, "Denied").values())
+
+        def delete(cur, ids):
+            cur.execute(queries.bulk_delete_users("athlete"), (ids,))
+            found = {r[0] for r in cur.fetchall()}
+            return ["deleted" if i in found else "not_found" for i in ids]
+
+        print(f"{'operation':<22}{'rows':>8}{'seconds':>10}{'rows/s':>10}")
+        for label, ids, apply, ok in (("review", app_ids, review, "updated"), ("delete", user_ids, delete, "deleted")):
+            rates = {}
+            for mode, chunk, part in (("single", 1, ids[:n]), ("bulk", BULK_MAX_IDS, ids[n:])):
+                elapsed, results = _timed_batches(part, chunk, apply)
+                rates[mode] = len(part) / elapsed
+                print(f"{label + ' ' + mode:<22}{len(part):>8}{elapsed:>10.2f}{rates[mode]:>10.0f}")
+                missed = sum(1 for r in results if r != ok)
+                if missed:
+                    failures.append(f"{label} {mode}: {missed} of {len(part)} rows not {ok}")
+            print(f"{label}: bulk is {rates['bulk'] / rates['single']:.0f}x single")
+            if rates["bulk"] <= rates["single"]:
+                failures.append(f"{label}: bulk {rates['bulk']:.0f} rows/s is not faster than single "
+                                f"{rates['single']:.0f} rows/s")
+    finally:
+        with get_db() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM applications WHERE athlete_name = %s", (CHECK_TAG,))
+            cur.execute("DELETE FROM athletes WHERE email LIKE %s", (like,))
+            conn.commit()
+    return failures
+
+
+def _search(cur, kind, text="", filters=None, limit=20):
+    import queries
+
+    filters = filters or {}
+    cur.execute(*queries.search_page(kind, text, filters, limit, 0))
+    columns = [d[0] for d in cur.description]
+    rows = [dict(zip(columns, r)) for r in cur.fetchall()]
+    cur.execute(*queries.search_facets(kind, text, filters))
+    return rows, queries.facet_counts(kind, cur.fetchall(), top=None)
+
+
+@check("search")
+def check_search(args):
+    """Search ranking order, facet totals and filters on every target, then page + facet latency."""
+    import queries
+
+    failures = []
+    with get_db() as conn, conn.cursor() as cur:
+        # a name match (weight A) must outrank an achievements match (weight B)
+        cur.execute("""
+            INSERT INTO athletes (email, password, full_name, sport, achievements)
+            VALUES (%s, '!', 'Zyxwv Check', 'Athletics', 'none'), (%s, '!', 'Other Check', 'Athletics', 'zyxwv')
+        """, (email("check", 1), email("check", 2)))
+        rows, _ = _search(cur, "athlete", "zyxwv")
+        print("weighted ranking:", [(r["full_name"], round(r["rank"], 4)) for r in rows])
+        if [r["full_name"] for r in rows] != ["Zyxwv Check", "Other Check"]:
+            failures.append(f"athlete search 'zyxwv' returned {[r['full_name'] for r in rows]}")
+        conn.rollback()
+
+        terms = {}
+        for kind, target in queries.SEARCH_TARGETS.items():
+            _, facets = _search(cur, kind)
+            first, second = target["facets"][:2]
+            if not facets[first]:
+                print(f"{kind}: no rows, skipped")
+                continue
+            text = facets[first][0]["value"]
+            terms[kind] = [f["value"] for f in facets[first][:20] if f["value"]]
+            rows, facets = _search(cur, kind, text, limit=50)
+            totals = {col: sum(f["count"] for f in counts) for col, counts in facets.items()}
+            print(f"{kind}: q={text!r} {totals}")
+            ranks = [r["rank"] for r in rows]
+            if ranks != sorted(ranks, reverse=True):
+                failures.append(f"{kind} q={text!r}: results are not in rank order")
+            if len(set(totals.values())) > 1:
+                failures.append(f"{kind} q={text!r}: facet totals disagree {totals}")
+
+            value, count = facets[second][0]["value"], facets[second][0]["count"]
+            if value is None:
+                continue
+            rows, narrowed = _search(cur, kind, text, {second: value}, limit=50)
+            narrowed_total = sum(f["count"] for f in narrowed[first])
+            if narrowed_total != count:
+                failures.append(f"{kind} q={text!r} {second}={value!r}: {narrowed_total} matches, facet said {count}")
+            if any(r.get(second, value) != value for r in rows):
+                failures.append(f"{kind} q={text!r} {second}={value!r}: results outside the filter")
+
+        rng = random.Random(0)
+        latencies = []
+        for _ in range(args.iterations if terms else 0):
+            kind = rng.choice(list(terms))
+            started = time.perf_counter()
+            _search(cur, kind, rng.choice(terms[kind]))
+            latencies.append(time.perf_counter() - started)
+        conn.rollback()
+
+    latencies.sort()
+    if latencies:
+        print(f"page + facets: {len(latencies)} searches, p50 {_percentile(latencies, 50) * 1000:.1f}ms,"
+              f" p99 {_percentile(latencies, 99) * 1000:.1f}ms")
+    return failures
+
+
+@check("live")
+def check_live(args):
+    """Fan-out to --subscribers streams drops nothing; heartbeats keep their cadence under steady NOTIFY traffic."""
+    import asyncio
+    import live
+    from db import DB_CONFIG
+
+    failures = []
+    n, events = args.subscribers, args.iterations
+    delivered, elapsed, latencies, stats = asyncio.run(live.fanout(n, events, 0.01))
+    print(f"{n} subscribers x {events} events: {delivered} deliveries in {elapsed:.2f}s,"
+          f" last-subscriber p99 {(_percentile(latencies, 99) or 0) * 1000:.1f} ms, {stats['dropped']} dropped")
+    if delivered != n * events:
+        failures.append(f"fan-out delivered {delivered} of {n * events} events")
+    if stats["dropped"]:
+        failures.append(f"fan-out dropped {stats['dropped']} subscribers")
+
+    # a real LISTEN connection with a short heartbeat, kept busy by a NOTIFY every 20 ms
+    live.LIVE_HEARTBEAT, duration = 0.2, 2.0
+    hub = live.Hub()
+    live.Listener(hub, DB_CONFIG).start()
+    sub = hub.subscribe(("feed:check",))
+    frames = {"events": 0, "heartbeats": 0}
+
+    def consume():
+        while True:
+            data = sub.get()
+            frames["heartbeats" if data == live.HEARTBEAT else "events"] += 1
+
+    threading.Thread(target=consume, daemon=True).start()
+    time.sleep(0.5)    # let the listener connect
+    with get_db() as conn, conn.cursor() as cur:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            for statement in live.delta("feed:check", "added", [0]):
+                cur.execute(*statement)
+            conn.commit()
+            time.sleep(0.02)
+    time.sleep(0.1)
+    expected = int(duration / live.LIVE_HEARTBEAT) - 2
+    print(f"busy stream: {frames['events']} events, {frames['heartbeats']} heartbeats in {duration:.0f}s"
+          f" (every {live.LIVE_HEARTBEAT}s)")
+    if not frames["events"]:
+        failures.append("no notifications reached the listener")
+    if frames["heartbeats"] < expected:
+        failures.append(f"{frames['heartbeats']} heartbeats under steady traffic, expected at least {expected}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed, replay and compare load tests.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("seed", help="insert load-test users and applications")
+    p.add_argument("--athletes", type=int, default=10000)
+    p.add_argument("--coaches", type=int, default=500)
+    p.add_argument("--sponsors", type=int, default=300)
+    p.add_argument("--applications", type=int, default=50000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--reset", action="store_true", help="delete previously seeded rows first")
+
+    p = sub.add_parser("run", help="replay the route mix against a running server")
+    p.add_argument("--url", default="http://127.0.0.1:5000")
+    p.add_argument("--duration", type=float, default=30, help="measured seconds")
+    p.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before measuring")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--think-ms", type=float, default=0, help="mean pause between a worker's requests")
+    p.add_argument("--timeout", type=float, default=30)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--mix", help="JSON file overriding per-persona route weights")
+    p.add_argument("--out", help=f"result path (default {RESULTS_DIR}/<time>-<commit>.json)")
+
+    p = sub.add_parser("compare", help="diff two result files")
+    p.add_argument("before")
+    p.add_argument("after")
+    p.add_argument("--threshold", type=float, default=10, help="percent change that counts as a regression")
+
+    p = sub.add_parser("check", help="run one verification against the database")
+    p.add_argument("name", choices=sorted(CHECKS))
+    p.add_argument("--concurrency", type=int, default=32)
+    p.add_argument("--iterations", type=int, default=200, help="operations per thread")
+    p.add_argument("--rows", type=int, default=500_000, help="dataset size for data-bound checks")
+    p.add_argument("--max-mb", type=float, default=64, help="memory ceiling for the stream check")
+    p.add_argument("--subscribers", type=int, default=5000, help="in-process streams for the live check")
+    p.add_argument("--wsgi-url", default="http://127.0.0.1:5000", help="app.py server for the serving check")
+    p.add_argument("--asgi-url", default="http://127.0.0.1:8000", help="asgi.py server for the serving check")
+    p.add_argument("--duration", type=float, default=30, help="measured seconds per server (serving check)")
+    p.add_argument("--warmup", type=float, default=5, help="unmeasured seconds per server (serving check)")
+    p.add_argument("--timeout", type=float, default=30, help="request timeout (serving check)")
+
+    args = parser.parse_args(argv)
+    if args.command == "check":
+        failures = CHECKS[args.name](args)
+        for line in failures:
+            print(f"FAIL: {line}")
+        print(f"check {args.name}: {'FAILED' if failures else 'ok'}")
+        return 1 if failures else 0
+    if args.command == "seed":
+        seed(args.athletes, args.coaches, args.sponsors, args.applications, args.seed, args.reset)
+    elif args.command == "run":
+        replay(args)
+    else:
+        return compare(args.before, args.after, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# metrics.py - request/DB instrumentation, rendered in Prometheus text format at /metrics
+#
+# Both serving modes call start_request() / finish_request() around every
+# request, and every query runs inside timed_query() (db.py wraps psycopg2
+# cursors, asgi.py wraps asyncpg connections). Per-request query counts are
+# tracked in a ContextVar, so they work for threads and asyncio tasks alike.
+import os
+import re
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# queries slower than this are logged to the "sporture.slow_query" logger (0 = off)
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_log = logging.getLogger("sporture.slow_query")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {} if labels else {(): 0}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}        # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(s)) for labels, s in self._series.items()]
+        names = (*self.labels, "le")
+        for labels, s in series:
+            for bound, count in zip(self.buckets, s):
+                yield f"{self.name}_bucket{_labels(names, (*labels, bound))} {count}"
+            yield f"{self.name}_bucket{_labels(names, (*labels, '+Inf'))} {s[-1]}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {s[-2]}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {s[-1]}"
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("method", "route", "status"))
+request_queries = Histogram(
+    "http_request_db_queries", "Database queries issued per request.", ("route",), QUERY_COUNT_BUCKETS)
+request_db_time = Histogram(
+    "http_request_db_seconds", "Time spent in database queries per request.", ("route",))
+queries_total = Counter("db_queries_total", "Database queries executed.")
+query_seconds = Counter("db_query_seconds_total", "Total time spent in database queries.")
+slow_queries = Counter("db_slow_queries_total", "Queries slower than SLOW_QUERY_MS.")
+
+REGISTRY = [request_duration, request_queries, request_db_time, queries_total, query_seconds, slow_queries]
+
+
+# ----- per-request accounting -----
+
+_current = ContextVar("metrics_request", default=None)
+
+
+def start_request():
+    _current.set({"started": time.perf_counter(), "queries": 0, "db_seconds": 0.0})
+
+
+def finish_request(method, route, status):
+    stats = _current.get()
+    if stats is None:
+        return
+    _current.set(None)
+    request_duration.observe(time.perf_counter() - stats["started"], method, route, status)
+    request_queries.observe(stats["queries"], route)
+    request_db_time.observe(stats["db_seconds"], route)
+
+
+# ----- queries -----
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%s|\$\d+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Collapse a statement to its shape: literals and placeholders become ?, whitespace is squeezed."""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    sql = _COMMENT.sub(" ", str(sql))
+    sql = _STRING.sub("?", sql)
+    sql = _PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _LIST.sub("(?, ...)", sql)
+    return _SPACE.sub(" ", sql).strip()[:1000]
+
+
+def record_query(sql, elapsed):
+    queries_total.inc()
+    query_seconds.inc(amount=elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["db_seconds"] += elapsed
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_queries.inc()
+        slow_log.warning("slow query (%.1f ms): %s", elapsed * 1000, normalize_sql(sql))
+
+
+@contextmanager
+def timed_query(sql):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_query(sql, time.perf_counter() - started)
+
+
+# ----- exposition -----
+
+def stats_lines(prefix, stats, counters=()):
+    """Numeric entries of a stats() dict as gauges; keys in `counters` are exported as <prefix>_<key>_total counters."""
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if key in counters:
+            name = key if key.endswith("_total") else f"{key}_total"
+            yield f"# TYPE {prefix}_{name} counter"
+            yield f"{prefix}_{name} {value}"
+        else:
+            yield f"# TYPE {prefix}_{key} gauge"
+            yield f"{prefix}_{key} {value}"
+
+
+def render(*extra):
+    """Prometheus text exposition of every registered metric plus any extra line iterables."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for chunk in extra:
+        lines.extend(chunk)
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,100 @@
+-- Unified identity index: one row per account, keyed by email.
+-- The role tables stay the source of truth; triggers keep `users` in sync.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS users (
+    email        TEXT PRIMARY KEY,
+    role         TEXT NOT NULL CHECK (role IN ('athlete', 'coach', 'sponsor')),
+    role_id      INTEGER NOT NULL,
+    password     TEXT NOT NULL,
+    display_name TEXT
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS users_role_role_id_idx ON users (role, role_id);
+
+-- backfill; writers wait until the triggers below are in place, so no
+-- account created meanwhile can miss `users`
+LOCK TABLE athletes, coaches, sponsors IN SHARE MODE;
+
+-- an email identifies one account; fail rather than keep whichever role came first
+DO $$
+DECLARE
+    clashes TEXT;
+BEGIN
+    SELECT string_agg(email || ' (' || accounts || ')', ', ' ORDER BY email)
+    INTO clashes
+    FROM (
+        SELECT email, string_agg(role || ' ' || id, ', ' ORDER BY role, id) AS accounts
+        FROM (
+            SELECT email, 'athlete' AS role, id FROM athletes
+            UNION ALL
+            SELECT email, 'coach', id FROM coaches
+            UNION ALL
+            SELECT email, 'sponsor', id FROM sponsors
+        ) a
+        GROUP BY email
+        HAVING COUNT(*) > 1
+    ) d;
+    IF clashes IS NOT NULL THEN
+        RAISE EXCEPTION 'emails used by more than one account: %', clashes
+            USING HINT = 'merge or re-address these accounts, then rerun this migration';
+    END IF;
+END
+$$;
+
+TRUNCATE users;
+
+INSERT INTO users (email, role, role_id, password, display_name)
+SELECT email, 'athlete', id, password, full_name FROM athletes;
+
+INSERT INTO users (email, role, role_id, password, display_name)
+SELECT email, 'coach', id, password, full_name FROM coaches;
+
+INSERT INTO users (email, role, role_id, password, display_name)
+SELECT email, 'sponsor', id, password, COALESCE(name, contact_person) FROM sponsors;
+
+CREATE OR REPLACE FUNCTION sync_users() RETURNS trigger AS $$
+DECLARE
+    role_name TEXT := TG_ARGV[0];
+    row_json  JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM users WHERE role = role_name AND role_id = OLD.id;
+        RETURN OLD;
+    END IF;
+
+    row_json := to_jsonb(NEW);
+
+    IF TG_OP = 'INSERT' THEN
+        -- a plain INSERT so a duplicate email in another role raises unique_violation
+        INSERT INTO users (email, role, role_id, password, display_name)
+        VALUES (NEW.email, role_name, NEW.id, NEW.password,
+                COALESCE(row_json->>'full_name', row_json->>'name', row_json->>'contact_person'));
+    ELSE
+        UPDATE users
+        SET email = NEW.email,
+            password = NEW.password,
+            display_name = COALESCE(row_json->>'full_name', row_json->>'name', row_json->>'contact_person')
+        WHERE role = role_name AND role_id = OLD.id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS athletes_sync_users ON athletes;
+CREATE TRIGGER athletes_sync_users
+    AFTER INSERT OR UPDATE OR DELETE ON athletes
+    FOR EACH ROW EXECUTE FUNCTION sync_users('athlete');
+
+DROP TRIGGER IF EXISTS coaches_sync_users ON coaches;
+CREATE TRIGGER coaches_sync_users
+    AFTER INSERT OR UPDATE OR DELETE ON coaches
+    FOR EACH ROW EXECUTE FUNCTION sync_users('coach');
+
+DROP TRIGGER IF EXISTS sponsors_sync_users ON sponsors;
+CREATE TRIGGER sponsors_sync_users
+    AFTER INSERT OR UPDATE OR DELETE ON sponsors
+    FOR EACH ROW EXECUTE FUNCTION sync_users('sponsor');
+
+COMMIT;
@@ -0,0 +1,11 @@
+-- Prefix search for /get_users?q=... on name and email.
+-- text_pattern_ops lets LIKE 'prefix%' use a btree regardless of collation.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS athletes_lower_full_name_idx ON athletes (LOWER(full_name) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS athletes_lower_email_idx ON athletes (LOWER(email) text_pattern_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS coaches_lower_full_name_idx ON coaches (LOWER(full_name) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS coaches_lower_email_idx ON coaches (LOWER(email) text_pattern_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS sponsors_lower_name_idx ON sponsors (LOWER(name) text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS sponsors_lower_email_idx ON sponsors (LOWER(email) text_pattern_ops);
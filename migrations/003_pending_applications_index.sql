@@ -0,0 +1,5 @@
+-- Keyset scan for /get_pending_applications (status='Pending' AND id > after_id ORDER BY id).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS applications_pending_id_idx
+    ON applications (id)
+    WHERE status = 'Pending';
@@ -0,0 +1,9 @@
+-- Coach/sponsor feed on /feed:
+--   WHERE status = 'Forwarded' AND LOWER(application_type) = ?
+--   ORDER BY submission_date DESC, id DESC
+-- The expression matches the query's LOWER(application_type), so the feed is an
+-- index range scan instead of a full table scan.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS applications_forwarded_feed_idx
+    ON applications (LOWER(application_type), submission_date DESC, id DESC)
+    WHERE status = 'Forwarded';
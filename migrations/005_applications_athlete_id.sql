@@ -0,0 +1,25 @@
+-- Link applications to the submitting athlete by id instead of by display name.
+
+BEGIN;
+
+ALTER TABLE applications
+    ADD COLUMN IF NOT EXISTS athlete_id INTEGER REFERENCES athletes (id) ON DELETE SET NULL;
+
+-- Backfill rows whose athlete_name matches exactly one athlete. Ambiguous names
+-- (several athletes share one) are left NULL rather than guessed.
+UPDATE applications a
+SET athlete_id = matched.id
+FROM (
+    SELECT full_name, MIN(id) AS id
+    FROM athletes
+    WHERE full_name IS NOT NULL
+    GROUP BY full_name
+    HAVING COUNT(*) = 1
+) matched
+WHERE a.athlete_id IS NULL
+  AND a.athlete_name = matched.full_name;
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS applications_athlete_id_idx
+    ON applications (athlete_id, submission_date DESC);
@@ -0,0 +1,88 @@
+-- Full-text search for /search: a weighted tsvector per searchable table,
+-- kept current by BEFORE triggers and served by GIN indexes.
+
+BEGIN;
+
+ALTER TABLE athletes     ADD COLUMN IF NOT EXISTS search_vector tsvector;
+ALTER TABLE coaches      ADD COLUMN IF NOT EXISTS search_vector tsvector;
+ALTER TABLE sponsors     ADD COLUMN IF NOT EXISTS search_vector tsvector;
+ALTER TABLE applications ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION athletes_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE(NEW.full_name::text, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.sport::text, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.achievements::text, '')), 'B') ||
+        setweight(to_tsvector('english', COALESCE(NEW.location::text, '')), 'C');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION coaches_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE(NEW.full_name::text, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.specialization::text, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.certifications::text, '')), 'B') ||
+        setweight(to_tsvector('english', COALESCE(NEW.location::text, '')), 'C');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sponsors_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE(NEW.name::text, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.sport::text, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.contact_person::text, '')), 'B') ||
+        setweight(to_tsvector('english', COALESCE(NEW.location::text, '')), 'C');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION applications_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE(NEW.athlete_name::text, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.sport::text, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.achievements::text, '')), 'B') ||
+        setweight(to_tsvector('english', COALESCE(NEW.goals::text, '')), 'C') ||
+        setweight(to_tsvector('english', COALESCE(NEW.motivation::text, '')), 'C') ||
+        setweight(to_tsvector('english', COALESCE(NEW.location::text, '')), 'C');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS athletes_search_vector ON athletes;
+CREATE TRIGGER athletes_search_vector
+    BEFORE INSERT OR UPDATE OF full_name, sport, achievements, location ON athletes
+    FOR EACH ROW EXECUTE FUNCTION athletes_search_vector();
+
+DROP TRIGGER IF EXISTS coaches_search_vector ON coaches;
+CREATE TRIGGER coaches_search_vector
+    BEFORE INSERT OR UPDATE OF full_name, specialization, certifications, location ON coaches
+    FOR EACH ROW EXECUTE FUNCTION coaches_search_vector();
+
+DROP TRIGGER IF EXISTS sponsors_search_vector ON sponsors;
+CREATE TRIGGER sponsors_search_vector
+    BEFORE INSERT OR UPDATE OF name, sport, contact_person, location ON sponsors
+    FOR EACH ROW EXECUTE FUNCTION sponsors_search_vector();
+
+DROP TRIGGER IF EXISTS applications_search_vector ON applications;
+CREATE TRIGGER applications_search_vector
+    BEFORE INSERT OR UPDATE OF athlete_name, sport, achievements, goals, motivation, location ON applications
+    FOR EACH ROW EXECUTE FUNCTION applications_search_vector();
+
+-- backfill: touching a watched column fires the trigger for every existing row
+UPDATE athletes     SET full_name = full_name;
+UPDATE coaches      SET full_name = full_name;
+UPDATE sponsors     SET name = name;
+UPDATE applications SET athlete_name = athlete_name;
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS athletes_search_idx     ON athletes     USING GIN (search_vector);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS coaches_search_idx      ON coaches      USING GIN (search_vector);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS sponsors_search_idx     ON sponsors     USING GIN (search_vector);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS applications_search_idx ON applications USING GIN (search_vector);
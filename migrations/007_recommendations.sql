@@ -0,0 +1,13 @@
+-- Precomputed top-K matches written by `python recommendations.py`.
+-- Coaches/sponsors get athletes; athletes get coaches and sponsors.
+
+CREATE TABLE IF NOT EXISTS recommendations (
+    user_role   TEXT NOT NULL,
+    user_id     INTEGER NOT NULL,
+    target_role TEXT NOT NULL,
+    rank        SMALLINT NOT NULL,
+    target_id   INTEGER NOT NULL,
+    score       REAL NOT NULL,
+    computed_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_role, user_id, target_role, rank)
+);
@@ -0,0 +1,80 @@
+-- Persisted profile completeness: the percentage of a role's profile columns
+-- that are filled in. BEFORE triggers recompute it only when one of those
+-- columns is written; /dashboard reads it and /admin/incomplete_profiles
+-- lists low scorers from the (profile_completeness, id) indexes.
+
+BEGIN;
+
+ALTER TABLE athletes ADD COLUMN IF NOT EXISTS profile_completeness SMALLINT NOT NULL DEFAULT 0;
+ALTER TABLE coaches  ADD COLUMN IF NOT EXISTS profile_completeness SMALLINT NOT NULL DEFAULT 0;
+ALTER TABLE sponsors ADD COLUMN IF NOT EXISTS profile_completeness SMALLINT NOT NULL DEFAULT 0;
+
+-- percent (rounded down) of the arguments that are non-blank
+CREATE OR REPLACE FUNCTION profile_completeness(VARIADIC fields TEXT[]) RETURNS SMALLINT AS $$
+    SELECT (100 * COUNT(*) FILTER (WHERE NULLIF(btrim(f), '') IS NOT NULL) / cardinality(fields))::SMALLINT
+    FROM unnest(fields) AS f
+$$ LANGUAGE sql IMMUTABLE;
+
+-- the argument lists mirror queries.PROFILE_COLUMNS
+CREATE OR REPLACE FUNCTION athletes_profile_completeness() RETURNS trigger AS $$
+BEGIN
+    NEW.profile_completeness := profile_completeness(
+        NEW.full_name::text, NEW.age::text, NEW.gender::text, NEW.sport::text, NEW.achievements::text,
+        NEW.ranking::text, NEW.experience_years::text, NEW.contact_number::text, NEW.location::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION coaches_profile_completeness() RETURNS trigger AS $$
+BEGIN
+    NEW.profile_completeness := profile_completeness(
+        NEW.full_name::text, NEW.specialization::text, NEW.certifications::text,
+        NEW.experience_years::text, NEW.contact_number::text, NEW.location::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sponsors_profile_completeness() RETURNS trigger AS $$
+BEGIN
+    NEW.profile_completeness := profile_completeness(
+        NEW.name::text, NEW.contact_person::text, NEW.sport::text,
+        NEW.contact_number::text, NEW.location::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS athletes_profile_completeness ON athletes;
+CREATE TRIGGER athletes_profile_completeness
+    BEFORE INSERT OR UPDATE OF full_name, age, gender, sport, achievements, ranking,
+                               experience_years, contact_number, location ON athletes
+    FOR EACH ROW EXECUTE FUNCTION athletes_profile_completeness();
+
+DROP TRIGGER IF EXISTS coaches_profile_completeness ON coaches;
+CREATE TRIGGER coaches_profile_completeness
+    BEFORE INSERT OR UPDATE OF full_name, specialization, certifications,
+                               experience_years, contact_number, location ON coaches
+    FOR EACH ROW EXECUTE FUNCTION coaches_profile_completeness();
+
+DROP TRIGGER IF EXISTS sponsors_profile_completeness ON sponsors;
+CREATE TRIGGER sponsors_profile_completeness
+    BEFORE INSERT OR UPDATE OF name, contact_person, sport, contact_number, location ON sponsors
+    FOR EACH ROW EXECUTE FUNCTION sponsors_profile_completeness();
+
+-- backfill directly; setting only profile_completeness doesn't fire the search_vector triggers
+UPDATE athletes SET profile_completeness = profile_completeness(
+    full_name::text, age::text, gender::text, sport::text, achievements::text,
+    ranking::text, experience_years::text, contact_number::text, location::text);
+UPDATE coaches SET profile_completeness = profile_completeness(
+    full_name::text, specialization::text, certifications::text,
+    experience_years::text, contact_number::text, location::text);
+UPDATE sponsors SET profile_completeness = profile_completeness(
+    name::text, contact_person::text, sport::text, contact_number::text, location::text);
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS athletes_profile_completeness_idx
+    ON athletes (profile_completeness, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS coaches_profile_completeness_idx
+    ON coaches (profile_completeness, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS sponsors_profile_completeness_idx
+    ON sponsors (profile_completeness, id);
@@ -0,0 +1,22 @@
+-- Background job queue (jobs.py). Routes insert a row in the same transaction
+-- as their write; workers claim rows with FOR UPDATE SKIP LOCKED and delete
+-- them once handled. Rows that keep failing are kept as status 'dead'.
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id         BIGSERIAL PRIMARY KEY,
+    kind       TEXT NOT NULL,
+    payload    JSONB NOT NULL DEFAULT '{}',
+    status     TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'dead')),
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    run_at     TIMESTAMP NOT NULL DEFAULT now(),
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    last_error TEXT,
+    failed_at  TIMESTAMP
+);
+
+-- claim order for workers; only queued rows are indexed
+CREATE INDEX IF NOT EXISTS jobs_queued_idx ON jobs (run_at, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS jobs_dead_idx ON jobs (failed_at DESC) WHERE status = 'dead';
+
+-- every job is inserted and deleted once; vacuum the churn early
+ALTER TABLE jobs SET (autovacuum_vacuum_scale_factor = 0.01, autovacuum_analyze_scale_factor = 0.02);
@@ -0,0 +1,21 @@
+-- Supporting documents (documents.py). File contents live in the content-
+-- addressed blob store on disk, keyed by sha256; this table holds the
+-- metadata. Identical files uploaded twice share one blob. Rows start
+-- unattached (application_id NULL) and are linked when the application is
+-- submitted; `python documents.py gc` removes ones that never were.
+
+CREATE TABLE IF NOT EXISTS documents (
+    id             BIGSERIAL PRIMARY KEY,
+    application_id INTEGER REFERENCES applications (id) ON DELETE CASCADE,
+    sha256         CHAR(64) NOT NULL,
+    size           BIGINT NOT NULL,
+    filename       TEXT NOT NULL,
+    content_type   TEXT NOT NULL,
+    uploaded_at    TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- documents of one application, for the admin review page
+CREATE INDEX IF NOT EXISTS documents_application_idx ON documents (application_id) WHERE application_id IS NOT NULL;
+-- gc: is a blob still referenced, and which uploads were never attached
+CREATE INDEX IF NOT EXISTS documents_sha256_idx ON documents (sha256);
+CREATE INDEX IF NOT EXISTS documents_unattached_idx ON documents (uploaded_at) WHERE application_id IS NULL;
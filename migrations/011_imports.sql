@@ -0,0 +1,15 @@
+-- Bulk imports (imports.py). POST /admin/imports spools the upload to
+-- IMPORT_DIR, records it here and enqueues an "import.run" job; the job
+-- fills in status and the report (row counts plus the first errors by line).
+
+CREATE TABLE IF NOT EXISTS imports (
+    id          BIGSERIAL PRIMARY KEY,
+    kind        TEXT NOT NULL CHECK (kind IN ('athletes', 'coaches', 'sponsors', 'applications')),
+    format      TEXT NOT NULL CHECK (format IN ('csv', 'jsonl')),
+    on_conflict TEXT NOT NULL CHECK (on_conflict IN ('skip', 'update')),
+    path        TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'done', 'failed')),
+    report      JSONB,
+    created_at  TIMESTAMP NOT NULL DEFAULT now(),
+    finished_at TIMESTAMP
+);
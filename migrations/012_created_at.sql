@@ -0,0 +1,15 @@
+-- Account creation time, for the date-range filter on exports (exports.py).
+-- Accounts that predate this migration keep NULL: when they were created is
+-- unknown, and a backfilled now() would put them all in the same day.
+
+BEGIN;
+
+ALTER TABLE athletes ADD COLUMN IF NOT EXISTS created_at TIMESTAMP;
+ALTER TABLE coaches  ADD COLUMN IF NOT EXISTS created_at TIMESTAMP;
+ALTER TABLE sponsors ADD COLUMN IF NOT EXISTS created_at TIMESTAMP;
+
+ALTER TABLE athletes ALTER COLUMN created_at SET DEFAULT now();
+ALTER TABLE coaches  ALTER COLUMN created_at SET DEFAULT now();
+ALTER TABLE sponsors ALTER COLUMN created_at SET DEFAULT now();
+
+COMMIT;
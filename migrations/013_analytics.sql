@@ -0,0 +1,180 @@
+-- Pre-aggregated counts for /admin/stats (analytics.py). Statement-level
+-- triggers fold each write's transition table into per-key deltas, so the
+-- rollups change in the same transaction as the rows they count and a bulk
+-- statement (an import, a bulk review) costs one upsert per key it touches,
+-- not one per row. Keys are normalized with rollup_key(): trimmed,
+-- lower-cased, '' for missing. `python analytics.py reconcile` checks the
+-- rollups against the base tables.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS application_rollup (
+    day              DATE NOT NULL,
+    status           TEXT NOT NULL,
+    application_type TEXT NOT NULL,
+    sport            TEXT NOT NULL,
+    count            BIGINT NOT NULL,
+    PRIMARY KEY (day, status, application_type, sport)
+);
+
+CREATE TABLE IF NOT EXISTS user_rollup (
+    role     TEXT NOT NULL,
+    sport    TEXT NOT NULL,
+    location TEXT NOT NULL,
+    count    BIGINT NOT NULL,
+    PRIMARY KEY (role, sport, location)
+);
+
+CREATE OR REPLACE FUNCTION rollup_key(value TEXT) RETURNS TEXT AS $$
+    SELECT COALESCE(LOWER(btrim(value)), '')
+$$ LANGUAGE sql IMMUTABLE;
+
+-- rows without a submission date are counted on 1970-01-01 rather than lost
+CREATE OR REPLACE FUNCTION rollup_day(value TIMESTAMP) RETURNS DATE AS $$
+    SELECT COALESCE(value::date, DATE 'epoch')
+$$ LANGUAGE sql IMMUTABLE;
+
+-- status keeps its case: it is one of application_status.TRANSITIONS
+CREATE OR REPLACE VIEW application_rollup_source AS
+SELECT rollup_day(submission_date) AS day, COALESCE(status, '') AS status,
+       rollup_key(application_type) AS application_type, rollup_key(sport) AS sport
+FROM applications;
+
+-- coaches have no sport column; their specialization stands in, as in exports
+CREATE OR REPLACE VIEW user_rollup_source AS
+SELECT 'athlete' AS role, rollup_key(sport) AS sport, rollup_key(location) AS location FROM athletes
+UNION ALL
+SELECT 'coach', rollup_key(specialization), rollup_key(location) FROM coaches
+UNION ALL
+SELECT 'sponsor', rollup_key(sport), rollup_key(location) FROM sponsors;
+
+-- Transition tables are only visible to the statements that name them, so
+-- each event gets its own branch. Upserts go in key order, so concurrent
+-- writers touching the same keys queue up instead of deadlocking.
+CREATE OR REPLACE FUNCTION applications_rollup() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO application_rollup AS r (day, status, application_type, sport, count)
+        SELECT rollup_day(submission_date), COALESCE(status, ''), rollup_key(application_type), rollup_key(sport), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (day, status, application_type, sport) DO UPDATE SET count = r.count + EXCLUDED.count;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO application_rollup AS r (day, status, application_type, sport, count)
+        SELECT day, status, application_type, sport, SUM(delta)
+        FROM (
+            SELECT rollup_day(submission_date) AS day, COALESCE(status, '') AS status,
+                   rollup_key(application_type) AS application_type, rollup_key(sport) AS sport, 1 AS delta
+            FROM new_rows
+            UNION ALL
+            SELECT rollup_day(submission_date), COALESCE(status, ''), rollup_key(application_type), rollup_key(sport), -1
+            FROM old_rows
+        ) d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(delta) <> 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (day, status, application_type, sport) DO UPDATE SET count = r.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO application_rollup AS r (day, status, application_type, sport, count)
+        SELECT rollup_day(submission_date), COALESCE(status, ''), rollup_key(application_type), rollup_key(sport), -COUNT(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (day, status, application_type, sport) DO UPDATE SET count = r.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TG_ARGV[0] is the role; the sport key is the row's sport, else its specialization
+CREATE OR REPLACE FUNCTION users_rollup() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO user_rollup AS r (role, sport, location, count)
+        SELECT TG_ARGV[0], rollup_key(COALESCE(to_jsonb(n)->>'sport', to_jsonb(n)->>'specialization')),
+               rollup_key(n.location), COUNT(*)
+        FROM new_rows n
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (role, sport, location) DO UPDATE SET count = r.count + EXCLUDED.count;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO user_rollup AS r (role, sport, location, count)
+        SELECT TG_ARGV[0], sport, location, SUM(delta)
+        FROM (
+            SELECT rollup_key(COALESCE(to_jsonb(n)->>'sport', to_jsonb(n)->>'specialization')) AS sport,
+                   rollup_key(n.location) AS location, 1 AS delta
+            FROM new_rows n
+            UNION ALL
+            SELECT rollup_key(COALESCE(to_jsonb(o)->>'sport', to_jsonb(o)->>'specialization')),
+                   rollup_key(o.location), -1
+            FROM old_rows o
+        ) d
+        GROUP BY 1, 2, 3
+        HAVING SUM(delta) <> 0
+        ORDER BY 1, 2, 3
+        ON CONFLICT (role, sport, location) DO UPDATE SET count = r.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO user_rollup AS r (role, sport, location, count)
+        SELECT TG_ARGV[0], rollup_key(COALESCE(to_jsonb(o)->>'sport', to_jsonb(o)->>'specialization')),
+               rollup_key(o.location), -COUNT(*)
+        FROM old_rows o
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (role, sport, location) DO UPDATE SET count = r.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS applications_rollup_insert ON applications;
+DROP TRIGGER IF EXISTS applications_rollup_update ON applications;
+DROP TRIGGER IF EXISTS applications_rollup_delete ON applications;
+CREATE TRIGGER applications_rollup_insert AFTER INSERT ON applications
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION applications_rollup();
+CREATE TRIGGER applications_rollup_update AFTER UPDATE ON applications
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION applications_rollup();
+CREATE TRIGGER applications_rollup_delete AFTER DELETE ON applications
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION applications_rollup();
+
+DROP TRIGGER IF EXISTS athletes_rollup_insert ON athletes;
+DROP TRIGGER IF EXISTS athletes_rollup_update ON athletes;
+DROP TRIGGER IF EXISTS athletes_rollup_delete ON athletes;
+CREATE TRIGGER athletes_rollup_insert AFTER INSERT ON athletes
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION users_rollup('athlete');
+CREATE TRIGGER athletes_rollup_update AFTER UPDATE ON athletes
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION users_rollup('athlete');
+CREATE TRIGGER athletes_rollup_delete AFTER DELETE ON athletes
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION users_rollup('athlete');
+
+DROP TRIGGER IF EXISTS coaches_rollup_insert ON coaches;
+DROP TRIGGER IF EXISTS coaches_rollup_update ON coaches;
+DROP TRIGGER IF EXISTS coaches_rollup_delete ON coaches;
+CREATE TRIGGER coaches_rollup_insert AFTER INSERT ON coaches
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION users_rollup('coach');
+CREATE TRIGGER coaches_rollup_update AFTER UPDATE ON coaches
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION users_rollup('coach');
+CREATE TRIGGER coaches_rollup_delete AFTER DELETE ON coaches
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION users_rollup('coach');
+
+DROP TRIGGER IF EXISTS sponsors_rollup_insert ON sponsors;
+DROP TRIGGER IF EXISTS sponsors_rollup_update ON sponsors;
+DROP TRIGGER IF EXISTS sponsors_rollup_delete ON sponsors;
+CREATE TRIGGER sponsors_rollup_insert AFTER INSERT ON sponsors
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION users_rollup('sponsor');
+CREATE TRIGGER sponsors_rollup_update AFTER UPDATE ON sponsors
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION users_rollup('sponsor');
+CREATE TRIGGER sponsors_rollup_delete AFTER DELETE ON sponsors
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION users_rollup('sponsor');
+
+-- backfill; writers wait until the triggers and the counts are in place together
+LOCK TABLE applications, athletes, coaches, sponsors IN SHARE MODE;
+TRUNCATE application_rollup, user_rollup;
+
+INSERT INTO application_rollup (day, status, application_type, sport, count)
+SELECT day, status, application_type, sport, COUNT(*) FROM application_rollup_source GROUP BY 1, 2, 3, 4;
+
+INSERT INTO user_rollup (role, sport, location, count)
+SELECT role, sport, location, COUNT(*) FROM user_rollup_source GROUP BY 1, 2, 3;
+
+COMMIT;
@@ -0,0 +1,13 @@
+-- Coach/sponsor feed on /feed, keyed the same way as the respond guards and
+-- the live feed topics (queries.APPLICATION_TYPE_KEY):
+--   WHERE status = 'Forwarded' AND LOWER(TRIM(application_type)) = ?
+--   ORDER BY submission_date DESC, id DESC
+-- Replaces migrations/004's index on LOWER(application_type), which no longer
+-- matches the query's expression. Build the new one before dropping the old,
+-- so the feed is never left without an index.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS applications_forwarded_feed_key_idx
+    ON applications (LOWER(TRIM(application_type)), submission_date DESC, id DESC)
+    WHERE status = 'Forwarded';
+
+DROP INDEX CONCURRENTLY IF EXISTS applications_forwarded_feed_idx;
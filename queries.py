@@ -0,0 +1,726 @@
+# queries.py - SQL shared by the WSGI app (psycopg2) and the ASGI app (asyncpg)
+#
+# Statements are written with psycopg2 "%s" placeholders; asgi.py runs them
+# through to_asyncpg() to get "$1, $2, ..." form. Keeping one copy of every
+# query means the two serving modes can't drift apart.
+import re
+import hashlib
+from datetime import datetime
+from functools import lru_cache
+from collections import namedtuple
+
+
+ROLE_TABLES = {"athlete": "athletes", "coach": "coaches", "sponsor": "sponsors"}
+NAME_COLUMNS = {"athlete": "full_name", "coach": "full_name", "sponsor": "name"}
+
+PROFILE_COLUMNS = {
+    "athlete": ("full_name", "age", "gender", "sport", "achievements", "ranking",
+                "experience_years", "contact_number", "location"),
+    "coach": ("full_name", "specialization", "certifications", "experience_years",
+              "contact_number", "location"),
+    "sponsor": ("name", "contact_person", "sport", "contact_number", "location"),
+}
+
+PENDING_COLUMNS = (
+    "id", "athlete_name", "age", "gender", "sport", "location", "application_type",
+    "achievements", "motivation", "goals", "supporting_docs", "submission_date",
+)
+ATHLETE_APPLICATION_COLUMNS = (
+    "id", "athlete_name", "application_type", "sport", "location", "status", "submission_date",
+    "achievements", "motivation", "goals", "supporting_docs",
+)
+FEED_COLUMNS = (*ATHLETE_APPLICATION_COLUMNS, "forwarded_date")
+
+# the one normalization of application_type that matches a coach/sponsor role: the feed
+# index (migrations/014), the feed query, the respond guards and the live feed topics
+APPLICATION_TYPE_KEY = "LOWER(TRIM(application_type))"
+
+
+def application_type_key(application_type):
+    """Python twin of APPLICATION_TYPE_KEY (SQL TRIM only strips spaces)."""
+    return (application_type or "").strip(" ").lower()
+
+
+# ----- identity -----
+
+EMAIL_EXISTS = "SELECT 1 FROM users WHERE email=%s"
+
+LOGIN_LOOKUP = "SELECT password, role, role_id, display_name FROM users WHERE email=%s"
+
+INSERT_USER = {
+    "athlete": "INSERT INTO athletes (email, password, full_name) VALUES (%s, %s, %s)",
+    "coach": "INSERT INTO coaches (email, password, full_name) VALUES (%s, %s, %s)",
+    # sponsors get the registration name as both organisation and contact person
+    "sponsor": "INSERT INTO sponsors (email, password, name, contact_person) VALUES (%s, %s, %s, %s)",
+}
+
+
+def identity(user_type):
+    """Row for sessions.set_identity(): id, display name, profile_completeness."""
+    return f"SELECT id, {NAME_COLUMNS[user_type]}, profile_completeness FROM {ROLE_TABLES[user_type]} WHERE email=%s"
+
+
+def update_password(user_type):
+    return f"UPDATE {ROLE_TABLES[user_type]} SET password=%s WHERE id=%s"
+
+
+# ----- profiles -----
+
+def select_profile(user_type):
+    """PROFILE_COLUMNS[user_type] followed by the stored profile_completeness (migrations/008)."""
+    return (f"SELECT {', '.join(PROFILE_COLUMNS[user_type])}, profile_completeness"
+            f" FROM {ROLE_TABLES[user_type]} WHERE email=%s")
+
+
+def update_profile(user_type):
+    """UPDATE of every profile column; parameters are PROFILE_COLUMNS[user_type] values, then email."""
+    assignments = ", ".join(f"{col}=%s" for col in PROFILE_COLUMNS[user_type])
+    return f"UPDATE {ROLE_TABLES[user_type]} SET {assignments} WHERE email=%s"
+
+
+def delete_user(user_type):
+    return f"DELETE FROM {ROLE_TABLES[user_type]} WHERE id=%s RETURNING email"
+
+
+def bulk_delete_users(user_type):
+    return f"DELETE FROM {ROLE_TABLES[user_type]} WHERE id = ANY(%s) RETURNING id, email"
+
+
+def like_prefix(text):
+    # escape LIKE wildcards so user input only ever matches as a literal prefix
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def user_page(user_type, after_id, limit, search=""):
+    """Keyset page of users; fetches limit + 1 rows so callers can tell if there's more."""
+    name_col = NAME_COLUMNS[user_type]
+    sql = f"SELECT id, {name_col}, email FROM {ROLE_TABLES[user_type]} WHERE id > %s"
+    params = [after_id]
+    if search:
+        # served by the lower(...) text_pattern_ops indexes from migrations/002
+        sql += f" AND (LOWER({name_col}) LIKE %s OR LOWER(email) LIKE %s)"
+        params += [like_prefix(search), like_prefix(search)]
+    sql += " ORDER BY id LIMIT %s"
+    params.append(limit + 1)
+    return sql, params
+
+
+def incomplete_profiles(user_type, below, cursor, limit):
+    """Users under `below` percent complete, least complete first, keyset-paginated on
+    (profile_completeness, id) to match the indexes in migrations/008. Raises ValueError on a bad cursor.
+    """
+    sql = (f"SELECT id, {NAME_COLUMNS[user_type]}, email, profile_completeness FROM {ROLE_TABLES[user_type]}"
+           " WHERE profile_completeness < %s")
+    params = [below]
+    if cursor:
+        after_pct, after_id = cursor.split("|", 1)
+        params += [int(after_pct), int(after_id)]
+        sql += " AND (profile_completeness, id) > (%s, %s)"
+    sql += " ORDER BY profile_completeness, id LIMIT %s"
+    params.append(limit + 1)
+    return sql, params
+
+
+def incomplete_cursor(row):
+    return f"{row['profile_completeness']}|{row['id']}"
+
+
+# ----- applications -----
+
+INSERT_APPLICATION = """
+    INSERT INTO applications (
+        athlete_id, athlete_name, age, gender, sport, location,
+        application_type, achievements, motivation, goals,
+        supporting_docs, status
+    ) VALUES ((SELECT id FROM athletes WHERE email=%s),
+              %s,%s,%s,%s,%s,%s,%s,%s,%s,%s,'Pending')
+    RETURNING id
+"""
+
+# range scan on applications_athlete_id_idx (migrations/005)
+ATHLETE_APPLICATIONS = f"""
+    SELECT {", ".join(ATHLETE_APPLICATION_COLUMNS)}
+    FROM applications
+    WHERE athlete_id = (SELECT id FROM athletes WHERE email = %s)
+    ORDER BY submission_date DESC
+"""
+
+
+def feed_page(user_type, cursor, limit):
+    """Forwarded applications for a coach/sponsor, keyset-paginated on (submission_date, id).
+
+    Shaped to match the partial index in migrations/014. Raises ValueError on a bad cursor.
+    """
+    sql = f"""
+        SELECT {", ".join(FEED_COLUMNS)}
+        FROM applications
+        WHERE status = 'Forwarded' AND {APPLICATION_TYPE_KEY} = %s
+    """
+    params = [user_type]
+    if cursor:
+        before_date, before_id = cursor.rsplit("|", 1)
+        params += [datetime.fromisoformat(before_date), int(before_id)]
+        sql += " AND (submission_date, id) < (%s, %s)"
+    sql += " ORDER BY submission_date DESC, id DESC LIMIT %s"
+    params.append(limit + 1)
+    return sql, params
+
+
+def feed_cursor(row):
+    return f"{row['submission_date'].isoformat()}|{row['id']}"
+
+
+def pending_page(after_id, limit=None):
+    sql = f"""
+        SELECT {", ".join(PENDING_COLUMNS)}
+        FROM applications
+        WHERE status='Pending' AND id > %s
+        ORDER BY id
+    """
+    params = [after_id]
+    if limit:
+        sql += " LIMIT %s"
+        params.append(max(limit, 1))
+    return sql, params
+
+
+# Pending rows are never edited, only added, moved on or deleted, so their
+# count and id sums change whenever the listing would. Index-only on the
+# partial index from migrations/003.
+PENDING_VERSION = """
+    SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(SUM(id), 0)
+    FROM applications
+    WHERE status = 'Pending'
+"""
+
+
+# ----- documents (see documents.py) -----
+
+INSERT_DOCUMENT = """
+    INSERT INTO documents (sha256, size, filename, content_type)
+    VALUES (%s, %s, %s, %s)
+    RETURNING id
+"""
+
+ATTACH_DOCUMENTS = """
+    UPDATE documents SET application_id = %s
+    WHERE id = ANY(%s) AND application_id IS NULL
+"""
+
+APPLICATION_DOCUMENTS = """
+    SELECT id, filename, content_type, size, uploaded_at
+    FROM documents
+    WHERE application_id = %s
+    ORDER BY id
+"""
+
+# the last four columns are documents.readable()'s `access`
+DOCUMENT = """
+    SELECT d.sha256, d.filename, d.content_type, d.size,
+           d.application_id, a.athlete_id, a.application_type, a.forwarded_date IS NOT NULL
+    FROM documents d
+    LEFT JOIN applications a ON a.id = d.application_id
+    WHERE d.id = %s
+"""
+
+APPLICATION_ACCESS = "SELECT id, athlete_id, application_type, forwarded_date IS NOT NULL FROM applications WHERE id = %s"
+
+DELETE_ORPHAN_DOCUMENTS = """
+    DELETE FROM documents
+    WHERE application_id IS NULL AND uploaded_at < now() - make_interval(secs => %s)
+"""
+
+DOCUMENT_BLOB_USED = "SELECT 1 FROM documents WHERE sha256 = %s LIMIT 1"
+
+
+# ----- live updates (see live.py) -----
+
+NOTIFY = "SELECT pg_notify(%s, %s)"
+
+
+# ----- status transitions (see application_status.py) -----
+
+FORWARD_PENDING = """
+    UPDATE applications
+    SET status = 'Forwarded',
+        forwarded_date = %s
+    WHERE id = ANY(%s) AND status = 'Pending'
+    RETURNING id, application_type
+"""
+
+DENY_PENDING = """
+    UPDATE applications
+    SET status = 'Denied'
+    WHERE id = ANY(%s) AND status = 'Pending'
+    RETURNING id, application_type
+"""
+
+CURRENT_STATUSES = "SELECT id, status FROM applications WHERE id = ANY(%s)"
+
+APPROVE_FORWARDED = f"""
+    UPDATE applications
+    SET status = 'Approved',
+        assigned_to_type = %s,
+        assigned_to_email = %s,
+        assigned_date = %s,
+        approval_notes = %s
+    WHERE id = %s AND status = 'Forwarded' AND {APPLICATION_TYPE_KEY} = %s
+    RETURNING id, status
+"""
+
+DENY_FORWARDED = f"""
+    UPDATE applications
+    SET status = 'Denied',
+        approval_notes = %s
+    WHERE id = %s AND status = 'Forwarded' AND {APPLICATION_TYPE_KEY} = %s
+    RETURNING id, status
+"""
+
+APPLICATION_STATE = "SELECT status, application_type FROM applications WHERE id = %s"
+
+
+# ----- search (migrations/006) -----
+
+SEARCH_TARGETS = {
+    "athlete": {
+        "table": "athletes",
+        "columns": ("id", "full_name", "sport", "location", "gender", "ranking", "achievements"),
+        "facets": ("sport", "location", "gender"),
+    },
+    "coach": {
+        "table": "coaches",
+        "columns": ("id", "full_name", "specialization", "certifications", "location", "experience_years"),
+        "facets": ("specialization", "location"),
+    },
+    "sponsor": {
+        "table": "sponsors",
+        "columns": ("id", "name", "sport", "location"),
+        "facets": ("sport", "location"),
+    },
+    "application": {
+        "table": "applications",
+        "columns": ("id", "athlete_name", "application_type", "sport", "location", "gender", "status",
+                    "submission_date"),
+        "facets": ("sport", "location", "gender", "status"),
+    },
+}
+
+
+def _search_where(kind, text, filters, max_ranking=None):
+    clauses, params = [], []
+    if text:
+        clauses.append("search_vector @@ websearch_to_tsquery('english', %s)")
+        params.append(text)
+    # facet columns double as exact-match filters
+    for col in SEARCH_TARGETS[kind]["facets"]:
+        if filters.get(col):
+            clauses.append(f"{col} = %s")
+            params.append(filters[col])
+    if kind == "athlete" and max_ranking is not None:
+        # ranking is free text on some installs; compare its digits
+        clauses.append("NULLIF(regexp_replace(ranking::text, '\\D', '', 'g'), '')::int <= %s")
+        params.append(max_ranking)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def search_page(kind, text, filters, limit, offset, max_ranking=None):
+    """Matching rows, best ts_rank first; without search text, newest first."""
+    target = SEARCH_TARGETS[kind]
+    where, where_params = _search_where(kind, text, filters, max_ranking)
+    if text:
+        rank = "ts_rank(search_vector, websearch_to_tsquery('english', %s))"
+        rank_params = [text]
+    else:
+        rank, rank_params = "0", []
+    sql = (f"SELECT {', '.join(target['columns'])}, {rank} AS rank FROM {target['table']}{where}"
+           " ORDER BY rank DESC, id DESC LIMIT %s OFFSET %s")
+    return sql, rank_params + where_params + [limit + 1, offset]
+
+
+def search_facets(kind, text, filters, max_ranking=None):
+    """Counts per facet value over the same match set, in one scan via GROUPING SETS."""
+    target = SEARCH_TARGETS[kind]
+    facets = target["facets"]
+    where, params = _search_where(kind, text, filters, max_ranking)
+    grouping = ", ".join(f"GROUPING({col})" for col in facets)
+    sets = ", ".join(f"({col})" for col in facets)
+    sql = (f"SELECT {', '.join(facets)}, COUNT(*), {grouping} FROM {target['table']}{where}"
+           f" GROUP BY GROUPING SETS ({sets})")
+    return sql, params
+
+
+def facet_counts(kind, rows, top=20):
+    """Fold search_facets() rows into {facet: [{"value", "count"}, ...]}, largest first."""
+    facets = SEARCH_TARGETS[kind]["facets"]
+    n = len(facets)
+    counts = {col: [] for col in facets}
+    for row in rows:
+        values, count, flags = row[:n], row[n], row[n + 1:]
+        # the facet this row belongs to is the one column GROUPING() reports as grouped (0)
+        i = list(flags).index(0)
+        counts[facets[i]].append({"value": values[i], "count": count})
+    for col in facets:
+        counts[col] = sorted(counts[col], key=lambda c: -c["count"])[:top]
+    return counts
+
+
+# ----- recommendations (migrations/007, see recommendations.py) -----
+
+RECOMMENDATION_ATHLETES = "SELECT id, sport, location, ranking, experience_years FROM athletes ORDER BY id"
+
+
+def recommendation_targets(role):
+    # a coach's specialization plays the part of a sponsor's sport
+    sport_col = "specialization" if role == "coach" else "sport"
+    return f"SELECT id, {sport_col}, location FROM {ROLE_TABLES[role]} ORDER BY id"
+
+
+CLEAR_RECOMMENDATIONS = "DELETE FROM recommendations"
+
+COPY_RECOMMENDATIONS = "COPY recommendations (user_role, user_id, target_role, rank, target_id, score) FROM STDIN"
+
+
+# one primary-key range scan; target details are joined in the same round-trip
+USER_RECOMMENDATIONS = """
+    SELECT r.target_role, r.rank, r.target_id, r.score,
+           COALESCE(a.full_name, c.full_name, s.name) AS name,
+           COALESCE(a.sport, c.specialization, s.sport) AS sport,
+           COALESCE(a.location, c.location, s.location) AS location
+    FROM recommendations r
+    LEFT JOIN athletes a ON r.target_role = 'athlete' AND a.id = r.target_id
+    LEFT JOIN coaches c ON r.target_role = 'coach' AND c.id = r.target_id
+    LEFT JOIN sponsors s ON r.target_role = 'sponsor' AND s.id = r.target_id
+    WHERE r.user_role = %s AND r.user_id = %s
+    ORDER BY r.target_role, r.rank
+"""
+
+
+# ----- background jobs (migrations/009, see jobs.py) -----
+
+ENQUEUE_JOB = "INSERT INTO jobs (kind, payload) VALUES (%s, %s::jsonb)"
+
+ENQUEUE_NOOP_JOBS = "INSERT INTO jobs (kind) SELECT 'noop' FROM generate_series(1, %s)"
+
+# rows stay locked until the worker's transaction ends, so a crashed worker's jobs free themselves;
+# long-running kinds are left out of batches and claimed one at a time by CLAIM_LONG_JOB
+CLAIM_JOBS = """
+    SELECT id, kind, payload, attempts
+    FROM jobs
+    WHERE status = 'queued' AND run_at <= now() AND kind <> ALL(%s)
+    ORDER BY run_at, id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+CLAIM_LONG_JOB = """
+    SELECT id, kind, payload, attempts
+    FROM jobs
+    WHERE status = 'queued' AND run_at <= now() AND kind = ANY(%s)
+    ORDER BY run_at, id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+"""
+
+COMPLETE_JOB = "DELETE FROM jobs WHERE id = %s"
+
+RETRY_JOB = """
+    UPDATE jobs
+    SET attempts = attempts + 1,
+        run_at = now() + make_interval(secs => %s),
+        last_error = %s
+    WHERE id = %s
+"""
+
+BURY_JOB = """
+    UPDATE jobs
+    SET status = 'dead',
+        attempts = attempts + 1,
+        last_error = %s,
+        failed_at = now()
+    WHERE id = %s
+"""
+
+REQUEUE_DEAD_JOBS = """
+    UPDATE jobs
+    SET status = 'queued', attempts = 0, run_at = now(), failed_at = NULL
+    WHERE id = ANY(%s) AND status = 'dead'
+    RETURNING id
+"""
+
+JOB_COUNTS = """
+    SELECT status, COUNT(*) AS count, MIN(run_at) AS oldest_run_at
+    FROM jobs
+    GROUP BY status
+"""
+
+DEAD_JOBS = """
+    SELECT id, kind, payload, attempts, created_at, failed_at, last_error
+    FROM jobs
+    WHERE status = 'dead'
+    ORDER BY failed_at DESC
+    LIMIT %s
+"""
+
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+def to_asyncpg(sql):
+    """Rewrite psycopg2 "%s" placeholders as asyncpg "$1, $2, ..."."""
+    counter = iter(range(1, 10_000))
+    return _PLACEHOLDER.sub(lambda _: f"${next(counter)}", sql)
+
+
+# ----- prepared statements and row records -----
+#
+# asyncpg prepares every statement it runs and caches the plan per connection.
+# psycopg2 sends plain text, so the WSGI app runs its hot lookups through
+# cursor.execute_prepared() (db.py): PREPARE once per connection, then EXECUTE.
+# Rows come back as plain tuples; where Python code or templates read them by
+# field, they are wrapped in the namedtuple records below (no per-row dict),
+# and JSON responses build their dicts straight from the column tuples.
+
+class Prepared:
+    __slots__ = ("name", "prepare", "execute")
+
+    def __init__(self, sql):
+        if "%%" in sql:
+            raise ValueError("prepared statements can't contain literal %")
+        self.name = "q_" + hashlib.blake2b(sql.encode(), digest_size=8).hexdigest()
+        self.prepare = f"PREPARE {self.name} AS {to_asyncpg(sql)}"
+        placeholders = sql.count("%s")
+        self.execute = f"EXECUTE {self.name}" + (f" ({', '.join(['%s'] * placeholders)})" if placeholders else "")
+
+
+@lru_cache(maxsize=256)
+def prepared(sql):
+    """The Prepared form of a statement, named after its text so every connection agrees on it."""
+    return Prepared(sql)
+
+
+# profile.html reads these by attribute, as it did RealDictRow keys
+AthleteApplication = namedtuple("AthleteApplication", ATHLETE_APPLICATION_COLUMNS)
+
+
+def rows_as_dicts(columns, rows):
+    """JSON-ready dicts for plain tuple rows."""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def described_dicts(cur, rows):
+    """rows_as_dicts keyed by the cursor's own column names, for statements whose columns vary."""
+    return rows_as_dicts([d[0] for d in cur.description], rows)
+
+
+# ----- analytics (migrations/013, see analytics.py) -----
+
+# GROUPING() bitmask -> breakdown; a set bit means that column was aggregated away
+APPLICATION_STATS = """
+    SELECT GROUPING(status, application_type, sport, date_trunc('week', day)) AS grouping,
+           status, application_type, sport, date_trunc('week', day)::date AS week, SUM(count)::bigint AS count
+    FROM application_rollup
+    WHERE day >= %s AND day < %s
+    GROUP BY GROUPING SETS ((status), (application_type), (sport), (date_trunc('week', day)), ())
+    HAVING SUM(count) <> 0
+"""
+
+USER_STATS = """
+    SELECT GROUPING(role, sport, location) AS grouping, role, sport, location, SUM(count)::bigint AS count
+    FROM user_rollup
+    GROUP BY GROUPING SETS ((role), (role, sport), (role, location))
+    HAVING SUM(count) <> 0
+"""
+
+# keys whose rollup count differs from a recount of the base tables (one snapshot, so exact)
+_APPLICATION_ROLLUP_DIFF = """
+    SELECT day, status, application_type, sport, COALESCE(s.count, 0) AS expected, COALESCE(r.count, 0) AS actual
+    FROM (SELECT day, status, application_type, sport, COUNT(*) AS count
+          FROM application_rollup_source GROUP BY 1, 2, 3, 4) s
+    FULL JOIN application_rollup r USING (day, status, application_type, sport)
+    WHERE COALESCE(s.count, 0) <> COALESCE(r.count, 0)
+"""
+
+_USER_ROLLUP_DIFF = """
+    SELECT role, sport, location, COALESCE(s.count, 0) AS expected, COALESCE(r.count, 0) AS actual
+    FROM (SELECT role, sport, location, COUNT(*) AS count FROM user_rollup_source GROUP BY 1, 2, 3) s
+    FULL JOIN user_rollup r USING (role, sport, location)
+    WHERE COALESCE(s.count, 0) <> COALESCE(r.count, 0)
+"""
+
+APPLICATION_ROLLUP_DRIFT = _APPLICATION_ROLLUP_DIFF + " ORDER BY day DESC, status, application_type, sport"
+USER_ROLLUP_DRIFT = _USER_ROLLUP_DIFF + " ORDER BY role, sport, location"
+
+# Corrections are added as deltas, like the triggers' own writes, so they stay
+# right even when a concurrent write to the same key commits in between.
+FIX_APPLICATION_ROLLUP = f"""
+    INSERT INTO application_rollup AS r (day, status, application_type, sport, count)
+    SELECT day, status, application_type, sport, expected - actual FROM ({_APPLICATION_ROLLUP_DIFF}) d
+    ORDER BY 1, 2, 3, 4
+    ON CONFLICT (day, status, application_type, sport) DO UPDATE SET count = r.count + EXCLUDED.count
+"""
+
+FIX_USER_ROLLUP = f"""
+    INSERT INTO user_rollup AS r (role, sport, location, count)
+    SELECT role, sport, location, expected - actual FROM ({_USER_ROLLUP_DIFF}) d
+    ORDER BY 1, 2, 3
+    ON CONFLICT (role, sport, location) DO UPDATE SET count = r.count + EXCLUDED.count
+"""
+
+DELETE_EMPTY_ROLLUPS = (
+    "DELETE FROM application_rollup WHERE count = 0",
+    "DELETE FROM user_rollup WHERE count = 0",
+)
+
+
+# ----- bulk export (see exports.py) -----
+
+EXPORT_COLUMNS = {
+    **{kind: ("id", "email", *PROFILE_COLUMNS[user_type], "profile_completeness", "created_at")
+       for user_type, kind in ROLE_TABLES.items()},
+    "applications": ("id", "athlete_id", "athlete_name", "age", "gender", "sport", "location", "application_type",
+                     "achievements", "motivation", "goals", "supporting_docs", "status", "submission_date"),
+}
+# coaches have no sport column; their specialization is the closest match
+EXPORT_SPORT_COLUMN = {"athletes": "sport", "coaches": "specialization", "sponsors": "sport", "applications": "sport"}
+# created_at is migrations/012; older accounts have none and drop out of dated exports
+EXPORT_DATE_COLUMN = {"athletes": "created_at", "coaches": "created_at", "sponsors": "created_at",
+                      "applications": "submission_date"}
+
+
+def export(kind, status=None, sport=None, since=None, until=None):
+    """(sql, params) selecting EXPORT_COLUMNS[kind] in id order. `until` is exclusive; status is applications-only."""
+    where, params = [], []
+    if status:
+        where.append("status = %s")
+        params.append(status)
+    if sport:
+        where.append(f"LOWER({EXPORT_SPORT_COLUMN[kind]}) = LOWER(%s)")
+        params.append(sport)
+    if since:
+        where.append(f"{EXPORT_DATE_COLUMN[kind]} >= %s")
+        params.append(since)
+    if until:
+        where.append(f"{EXPORT_DATE_COLUMN[kind]} < %s")
+        params.append(until)
+    sql = f"SELECT {', '.join(EXPORT_COLUMNS[kind])} FROM {kind}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY id", params
+
+
+def export_ndjson(sql):
+    """One JSON object per row, built by Postgres, so COPY can write NDJSON too."""
+    return f"SELECT row_to_json(t) FROM ({sql}) t"
+
+
+# ----- bulk import (migrations/011, see imports.py) -----
+
+INSERT_IMPORT = """
+    INSERT INTO imports (kind, format, on_conflict, path)
+    VALUES (%s, %s, %s, %s)
+    RETURNING id
+"""
+
+IMPORT = "SELECT kind, format, on_conflict, path FROM imports WHERE id = %s"
+
+FINISH_IMPORT = "UPDATE imports SET status = %s, report = %s::jsonb, finished_at = now() WHERE id = %s"
+
+IMPORT_STATUS = "SELECT id, kind, format, on_conflict, status, report, created_at, finished_at FROM imports WHERE id = %s"
+
+RECENT_IMPORTS = """
+    SELECT id, kind, format, on_conflict, status, created_at, finished_at
+    FROM imports
+    ORDER BY id DESC
+    LIMIT %s
+"""
+
+
+def import_stage(columns):
+    """Session-private staging table; `columns` is [(name, sql type)]. Loaded with COPY."""
+    cols = ", ".join(f"{name} {sql_type}" for name, sql_type in columns)
+    return f"CREATE TEMP TABLE import_stage (line INTEGER NOT NULL, {cols}) ON COMMIT DROP"
+
+
+def import_copy(columns):
+    return f"COPY import_stage (line, {', '.join(name for name, _ in columns)}) FROM STDIN"
+
+
+DROP_IMPORT_STAGE = "DROP TABLE IF EXISTS import_stage, import_rows"
+
+ANALYZE_IMPORT_STAGE = "ANALYZE import_stage"
+
+# the first row per email wins; later ones are reported as duplicates
+IMPORT_DEDUPLICATE = """
+    CREATE TEMP TABLE import_rows ON COMMIT DROP AS
+    SELECT DISTINCT ON (email) * FROM import_stage ORDER BY email, line
+"""
+
+IMPORT_DUPLICATES = """
+    SELECT s.line, s.email
+    FROM import_stage s JOIN import_rows r USING (email)
+    WHERE s.line <> r.line
+    ORDER BY s.line
+    LIMIT %s
+"""
+
+# emails that already have an account, in any role
+IMPORT_CONFLICTS = """
+    SELECT r.line, r.email, u.role
+    FROM import_rows r JOIN users u USING (email)
+    ORDER BY r.line
+    LIMIT %s
+"""
+
+IMPORT_CONFLICT_COUNTS = """
+    SELECT u.role = %s AS same_role, COUNT(*)
+    FROM import_rows r JOIN users u USING (email)
+    GROUP BY 1
+"""
+
+
+def import_update(user_type, columns):
+    """on_conflict=update: refresh existing accounts of the same role. Blank fields keep their value,
+    and the password is never touched: a file must not be able to take over an account."""
+    table = ROLE_TABLES[user_type]
+    sets = [f"{c} = COALESCE(r.{c}, t.{c})" for c in columns if c not in ("email", "password")]
+    return f"""
+        UPDATE {table} t
+        SET {", ".join(sets)}
+        FROM import_rows r
+        WHERE t.email = r.email
+    """
+
+
+def import_insert(user_type, columns):
+    table = ROLE_TABLES[user_type]
+    cols = ", ".join(columns)
+    return f"""
+        INSERT INTO {table} ({cols})
+        SELECT {cols}
+        FROM import_rows r
+        WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.email = r.email)
+    """
+
+
+IMPORT_UNMATCHED_ATHLETES = """
+    SELECT s.line, s.athlete_email
+    FROM import_stage s
+    WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.email = s.athlete_email AND u.role = 'athlete')
+    ORDER BY s.line
+    LIMIT %s
+"""
+
+IMPORT_APPLICATIONS = """
+    INSERT INTO applications (
+        athlete_id, athlete_name, age, gender, sport, location,
+        application_type, achievements, motivation, goals,
+        supporting_docs, status, submission_date
+    )
+    SELECT a.id, COALESCE(s.athlete_name, a.full_name), COALESCE(s.age, a.age), COALESCE(s.gender, a.gender),
+           s.sport, COALESCE(s.location, a.location), s.application_type, s.achievements, s.motivation,
+           s.goals, s.supporting_docs, 'Pending', COALESCE(s.submission_date, now())
+    FROM import_stage s
+    JOIN users u ON u.email = s.athlete_email AND u.role = 'athlete'
+    JOIN athletes a ON a.id = u.role_id
+"""
+
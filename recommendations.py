@@ -0,0 +1,233 @@
+# recommendations.py - periodic batch job that precomputes athlete <-> coach/sponsor matches
+#
+#   python recommendations.py                       (run from cron, e.g. nightly)
+#   python recommendations.py --bench 1000000 100000  (synthetic scoring benchmark, no database)
+#
+# Pairs are scored block by block with NumPy and only a running top-K per user
+# is kept, so memory is O((athletes + targets) * K + BLOCK^2) however many pairs
+# there are. Results replace the recommendations table (migrations/007) in one
+# transaction, so /recommendations never sees a half-written set.
+import io
+import os
+import time
+import logging
+
+import numpy as np
+
+import queries
+from db import get_db
+
+
+TOP_K = int(os.environ.get("REC_TOP_K", 20))
+ATHLETE_BLOCK = int(os.environ.get("REC_ATHLETE_BLOCK", 4096))
+TARGET_BLOCK = int(os.environ.get("REC_TARGET_BLOCK", 4096))
+FETCH_BATCH = 10000
+
+# weights of each feature in the pair score
+W_SPORT = 1.0
+W_LOCATION = 0.5
+W_RANKING = 0.3
+W_EXPERIENCE = 0.2
+
+
+class Codebook:
+    """Maps normalized strings (sport, location, ...) to shared int codes; -1 = missing."""
+
+    def __init__(self):
+        self.codes = {}
+
+    def code(self, value):
+        if value is None:
+            return -1
+        key = str(value).strip().lower()
+        if not key:
+            return -1
+        return self.codes.setdefault(key, len(self.codes))
+
+
+def _number(value):
+    # ranking / experience columns may hold free text on older rows
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        digits = "".join(ch for ch in str(value or "") if ch.isdigit())
+        return float(digits) if digits else np.nan
+
+
+def load_athletes(conn, sports, locations):
+    ids, sport, location, ranking, experience = [], [], [], [], []
+    with conn.cursor(name="rec_athletes") as cur:
+        cur.itersize = FETCH_BATCH
+        cur.execute(queries.RECOMMENDATION_ATHLETES)
+        for row in cur:
+            ids.append(row[0])
+            sport.append(sports.code(row[1]))
+            location.append(locations.code(row[2]))
+            ranking.append(_number(row[3]))
+            experience.append(_number(row[4]))
+
+    ranking = np.array(ranking, dtype=np.float32)
+    experience = np.array(experience, dtype=np.float32)
+
+    # rank 1 is best: map to 1.0 .. ~0.0, unranked athletes score 0
+    worst = np.nanmax(ranking) if np.isfinite(ranking).any() else 1.0
+    ranking_score = np.nan_to_num(1.0 - (ranking - 1.0) / max(worst, 1.0), nan=0.0).clip(0, 1)
+    experience_score = np.nan_to_num(experience / 20.0, nan=0.0).clip(0, 1)
+
+    return {
+        "ids": np.array(ids, dtype=np.int64),
+        "sport": np.array(sport, dtype=np.int32),
+        "location": np.array(location, dtype=np.int32),
+        "base": (W_RANKING * ranking_score + W_EXPERIENCE * experience_score).astype(np.float32),
+    }
+
+
+def load_targets(conn, role, sports, locations):
+    ids, sport, location = [], [], []
+    with conn.cursor(name=f"rec_{queries.ROLE_TABLES[role]}") as cur:
+        cur.itersize = FETCH_BATCH
+        cur.execute(queries.recommendation_targets(role))
+        for row in cur:
+            ids.append(row[0])
+            sport.append(sports.code(row[1]))
+            location.append(locations.code(row[2]))
+    return {
+        "ids": np.array(ids, dtype=np.int64),
+        "sport": np.array(sport, dtype=np.int32),
+        "location": np.array(location, dtype=np.int32),
+    }
+
+
+class TopK:
+    """Running top-k (score, id) per row, merged block by block."""
+
+    def __init__(self, n, k):
+        self.k = k
+        self.scores = np.full((n, k), -np.inf, dtype=np.float32)
+        self.ids = np.full((n, k), -1, dtype=np.int64)
+
+    def merge(self, rows, block_scores, block_ids):
+        scores = np.concatenate([self.scores[rows], block_scores], axis=1)
+        ids = np.concatenate([self.ids[rows], np.broadcast_to(block_ids, block_scores.shape)], axis=1)
+        keep = np.argpartition(-scores, self.k - 1, axis=1)[:, :self.k]
+        self.scores[rows] = np.take_along_axis(scores, keep, axis=1)
+        self.ids[rows] = np.take_along_axis(ids, keep, axis=1)
+
+    def ranked(self):
+        order = np.argsort(-self.scores, axis=1, kind="stable")
+        return np.take_along_axis(self.scores, order, axis=1), np.take_along_axis(self.ids, order, axis=1)
+
+
+def score_block(athletes, targets, a_rows, t_rows):
+    """Scores for athletes[a_rows] x targets[t_rows]; callers only pair up rows sharing a sport."""
+    a_loc = athletes["location"][a_rows, None]
+    loc_match = (a_loc == targets["location"][None, t_rows]) & (a_loc >= 0)
+    return (W_SPORT + W_LOCATION * loc_match + athletes["base"][a_rows, None]).astype(np.float32)
+
+
+def _by_sport(sport):
+    """{sport code: row indices}, skipping rows without a sport."""
+    order = np.argsort(sport, kind="stable")
+    codes, starts = np.unique(sport[order], return_index=True)
+    groups = np.split(order, starts[1:])
+    return {code: rows for code, rows in zip(codes, groups) if code >= 0}
+
+
+def match(athletes, targets, k):
+    """Top-k targets per athlete and top-k athletes per target. Returns (per_athlete, per_target, pairs scored)."""
+    per_athlete = TopK(len(athletes["ids"]), k)
+    per_target = TopK(len(targets["ids"]), k)
+    target_groups = _by_sport(targets["sport"])
+    pairs = 0
+
+    # pairs that don't share a sport are never recommended, so only compare within a sport
+    for sport, a_group in _by_sport(athletes["sport"]).items():
+        t_group = target_groups.get(sport)
+        if t_group is None:
+            continue
+        for a0 in range(0, len(a_group), ATHLETE_BLOCK):
+            a_rows = a_group[a0:a0 + ATHLETE_BLOCK]
+            for t0 in range(0, len(t_group), TARGET_BLOCK):
+                t_rows = t_group[t0:t0 + TARGET_BLOCK]
+                block = score_block(athletes, targets, a_rows, t_rows)
+                per_athlete.merge(a_rows, block, targets["ids"][t_rows])
+                per_target.merge(t_rows, block.T, athletes["ids"][a_rows])
+                pairs += block.size
+
+    return per_athlete.ranked(), per_target.ranked(), pairs
+
+
+def write_rows(cur, buf, user_role, user_ids, target_role, ranked):
+    scores, ids = ranked
+    for row, user_id in enumerate(user_ids):
+        for rank in range(scores.shape[1]):
+            if not np.isfinite(scores[row, rank]):
+                break
+            buf.write(f"{user_role}\t{user_id}\t{target_role}\t{rank + 1}\t{ids[row, rank]}\t{scores[row, rank]:.4f}\n")
+        if buf.tell() > 8 * 1024 * 1024:
+            _flush(cur, buf)
+
+
+def _flush(cur, buf):
+    buf.seek(0)
+    cur.copy_expert(queries.COPY_RECOMMENDATIONS, buf)
+    buf.seek(0)
+    buf.truncate()
+
+
+def run(k=TOP_K):
+    started = time.perf_counter()
+    sports, locations = Codebook(), Codebook()
+
+    with get_db() as conn:
+        athletes = load_athletes(conn, sports, locations)
+        targets = {role: load_targets(conn, role, sports, locations) for role in ("coach", "sponsor")}
+        conn.rollback()
+
+        with conn.cursor() as cur:
+            cur.execute(queries.CLEAR_RECOMMENDATIONS)
+            buf = io.StringIO()
+            pairs = 0
+            for role, t in targets.items():
+                per_athlete, per_target, scored = match(athletes, t, k)
+                pairs += scored
+                write_rows(cur, buf, "athlete", athletes["ids"], role, per_athlete)
+                write_rows(cur, buf, role, t["ids"], "athlete", per_target)
+            _flush(cur, buf)
+        conn.commit()
+
+    candidates = len(athletes["ids"]) * sum(len(t["ids"]) for t in targets.values())
+    elapsed = time.perf_counter() - started
+    logging.info("Scored %d of %d candidate pairs in %.1fs (%.0f candidates/s)",
+                 pairs, candidates, elapsed, candidates / max(elapsed, 1e-9))
+
+
+def bench(n_athletes, n_targets, k=TOP_K, n_sports=40, n_locations=500):
+    rng = np.random.default_rng(0)
+    athletes = {
+        "ids": np.arange(n_athletes, dtype=np.int64),
+        "sport": rng.integers(0, n_sports, n_athletes, dtype=np.int32),
+        "location": rng.integers(0, n_locations, n_athletes, dtype=np.int32),
+        "base": rng.random(n_athletes, dtype=np.float32) * (W_RANKING + W_EXPERIENCE),
+    }
+    targets = {
+        "ids": np.arange(n_targets, dtype=np.int64),
+        "sport": rng.integers(0, n_sports, n_targets, dtype=np.int32),
+        "location": rng.integers(0, n_locations, n_targets, dtype=np.int32),
+    }
+    started = time.perf_counter()
+    _, _, scored = match(athletes, targets, k)
+    elapsed = time.perf_counter() - started
+    candidates = n_athletes * n_targets
+    print(f"{n_athletes} x {n_targets} candidates ({scored} scored), top-{k}: {elapsed:.1f}s"
+          f" ({candidates / elapsed / 1e6:.1f}M candidates/s)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) == 4 and sys.argv[1] == "--bench":
+        bench(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        run()
@@ -0,0 +1,128 @@
+# responses.py - compression and conditional-GET helpers for JSON responses
+#
+# Both serving modes run buffered JSON responses through an after_request hook:
+# GETs get a weak ETag over the body and answer If-None-Match with 304, then
+# bodies of COMPRESS_MIN_BYTES or more are compressed with the client's best
+# accepted encoding. Streamed responses (/get_pending_applications) can't be
+# hashed up front, so those routes compress their own chunks with
+# compress_stream() and compute their ETag from a cheap query instead.
+import os
+import zlib
+import hashlib
+
+try:
+    import brotli
+except ImportError:          # optional: gzip only
+    brotli = None
+
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+# a streamed response is flushed to the client at least this often (uncompressed bytes)
+STREAM_FLUSH_BYTES = 16 * 1024
+
+JSON_MIMETYPES = ("application/json", "application/x-ndjson")
+# preferred first when the client weighs them equally
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+def negotiate(accept_encoding, available=ENCODINGS):
+    """Best encoding in `available` that the Accept-Encoding header allows, or None for identity."""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding, level=None):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    if encoding == "gzip":
+        c = zlib.compressobj(GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+        return c.compress(data) + c.flush()
+    raise ValueError(f"unsupported encoding {encoding!r}")
+
+
+class StreamCompressor:
+    """Incremental compressor that flushes every STREAM_FLUSH_BYTES so clients can parse as rows arrive."""
+
+    def __init__(self, encoding):
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._process, self._flush, self._finish = self._c.process, self._c.flush, self._c.finish
+        elif encoding == "gzip":
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._process = self._c.compress
+            self._flush = lambda: self._c.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._c.flush
+        else:
+            raise ValueError(f"unsupported encoding {encoding!r}")
+        self._pending = 0
+
+    def feed(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        out = self._process(chunk)
+        self._pending += len(chunk)
+        if self._pending >= STREAM_FLUSH_BYTES:
+            self._pending = 0
+            out += self._flush()
+        return out
+
+    def finish(self):
+        return self._finish()
+
+
+def compress_stream(chunks, encoding):
+    c = StreamCompressor(encoding)
+    for chunk in chunks:
+        out = c.feed(chunk)
+        if out:
+            yield out
+    yield c.finish()
+
+
+async def compress_stream_async(chunks, encoding):
+    c = StreamCompressor(encoding)
+    async for chunk in chunks:
+        out = c.feed(chunk)
+        if out:
+            yield out
+    yield c.finish()
+
+
+def is_json(response):
+    return response.mimetype in JSON_MIMETYPES and "Content-Encoding" not in response.headers
+
+
+def revalidate(response):
+    """JSON is per-user and changes often: let browsers keep it, but only reuse it after a 304."""
+    if not response.headers.get("Cache-Control"):
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    response.vary.add("Accept-Encoding")
+
+
+def mark_encoded(response, encoding):
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+
+
+def etag(*parts):
+    """Opaque weak-comparable tag for a version fingerprint (e.g. a row from a cheap query)."""
+    return hashlib.blake2b("\x1f".join(map(str, parts)).encode(), digest_size=12).hexdigest()
@@ -0,0 +1,126 @@
+# sessions.py - server-side sessions and a cached per-user identity record
+#
+# The session cookie only carries a random id; the session dict lives in a
+# cache.py backend (in-process LRU, or Redis when SESSION_URL is set so every
+# worker and both serving modes share it). Next to the sessions the store
+# keeps one compact identity record per signed-in user (id, role, display
+# name, completeness), so protected routes get their user context without
+# touching Postgres. Profile updates and deletes forget the record; the next
+# request rebuilds it from the database, and if the account is gone the
+# session is cleared - that is how deleted users get signed out.
+import os
+import re
+import secrets
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from cache import make_cache, CACHE_URL
+
+
+# redis://host:port/db; defaults to CACHE_URL, unset = in-process LRU (single worker only)
+SESSION_URL = os.environ.get("SESSION_URL", CACHE_URL)
+# seconds a session lasts after it was last written (sign-in, or any change to it)
+SESSION_TTL = float(os.environ.get("SESSION_TTL", 7 * 24 * 3600))
+SESSION_MAX_ENTRIES = int(os.environ.get("SESSION_MAX_ENTRIES", 100000))
+
+store = make_cache(SESSION_URL, SESSION_TTL, SESSION_MAX_ENTRIES)
+
+_SID = re.compile(r"[A-Za-z0-9_-]{43}")
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.old_sid = None
+        self.modified = False
+
+    def regenerate(self):
+        """Move the session to a fresh id (call on sign-in so a planted id can't be reused)."""
+        if self.sid:
+            self.old_sid, self.sid = self.sid, None
+        self.modified = True
+
+
+def _key(sid):
+    return f"session:{sid}"
+
+
+def open_session(sid):
+    if sid and _SID.fullmatch(sid):
+        data = store.get(_key(sid))
+        if data is not None:
+            return ServerSession(data, sid)
+    return ServerSession()
+
+
+def save_session(session):
+    """Write the session to the store. Returns "set", "delete" or None: what to do with the cookie."""
+    if session.old_sid:
+        store.delete(_key(session.old_sid))
+    if not session:
+        if session.sid and session.modified:
+            store.delete(_key(session.sid))
+            return "delete"
+        return None
+    if session.modified or session.sid is None:
+        session.sid = session.sid or secrets.token_urlsafe(32)
+        store.set(_key(session.sid), dict(session))
+        return "set"
+    return None
+
+
+def write_cookie(interface, app, session, response, action):
+    """Apply save_session()'s verdict; shared by the Flask and Quart session interfaces."""
+    name = interface.get_cookie_name(app)
+    domain = interface.get_cookie_domain(app)
+    path = interface.get_cookie_path(app)
+    if action == "delete":
+        response.delete_cookie(name, domain=domain, path=path)
+    elif action == "set":
+        response.set_cookie(
+            name, session.sid,
+            domain=domain, path=path,
+            httponly=interface.get_cookie_httponly(app),
+            secure=interface.get_cookie_secure(app),
+            samesite=interface.get_cookie_samesite(app),
+        )
+
+
+class ServerSessionInterface(SessionInterface):
+    def open_session(self, app, request):
+        return open_session(request.cookies.get(self.get_cookie_name(app)))
+
+    def save_session(self, app, session, response):
+        write_cookie(self, app, session, response, save_session(session))
+
+
+# ----- identity -----
+
+def identity_key(user_type, email):
+    return f"identity:{user_type}:{email}"
+
+
+def get_identity(user_type, email):
+    return store.get(identity_key(user_type, email))
+
+
+def set_identity(user_type, email, row):
+    """Cache a queries.identity() row (id, display name, completeness) and return the record."""
+    user = {
+        "id": row[0],
+        "user_type": user_type,
+        "email": email,
+        "display_name": row[1] or email.split("@")[0],
+        "profile_completeness": row[2],
+    }
+    store.set(identity_key(user_type, email), user)
+    return user
+
+
+def forget_identity(user_type, email):
+    store.delete(identity_key(user_type, email))